@@ -0,0 +1,112 @@
+"""
+JWT authentication with a cached user lookup.
+
+``CachedJWTAuthentication`` replaces simplejwt's ``JWTAuthentication`` for
+the API and is also used by the WebSocket middleware. The user row behind
+a token is cached per user id (every concrete field except the password
+hash, which stays deferred and is loaded only if something reads it) for
+``AUTH_USER_CACHE_TIMEOUT`` seconds, so an authenticated request no
+longer costs a ``User`` query. The entry is dropped whenever the user is
+saved or deleted (``accounts.signals``), so role changes and
+deactivation apply immediately; the timeout only bounds staleness after
+writes that bypass ``save()``.
+
+Invalidation also stamps a fresh version token for the user, and every
+cached row carries the token that was current before it was read from
+the database. A reader that loaded the row before a concurrent write
+and cached it after the invalidation therefore leaves an entry with the
+old token, which the next lookup ignores.
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "authuser:"
+
+
+def _key(user_id):
+    return f"{KEY_PREFIX}{user_id}"
+
+
+def _version_key(user_id):
+    return f"{KEY_PREFIX}v:{user_id}"
+
+
+def _cached_attnames():
+    return [
+        field.attname for field in get_user_model()._meta.concrete_fields
+        if field.name != "password"
+    ]
+
+
+def _fetch(user_id, attnames):
+    return (
+        get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+        .values_list(*attnames).first()
+    )
+
+
+def load_user(user_id):
+    """User for ``user_id`` (the USER_ID_FIELD value), from the cache when possible; None if missing."""
+    attnames = _cached_attnames()
+    key, version_key = _key(user_id), _version_key(user_id)
+    try:
+        found = cache.get_many([key, version_key])
+        cache_ok = True
+    except Exception as e:
+        logger.warning(f"Auth user cache unavailable: {e}")
+        found, cache_ok = {}, False
+
+    version = found.get(version_key)
+    entry = found.get(key)
+    if entry is not None and entry[0] == version:
+        values = entry[1]
+    else:
+        # الإصدار مقروء قبل الاستعلام: إن أُبطل المستخدم أثناءه يصبح ما نخزّنه قديماً ومتجاهَلاً
+        values = _fetch(user_id, attnames)
+        if values is None:
+            return None
+        if cache_ok:
+            try:
+                cache.set(key, (version, values), settings.AUTH_USER_CACHE_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Failed to cache auth user {user_id}: {e}")
+
+    return get_user_model().from_db("default", attnames, values)
+
+
+def invalidate_user(user_id):
+    try:
+        # الإصدار يعيش على الأقل بقدر أي نسخة خُزّنت قبله
+        cache.set(_version_key(user_id), uuid.uuid4().hex, settings.AUTH_USER_CACHE_TIMEOUT)
+        cache.delete(_key(user_id))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate cached auth user {user_id}: {e}")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # التحقق من إبطال التوكن يحتاج كلمة المرور، فنترك المسار الأصلي
+        if getattr(api_settings, "CHECK_REVOKE_TOKEN", False):
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = load_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
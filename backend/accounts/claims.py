@@ -0,0 +1,51 @@
+"""
+Verification status and profile ids carried as JWT claims.
+
+``MyTokenObtainPairSerializer`` adds ``verification_claims(user)`` to every
+token it issues, stamped with ``User.claims_version``. Anything that
+changes those facts (a WorkerVerification status change, a profile being
+created) calls ``bump_claims_version``, which invalidates the claims of
+every token already issued: ``current_claims`` then returns None and the
+caller falls back to the database. The refresh endpoint re-stamps
+outdated claims, so clients pick up the new values on their next refresh.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from .authentication import invalidate_user
+from .models import User
+
+CLAIMS = ("verification_status", "worker_profile_id", "client_profile_id", "claims_version")
+
+
+def verification_claims(user):
+    # استعلام واحد، والإصدار من قاعدة البيانات لأن النسخة في الذاكرة قد تكون أقدم
+    row = User.objects.filter(pk=user.pk).values_list(
+        "worker_profile__verification__status",
+        "worker_profile__id",
+        "client_profile__id",
+        "claims_version",
+    ).first()
+    if row is None:
+        return dict.fromkeys(CLAIMS)
+    return dict(zip(CLAIMS, row))
+
+
+def add_claims(token, user):
+    for name, value in verification_claims(user).items():
+        token[name] = value
+    return token
+
+
+def current_claims(token, user):
+    """The token's claims if they were issued for the user's current claims_version, else None."""
+    if token.get("claims_version") != user.claims_version:
+        return None
+    return {name: token.get(name) for name in CLAIMS}
+
+
+def bump_claims_version(user_id):
+    User.objects.filter(pk=user_id).update(claims_version=F("claims_version") + 1)
+    # update() لا يرسل post_save، فنحذف المستخدم المخزّن للمصادقة يدوياً
+    # بعد الـ commit، وإلا قد يُخزَّن الإصدار القديم من جديد قبل أن يُرى الجديد
+    transaction.on_commit(lambda: invalidate_user(user_id))
@@ -1,28 +1,54 @@
+from django.http import JsonResponse
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from .authentication import CachedJWTAuthentication
+from .claims import current_claims, verification_claims
+
+EXEMPT_PREFIXES = ('/api/verification/', '/api/auth/', '/admin/', '/static/', '/media/')
+
+
 class VerificationMiddleware:
+    """
+    Workers must be verified before using the API. For JWT requests the
+    status comes from the token's claims (accounts.claims), so a request
+    costs no query while the claims are current; otherwise one query.
+    """
     def __init__(self, get_response):
         self.get_response = get_response
+        self.authentication = CachedJWTAuthentication()
 
     def __call__(self, request):
-        if (request.user.is_authenticated and 
-            request.user.role == 'worker' and 
-            hasattr(request.user, 'worker_profile')):
-            
-            # التحقق من وجود verification وحالته
-            has_verification = hasattr(request.user.worker_profile, 'verification')
-            is_approved = has_verification and request.user.worker_profile.verification.status == 'approved'
-            
-            if not is_approved:
-                # استثناء مسارات التحقق والمسارات الأساسية
-                if (not request.path.startswith('/api/verification/') and
-                    not request.path.startswith('/api/auth/') and
-                    not request.path.startswith('/admin/') and
-                    not request.path.startswith('/static/') and
-                    not request.path.startswith('/media/')):
-                    
-                    return JsonResponse({
-                        'error': 'Verification required',
-                        'redirect': '/verification',
-                        'message': 'يجب التحقق من الهوية أولاً'
-                    }, status=403)
-        
-        return self.get_response(request)
\ No newline at end of file
+        # استثناء مسارات التحقق والمسارات الأساسية
+        if not request.path.startswith(EXEMPT_PREFIXES):
+            status = self._worker_verification(request)
+            if status is not None and status != 'approved':
+                return JsonResponse({
+                    'error': 'Verification required',
+                    'redirect': '/verification',
+                    'message': 'يجب التحقق من الهوية أولاً'
+                }, status=403)
+
+        return self.get_response(request)
+
+    def _worker_verification(self, request):
+        """Verification status of a worker ('' if none submitted); None for everyone else."""
+        user, token = self._authenticate(request)
+        if user is None or not user.is_authenticated or user.role != 'worker':
+            return None
+
+        claims = current_claims(token, user) if token is not None else None
+        if claims is None:
+            # claims قديمة أو جلسة بدون توكن: استعلام واحد
+            claims = verification_claims(user)
+        if not claims['worker_profile_id']:
+            return None
+        return claims['verification_status'] or ''
+
+    def _authenticate(self, request):
+        try:
+            result = self.authentication.authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            # الـ view سيرفض التوكن بنفسه
+            return None, None
+        if result is not None:
+            return result
+        return getattr(request, 'user', None), None
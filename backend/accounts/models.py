@@ -4,9 +4,12 @@ from django.conf import settings
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.contrib.gis.db import models as gis_models
+from core.tracking import TrackedFieldsMixin
 
 
-class User(AbstractUser):
+class User(TrackedFieldsMixin, AbstractUser):
+    tracked_fields = ('role',)
+
     phone_regex = RegexValidator(
         regex=r'^01[0-9]{9}$',
         message="Please enter a valid Egyptian phone number (11 digits starting with 01)"
@@ -45,6 +48,9 @@ class User(AbstractUser):
         verbose_name="Authentication Provider"
     )
 
+    # يزيد عند تغيّر بيانات التوكن (حالة التحقق، الملفات) فتُهمل claims التوكنات القديمة
+    claims_version = models.PositiveIntegerField(default=0, editable=False)
+
     # حل مشكلة الـ related_name clash
     groups = models.ManyToManyField(
         Group,
@@ -68,6 +74,17 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
 
+    def save(self, *args, **kwargs):
+        # claims_version يكتبه bump_claims_version فقط: نسخة حُمّلت قبل الزيادة
+        # لا تعيد الإصدار القديم (فتعود التوكنات الملغاة صالحة) إلا إذا طُلب صراحة
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'claims_version' and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
 
 class BaseProfile(models.Model):
     # location = gis_models.PointField(
@@ -222,8 +239,9 @@ class ClientProfile(BaseProfile):
             raise ValidationError("This profile is for clients only")
 
 
-class WorkerVerification(models.Model):
+class WorkerVerification(TrackedFieldsMixin, models.Model):
     """Model to handle worker identity verification"""
+    tracked_fields = ('status',)
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('approved', 'Approved'),
@@ -0,0 +1,197 @@
+"""
+Read model for the public provider profile.
+
+Everything the profile page shows is assembled by a single SQL statement:
+the user row joined to its worker profile and its current location
+(``location.CurrentLocation``), scalar subqueries for the completed-orders
+count and the review statistics, and array subqueries that return the
+active services and the five most recent reviews as JSON documents. The
+result is cached per provider by ``ProviderPublicProfileView`` (see
+``services.caching``).
+"""
+import json
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import (
+    Avg, CharField, Count, F, OuterRef, Subquery, TextField, Value,
+)
+from django.db.models.functions import Cast, Coalesce, JSONObject, NullIf
+from django.utils.dateparse import parse_datetime
+
+from orders.models import Order
+from reviews.models import Review
+from services.models import Service
+from .models import User, WorkerProfile
+
+RECENT_REVIEWS = 5
+
+
+def _aggregate(queryset, group_field, **aggregate):
+    # تجميع داخل subquery: GROUP BY على الحقل المرتبط بالمستخدم الخارجي
+    (name, expression), = aggregate.items()
+    return Subquery(
+        queryset.order_by().values(group_field).annotate(**{name: expression}).values(name)[:1]
+    )
+
+
+def _json_rows(queryset, **fields):
+    return ArraySubquery(
+        queryset.values(doc=Cast(JSONObject(**fields), TextField()))
+    )
+
+
+def provider_profile_queryset():
+    provider_reviews = Review.objects.filter(
+        service__provider=OuterRef("pk"), is_deleted=False
+    )
+
+    return User.objects.filter(role="worker").select_related("worker_profile").annotate(
+        location_point=F("current_location__location"),
+        location_address=F("current_location__address"),
+        location_city=F("current_location__city"),
+        location_neighborhood=F("current_location__neighborhood"),
+        has_location=F("current_location__user_id"),
+        completed_orders=Coalesce(_aggregate(
+            Order.objects.filter(worker=OuterRef("pk"), status="completed"),
+            "worker", total=Count("id"),
+        ), 0),
+        review_avg=_aggregate(provider_reviews, "service__provider", avg=Avg("score")),
+        review_count=Coalesce(_aggregate(provider_reviews, "service__provider", total=Count("id")), 0),
+        services_json=_json_rows(
+            Service.objects.filter(provider=OuterRef("pk"), is_active=True, is_deleted=False)
+            .order_by("id"),
+            id="id",
+            title="title",
+            description="description",
+            price=Cast("price", CharField()),
+            category_id="category_id",
+            category_name="category__name",
+            city="city",
+            created_at="created_at",
+        ),
+        reviews_json=_json_rows(
+            provider_reviews.order_by("-created_at")[:RECENT_REVIEWS],
+            id="id",
+            rating="score",
+            comment="comment",
+            created_at="created_at",
+            client_name=Coalesce(NullIf("customer__first_name", Value("")), "customer__username"),
+            service_name="service__title",
+        ),
+    )
+
+
+def _iso(value):
+    parsed = parse_datetime(value) if value else None
+    return parsed.isoformat() if parsed else None
+
+
+def _service_payload(doc):
+    return {
+        "id": doc["id"],
+        "title": doc["title"],
+        "description": doc["description"],
+        "price": doc["price"] if doc["price"] and float(doc["price"]) else "0.00",
+        "category": {
+            "id": doc["category_id"],
+            "name": doc["category_name"],
+        } if doc["category_id"] else None,
+        "city": doc["city"],
+        "created_at": _iso(doc["created_at"]),
+    }
+
+
+def _review_payload(doc):
+    return {
+        "id": doc["id"],
+        "rating": doc["rating"],
+        "comment": doc["comment"],
+        "created_at": _iso(doc["created_at"]),
+        "client_name": doc["client_name"],
+        "service_name": doc["service_name"],
+    }
+
+
+def _profile_payload(worker_profile):
+    if worker_profile is None:
+        return {
+            "job_title": None, "hourly_rate": None, "experience_years": None,
+            "skills": None, "services_provided": None, "estimated_price": None,
+            "certifications": None, "neighborhood": None, "is_complete": False,
+            "created_at": None, "updated_at": None,
+        }
+    return {
+        "job_title": worker_profile.job_title,
+        "hourly_rate": str(worker_profile.hourly_rate) if worker_profile.hourly_rate else None,
+        "experience_years": worker_profile.experience_years,
+        "skills": worker_profile.skills,
+        "services_provided": worker_profile.services_provided,
+        "estimated_price": str(worker_profile.estimated_price) if worker_profile.estimated_price else None,
+        "certifications": worker_profile.certifications,
+        "neighborhood": worker_profile.neighborhood,
+        "is_complete": worker_profile.is_complete,
+        "created_at": worker_profile.created_at.isoformat(),
+        "updated_at": worker_profile.updated_at.isoformat(),
+    }
+
+
+def build_provider_profile(provider_id):
+    """Public profile payload for a worker, or None if there is no such worker."""
+    provider = provider_profile_queryset().filter(pk=provider_id).first()
+    if provider is None:
+        return None
+
+    try:
+        worker_profile = provider.worker_profile
+    except WorkerProfile.DoesNotExist:
+        worker_profile = None
+
+    location = None
+    if provider.has_location:
+        point = provider.location_point
+        location = {
+            "lat": point.y if point else None,
+            "lng": point.x if point else None,
+            "address": provider.location_address,
+            "city": provider.location_city,
+            "neighborhood": provider.location_neighborhood,
+        }
+
+    services = [_service_payload(json.loads(doc)) for doc in provider.services_json or []]
+    reviews = [_review_payload(json.loads(doc)) for doc in provider.reviews_json or []]
+
+    return {
+        "id": provider.id,
+        "username": provider.username,
+        "first_name": provider.first_name,
+        "last_name": provider.last_name,
+        "email": provider.email,
+        "phone": provider.phone,
+        "role": provider.role,
+        "date_joined": provider.date_joined.isoformat(),
+
+        # Worker profile information
+        "profile": _profile_payload(worker_profile),
+
+        # Location information
+        "location": location,
+
+        # Services information
+        "services": services,
+        "total_services": len(services),
+
+        # Rating information
+        "rating": {
+            "average_rating": round(float(provider.review_avg or 0.0), 1),
+            "total_ratings": provider.review_count,
+            "recent_reviews": reviews,
+        },
+
+        # Statistics
+        "stats": {
+            "completed_orders": provider.completed_orders,
+            "total_services": len(services),
+            "years_experience": worker_profile.experience_years if worker_profile else 0,
+            "member_since": provider.date_joined.year,
+        },
+    }
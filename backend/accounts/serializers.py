@@ -1,8 +1,11 @@
 from rest_framework import serializers
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer
 from .models import User, WorkerProfile, ClientProfile
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import load_user
+from .claims import add_claims
 from django.contrib.auth import authenticate
 from django import forms
 from django.contrib.auth import get_user_model
@@ -22,10 +25,24 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['username'] = user.username
         token['email'] = user.email
         token['role'] = user.role   # ممكن تضيفي role كمان
+        # حالة التحقق وأرقام الملفات (accounts.claims)
+        add_claims(token, user)
 
         return token
 
 
+# 🔹 Token Refresh Serializer: يحدّث الـ claims القديمة في توكن الوصول الجديد
+class MyTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'], verify=False)
+        user = load_user(access[api_settings.USER_ID_CLAIM])
+        if user is not None and access.get('claims_version') != user.claims_version:
+            add_claims(access, user)
+            data['access'] = str(access)
+        return data
+
+
 # 🔹 Custom User Create Serializer (للتسجيل)
 class CustomUserCreateSerializer(BaseUserCreateSerializer):
     role = serializers.ChoiceField(
@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
-from .models import WorkerProfile, ClientProfile
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import invalidate_user
+from .claims import bump_claims_version
+from .models import WorkerProfile, ClientProfile, WorkerVerification
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -10,4 +14,34 @@ def create_user_profile(sender, instance, created, **kwargs):
             if instance.role == 'worker':
                 WorkerProfile.objects.get_or_create(user=instance)
             elif instance.role == 'client':
-                ClientProfile.objects.get_or_create(user=instance)
\ No newline at end of file
+                ClientProfile.objects.get_or_create(user=instance)
+
+# حذف المستخدم المخزّن للمصادقة بعد أي تعديل (الدور، التفعيل، ...)
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_auth_user(sender, instance, **kwargs):
+    user_id = getattr(instance, api_settings.USER_ID_FIELD)
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+# تغيّر حالة التحقق أو إنشاء ملف يجعل claims التوكنات الحالية قديمة
+@receiver(post_save, sender=WorkerVerification)
+def revoke_claims_on_verification_change(sender, instance, created, raw=False, **kwargs):
+    if raw or not (created or instance.has_changed('status')):
+        return
+    user_id = WorkerProfile.objects.filter(pk=instance.worker_id).values_list('user_id', flat=True).first()
+    if user_id:
+        bump_claims_version(user_id)
+
+
+@receiver(post_delete, sender=WorkerVerification)
+def revoke_claims_on_verification_delete(sender, instance, **kwargs):
+    user_id = WorkerProfile.objects.filter(pk=instance.worker_id).values_list('user_id', flat=True).first()
+    if user_id:
+        bump_claims_version(user_id)
+
+
+@receiver(post_save, sender=WorkerProfile)
+@receiver(post_save, sender=ClientProfile)
+def revoke_claims_on_profile_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump_claims_version(instance.user_id)
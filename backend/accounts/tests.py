@@ -1,3 +1,140 @@
+from unittest import mock
+
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from location.models import CurrentLocation
+from orders.models import Order
+from reviews.models import Review
+from services.models import Service
+from . import authentication
+from .authentication import invalidate_user, load_user
+from .claims import bump_claims_version, current_claims
+from .models import User
+from .profiles import RECENT_REVIEWS, build_provider_profile
+
+
+class LoadUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="client", email="client@example.com", password="pass", role="client"
+        )
+
+    def test_second_lookup_is_served_from_cache(self):
+        load_user(self.user.pk)
+
+        with self.assertNumQueries(0):
+            user = load_user(self.user.pk)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.role, "client")
+
+    def test_invalidate_reloads_changed_user(self):
+        load_user(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(role="worker")
+        invalidate_user(self.user.pk)
+
+        self.assertEqual(load_user(self.user.pk).role, "worker")
+
+    def test_row_read_before_concurrent_invalidation_is_not_reused(self):
+        fetch = authentication._fetch
+
+        def read_then_concurrent_write(user_id, attnames):
+            values = fetch(user_id, attnames)
+            # طلب آخر يعدّل المستخدم بين قراءتنا وتخزينها
+            User.objects.filter(pk=user_id).update(role="worker")
+            invalidate_user(user_id)
+            return values
+
+        with mock.patch.object(authentication, "_fetch", side_effect=read_then_concurrent_write):
+            self.assertEqual(load_user(self.user.pk).role, "client")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(load_user(self.user.pk).role, "worker")
+
+    def test_missing_user(self):
+        self.assertIsNone(load_user(999999))
+
+
+class ClaimsVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="worker", email="worker@example.com", password="pass", role="worker"
+        )
+        # إنشاء ملف العامل يرفع الإصدار مرة
+        self.user.refresh_from_db()
+
+    def test_cached_user_is_invalidated_after_commit(self):
+        self.assertEqual(load_user(self.user.pk).claims_version, self.user.claims_version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_claims_version(self.user.pk)
+            # قبل الـ commit يبقى المخزّن كما هو
+            with self.assertNumQueries(0):
+                load_user(self.user.pk)
+
+        self.assertEqual(load_user(self.user.pk).claims_version, self.user.claims_version + 1)
+
+    def test_saving_a_stale_instance_keeps_the_bumped_version(self):
+        stale = User.objects.get(pk=self.user.pk)
+        bump_claims_version(self.user.pk)
+
+        stale.first_name = "عامل"
+        stale.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, "عامل")
+        self.assertEqual(self.user.claims_version, stale.claims_version + 1)
+
+    def test_outdated_token_claims_are_rejected(self):
+        token = {"claims_version": self.user.claims_version}
+        self.assertIsNotNone(current_claims(token, self.user))
+
+        bump_claims_version(self.user.pk)
+        self.user.refresh_from_db()
+
+        self.assertIsNone(current_claims(token, self.user))
+
+
+class ProviderProfileTests(TestCase):
+    def setUp(self):
+        self.worker = User.objects.create_user(
+            username="worker", email="worker@example.com", password="pass", role="worker"
+        )
+        self.customer = User.objects.create_user(
+            username="client", email="client@example.com", password="pass", role="client"
+        )
+        self.service = Service.objects.create(provider=self.worker, title="سباكة")
+        Service.objects.create(provider=self.worker, title="قديمة", is_active=False)
+        CurrentLocation.objects.create(
+            user=self.worker, location=Point(31.2357, 30.0444, srid=4326), city="القاهرة"
+        )
+        for score in (5, 4, 4, 3, 5, 5):
+            Review.objects.create(service=self.service, customer=self.customer, score=score)
+        Review.objects.create(service=self.service, customer=self.customer, score=1, is_deleted=True)
+        for status in ("completed", "completed", "pending"):
+            Order.objects.create(customer=self.customer, worker=self.worker, service=self.service, status=status)
+
+    def test_profile_is_built_in_one_query(self):
+        with self.assertNumQueries(1):
+            profile = build_provider_profile(self.worker.pk)
+
+        self.assertEqual(profile["username"], "worker")
+        self.assertEqual([service["title"] for service in profile["services"]], ["سباكة"])
+        self.assertEqual(profile["location"]["city"], "القاهرة")
+        self.assertAlmostEqual(profile["location"]["lat"], 30.0444)
+        self.assertEqual(profile["stats"]["completed_orders"], 2)
+
+    def test_rating_ignores_deleted_reviews(self):
+        rating = build_provider_profile(self.worker.pk)["rating"]
+
+        self.assertEqual(rating["total_ratings"], 6)
+        self.assertEqual(rating["average_rating"], 4.3)
+        self.assertEqual(len(rating["recent_reviews"]), RECENT_REVIEWS)
+        self.assertEqual(rating["recent_reviews"][0]["client_name"], "client")
+
+    def test_unknown_or_non_worker_is_none(self):
+        self.assertIsNone(build_provider_profile(self.customer.pk))
+        self.assertIsNone(build_provider_profile(999999))
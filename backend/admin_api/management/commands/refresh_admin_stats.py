@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from admin_api.stats import refresh_dashboard_snapshot
+
+
+class Command(BaseCommand):
+    help = "Recompute the admin dashboard statistics snapshot (AdminStatsSnapshot)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Keep refreshing every N seconds (default: refresh once and exit).")
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            refresh_dashboard_snapshot()
+            if not interval:
+                break
+            time.sleep(interval)
+        self.stdout.write(self.style.SUCCESS("Admin stats snapshot refreshed"))
@@ -49,4 +49,16 @@ class PlatformSetting(models.Model):
     group = models.CharField(max_length=50, blank=True, null=True)  # general, policy, contact
 
     def __str__(self):
-        return f"{self.group or 'general'}:{self.key}"
\ No newline at end of file
+        return f"{self.group or 'general'}:{self.key}"
+
+
+class AdminStatsSnapshot(models.Model):
+    """Precomputed dashboard numbers so the admin SPA can poll without recounting."""
+    KEY_DASHBOARD = 'dashboard'
+
+    key = models.CharField(max_length=50, unique=True)
+    data = models.JSONField(default=dict)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key} @ {self.computed_at}"
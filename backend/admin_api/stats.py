@@ -0,0 +1,75 @@
+"""
+Admin dashboard statistics.
+
+Each table is read once: per-status counts come from conditional
+aggregation (``Count(filter=Q(...))``) in the same statement as the total.
+When ``ADMIN_STATS_SNAPSHOT_MAX_AGE`` is set, the dashboard is served from
+the ``AdminStatsSnapshot`` row, refreshed by the ``refresh_admin_stats``
+command (or lazily, once the snapshot is older than the max age).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+
+from invoices.models import Invoice
+from orders.models import Booking, Order
+from ratings.models import Rating
+from reviews.models import Review
+from services.models import Service
+from .models import AdminStatsSnapshot
+
+User = get_user_model()
+
+ORDER_STATUSES = ('pending', 'accepted', 'completed', 'cancelled')
+BOOKING_STATUSES = ('pending', 'confirmed', 'completed', 'cancelled')
+
+
+def status_counts(queryset, statuses, field='status'):
+    """``(total, {status: count})`` in one query."""
+    aggregates = {
+        status: Count('id', filter=Q(**{field: status}))
+        for status in statuses
+    }
+    result = queryset.aggregate(total=Count('id'), **aggregates)
+    total = result.pop('total')
+    return total, result
+
+
+def compute_dashboard_stats():
+    orders_count, orders_status = status_counts(Order.objects.all(), ORDER_STATUSES)
+    bookings_count, bookings_status = status_counts(Booking.objects.all(), BOOKING_STATUSES)
+    ratings = Rating.objects.aggregate(count=Count('id'), avg=Avg('score'))
+
+    return {
+        "users_count": User.objects.count(),
+        "services_count": Service.objects.count(),
+        "orders_count": orders_count,
+        "bookings_count": bookings_count,
+        "reviews_count": Review.objects.count(),
+        "ratings_count": ratings["count"],
+        "invoices_count": Invoice.objects.count(),
+        "avg_rating": ratings["avg"] or 0,
+        "orders_status": orders_status,
+        "bookings_status": bookings_status,
+    }
+
+
+def refresh_dashboard_snapshot():
+    data = compute_dashboard_stats()
+    AdminStatsSnapshot.objects.update_or_create(
+        key=AdminStatsSnapshot.KEY_DASHBOARD,
+        defaults={"data": data, "computed_at": timezone.now()},
+    )
+    return data
+
+
+def get_dashboard_stats(fresh=False):
+    max_age = getattr(settings, "ADMIN_STATS_SNAPSHOT_MAX_AGE", 0)
+    if fresh or not max_age:
+        return compute_dashboard_stats()
+
+    snapshot = AdminStatsSnapshot.objects.filter(key=AdminStatsSnapshot.KEY_DASHBOARD).first()
+    if snapshot and (timezone.now() - snapshot.computed_at).total_seconds() <= max_age:
+        return snapshot.data
+    return refresh_dashboard_snapshot()
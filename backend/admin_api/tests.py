@@ -1,3 +1,98 @@
-from django.test import TestCase
+import gzip
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from orders.models import Order
+from services.models import Service
+from .exports import ExportError, export_rows, streaming_csv_response
+from .models import AdminStatsSnapshot
+from .stats import compute_dashboard_stats, get_dashboard_stats, status_counts
+
+User = get_user_model()
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username="client", email="client@example.com", password="pass", role="client"
+        )
+        self.service = Service.objects.create(title="سباكة")
+        for status in ("pending", "pending", "accepted", "completed"):
+            Order.objects.create(customer=self.customer, service=self.service, status=status)
+
+    def test_status_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            total, counts = status_counts(Order.objects.all(), ("pending", "accepted", "completed", "cancelled"))
+
+        self.assertEqual(total, 4)
+        self.assertEqual(counts, {"pending": 2, "accepted": 1, "completed": 1, "cancelled": 0})
+
+    def test_dashboard_reads_each_table_once(self):
+        with self.assertNumQueries(7):
+            stats = compute_dashboard_stats()
+
+        self.assertEqual(stats["orders_count"], 4)
+        self.assertEqual(stats["services_count"], 1)
+        self.assertEqual(stats["orders_status"]["pending"], 2)
+        self.assertEqual(stats["avg_rating"], 0)
+
+    @override_settings(ADMIN_STATS_SNAPSHOT_MAX_AGE=300)
+    def test_snapshot_is_served_until_it_is_too_old(self):
+        self.assertEqual(get_dashboard_stats()["orders_count"], 4)
+        Order.objects.create(customer=self.customer, service=self.service)
+
+        self.assertEqual(get_dashboard_stats()["orders_count"], 4)
+        self.assertEqual(get_dashboard_stats(fresh=True)["orders_count"], 5)
+
+        AdminStatsSnapshot.objects.update(computed_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(get_dashboard_stats()["orders_count"], 5)
+
+
+class CsvExportTests(TestCase):
+    def setUp(self):
+        customer = User.objects.create_user(
+            username="client", email="client@example.com", password="pass", role="client"
+        )
+        service = Service.objects.create(title="سباكة")
+        self.orders = [Order.objects.create(customer=customer, service=service) for _ in range(3)]
+        Order.objects.filter(pk=self.orders[0].pk).update(created_at=timezone.now() - timedelta(days=10))
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_streams_header_and_rows(self):
+        lines = self.body(streaming_csv_response("orders")).decode("utf-8").splitlines()
+
+        self.assertEqual(lines[0].split(",")[:3], ["ID", "Customer ID", "Customer"])
+        self.assertEqual([int(line.split(",")[0]) for line in lines[1:]], [o.pk for o in self.orders])
+        self.assertIn("سباكة", lines[1])
+
+    def test_date_to_includes_the_whole_day(self):
+        day = timezone.localdate(timezone.now() - timedelta(days=10)).isoformat()
+        _, rows = export_rows("orders", date_from=day, date_to=day)
+
+        self.assertEqual([row[0] for row in rows], [self.orders[0].pk])
+
+    def test_gzip_stream(self):
+        response = streaming_csv_response("orders", gzip=True)
+
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn('filename="orders.csv.gz"', response["Content-Disposition"])
+        self.assertEqual(len(gzip.decompress(self.body(response)).splitlines()), 4)
+
+    def test_rejects_unknown_export_and_bad_dates(self):
+        with self.assertRaises(ExportError):
+            export_rows("users")
+        with self.assertRaises(ExportError):
+            export_rows("orders", date_from="not-a-date")
+        with self.assertRaises(ExportError):
+            export_rows("orders", date_to="2024-13-45")
+
+    def test_rows_come_from_the_given_queryset(self):
+        queryset = Order.objects.filter(pk__in=[o.pk for o in self.orders[1:]])
+        _, rows = export_rows("orders", queryset=queryset)
+
+        self.assertEqual([row[0] for row in rows], [o.pk for o in self.orders[1:]])
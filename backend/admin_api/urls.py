@@ -6,7 +6,7 @@ from .views import (
     InvoiceViewSet, AdminActionLogViewSet, AdminNotificationViewSet,
     AdminStatsView, AdminMeView, CategoryViewSet, FinancialReportView,
     PlatformSettingViewSet, AdminLoginView, AdminRegisterView,OrdersTrendView, RecentOrdersView,
-    SettingsViewSet
+    SettingsViewSet, CacheStatsView, AdminExportView
 )
 
 router = DefaultRouter()
@@ -25,6 +25,8 @@ urlpatterns = [
     path("login/", AdminLoginView.as_view(), name="admin-login"),
     path("register/", AdminRegisterView.as_view(), name="admin-register"),
     path("stats/", AdminStatsView.as_view(), name="admin-stats"),
+    path("cache-stats/", CacheStatsView.as_view(), name="admin-cache-stats"),
+    path("exports/<str:name>/", AdminExportView.as_view(), name="admin-export"),
     path("orders-trend/", OrdersTrendView.as_view(), name="orders-trend"),
     path("recent-orders/", RecentOrdersView.as_view(), name="recent-orders"),
     path("financial-report/", FinancialReportView.as_view(), name="financial-report"),
@@ -29,6 +29,9 @@ from .serializers import (
     AdminCategorySerializer, PlatformSettingSerializer
 )
 from .permissions import IsStaffOrSuperuser
+from core.cache import flush_stats, response_cache_stats
+from .stats import get_dashboard_stats
+from .exports import ExportError, streaming_csv_response
 
 User = get_user_model()
 
@@ -269,14 +272,28 @@ class InvoiceViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["get"])
     def export_csv(self, request):
-        qs = self.get_queryset()
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="invoices.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Booking', 'Amount', 'Status', 'Issued At', 'Paid At'])
-        for inv in qs:
-            writer.writerow([inv.id, getattr(inv.booking, 'id', None), inv.amount, inv.status, inv.issued_at, inv.paid_at])
-        return response
+        return _export_response(request, "invoices", queryset=self.get_queryset())
+
+# ---------------- Exports ----------------
+def _export_response(request, name, queryset=None):
+    params = request.query_params
+    try:
+        return streaming_csv_response(
+            name,
+            date_from=params.get("date_from"),
+            date_to=params.get("date_to"),
+            gzip=params.get("gzip") in ("1", "true"),
+            queryset=queryset,
+        )
+    except ExportError as e:
+        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+class AdminExportView(APIView):
+    """تصدير CSV متدفق: invoices / orders / earnings / reviews"""
+    permission_classes = [IsStaffOrSuperuser]
+
+    def get(self, request, name):
+        return _export_response(request, name)
 
 # ---------------- Logs ----------------
 class AdminActionLogViewSet(viewsets.ReadOnlyModelViewSet):
@@ -292,34 +309,18 @@ class AdminStatsView(APIView):
     permission_classes = [IsStaffOrSuperuser]
 
     def get(self, request):
-        # إحصائيات الطلبات حسب الحالة
-        orders_status = {
-            'pending': Order.objects.filter(status='pending').count(),
-            'accepted': Order.objects.filter(status='accepted').count(),
-            'completed': Order.objects.filter(status='completed').count(),
-            'cancelled': Order.objects.filter(status='cancelled').count(),
-        }
-        
-        # إحصائيات الحجوزات حسب الحالة
-        bookings_status = {
-            'pending': Booking.objects.filter(status='pending').count(),
-            'confirmed': Booking.objects.filter(status='confirmed').count(),
-            'completed': Booking.objects.filter(status='completed').count(),
-            'cancelled': Booking.objects.filter(status='cancelled').count(),
-        }
-        
-        return Response({
-            "users_count": User.objects.count(),
-            "services_count": Service.objects.count(),
-            "orders_count": Order.objects.count(),
-            "bookings_count": Booking.objects.count(),
-            "reviews_count": Review.objects.count(),
-            "ratings_count": Rating.objects.count(),
-            "invoices_count": Invoice.objects.count(),
-            "avg_rating": Rating.objects.aggregate(avg=Avg("score"))["avg"] or 0,
-            "orders_status": orders_status,
-            "bookings_status": bookings_status,
-        })
+        # كل جدول باستعلام واحد (Count مع filter) أو من الـ snapshot إن كان مفعلاً
+        fresh = request.query_params.get("fresh") in ("1", "true")
+        return Response(get_dashboard_stats(fresh=fresh))
+
+class CacheStatsView(APIView):
+    """عدد مرات الإصابة/الإخفاق لكاش الصفحات العامة (لتحديد حجم Redis)"""
+    permission_classes = [IsStaffOrSuperuser]
+    CACHED_VIEWS = ["service_categories", "service_types", "service_list", "provider_profile"]
+
+    def get(self, request):
+        flush_stats()
+        return Response(response_cache_stats(self.CACHED_VIEWS))
 
 class FinancialReportView(APIView):
     permission_classes = [IsStaffOrSuperuser]
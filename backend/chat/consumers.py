@@ -2,6 +2,8 @@ import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from .buffer import buffer_for
 from .models import Conversation, Message
 from orders.models import Order
 
@@ -18,15 +20,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close(code=4001)
             return
 
-        # Check if order exists and user has permission to access it
+        # Check if order exists and user has permission to access it,
+        # and resolve the conversation once for the whole connection
         try:
-            order = await self.get_order(self.order_id)
-            if not await self.user_can_access_order(self.user, order):
-                await self.close(code=4003)
-                return
+            context = await self.get_chat_context(self.user, self.order_id)
         except Order.DoesNotExist:
             await self.close(code=4004)
             return
+        if context is None:
+            await self.close(code=4003)
+            return
+
+        self.conversation_id = context["conversation_id"]
+        self.username = self.user.username
 
         # Join chat room
         await self.channel_layer.group_add(
@@ -47,34 +53,44 @@ class ChatConsumer(AsyncWebsocketConsumer):
         try:
             data = json.loads(text_data)
             message = data.get('message', '').strip()
-            
+
             # Validate message
             if not message:
                 await self.send(text_data=json.dumps({
                     'error': 'Message cannot be empty'
                 }))
                 return
-            
+
             if len(message) > 1000:  # Limit message length
                 await self.send(text_data=json.dumps({
                     'error': 'Message too long (max 1000 characters)'
                 }))
                 return
 
-            # Save and broadcast message
-            msg = await self.save_message(self.user.id, self.order_id, message)
+            # نحفظ أولاً (مجمّعة مع رسائل الغرفة المعلقة في هذه العملية) ثم نبث
+            msg = Message(
+                conversation_id=self.conversation_id,
+                sender_id=self.user.id,
+                message=message,
+                timestamp=timezone.now(),
+            )
+            try:
+                await buffer_for(self.conversation_id).save(msg)
+            except Exception:
+                await self.messages_not_saved([msg])
+                return
 
             # Broadcast to group
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
                     'type': 'chat_message',
-                    'message': msg["message"],
-                    'username': msg["username"],
-                    'timestamp': msg["timestamp"]
+                    'message': msg.message,
+                    'username': self.username,
+                    'timestamp': msg.timestamp.strftime("%Y-%m-%d %H:%M:%S")
                 }
             )
-            
+
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
                 'error': 'Invalid JSON format'
@@ -91,31 +107,30 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'timestamp': event['timestamp']
         }))
 
-    @database_sync_to_async
-    def get_order(self, order_id):
-        return Order.objects.get(id=order_id)
+    async def order_closed(self, event):
+        # الطلب اكتمل أو أُلغي: نغلق الاتصال
+        await self.send(text_data=json.dumps({
+            'type': 'order_closed',
+            'order_id': event['order_id']
+        }))
+        await self.close()
 
-    @database_sync_to_async
-    def user_can_access_order(self, user, order):
-        """Check if user can access this order (client or worker)"""
-        return (user == order.customer or user == order.worker or user.is_staff)
+    async def messages_not_saved(self, messages):
+        await self.send(text_data=json.dumps({
+            'error': 'Failed to save message',
+            'messages': [m.message for m in messages]
+        }))
 
     @database_sync_to_async
-    def save_message(self, sender_id, order_id, message):
-        try:
-            sender = User.objects.get(id=sender_id)
-            order = Order.objects.get(id=order_id)
-            conversation, _ = Conversation.objects.get_or_create(order=order)
-
-            msg = Message.objects.create(
-                conversation=conversation,
-                sender=sender,
-                message=message
-            )
-            return {
-                "message": msg.message,
-                "username": sender.username,
-                "timestamp": msg.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            }
-        except Exception as e:
-            raise Exception(f"Failed to save message: {str(e)}")
+    def get_chat_context(self, user, order_id):
+        """
+        Load the order, check access (client, worker or staff) and get or
+        create its conversation. Returns None when access is denied.
+        """
+        order = Order.objects.only('id', 'customer_id', 'worker_id').get(id=order_id)
+        if not (user.id in (order.customer_id, order.worker_id) or user.is_staff):
+            return None
+        conversation, _ = Conversation.objects.get_or_create(order=order)
+        return {
+            "conversation_id": conversation.id,
+        }
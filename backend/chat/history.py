@@ -0,0 +1,73 @@
+"""
+Cursor pagination over a conversation's messages.
+
+Cursors are message ids. ``before`` walks back from a message (how the
+chat window loads older history), ``after`` walks forward from one (catch
+up after a reconnect); with neither, the newest page is returned. The
+anchor is looked up by primary key first (an id that is not a message of
+the conversation is an error, not an empty page), and every page is an
+index range scan on ``(conversation_id, timestamp, id)``.
+"""
+from django.db.models import Q
+
+from orders.pagination import parse_page_size
+from .models import Message
+
+DEFAULT_PAGE_SIZE = 50
+
+
+class InvalidMessageCursor(ValueError):
+    pass
+
+
+def _parse_id(value):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise InvalidMessageCursor("before/after must be a message id")
+
+
+def message_page(conversation, before=None, after=None, page_size=None):
+    """
+    Return ``(messages, has_more)`` where ``messages`` is in chronological
+    order and ``has_more`` says whether more rows exist in the paging
+    direction (older for ``before``/newest page, newer for ``after``).
+    """
+    before, after = _parse_id(before), _parse_id(after)
+    if before is not None and after is not None:
+        raise InvalidMessageCursor("Use either before or after, not both")
+    page_size = parse_page_size(page_size, default=DEFAULT_PAGE_SIZE)
+
+    messages = Message.objects.filter(conversation=conversation).select_related('sender')
+    anchor_id = before if before is not None else after
+    if anchor_id is not None:
+        anchor_ts = (
+            Message.objects.filter(pk=anchor_id, conversation=conversation)
+            .values_list('timestamp', flat=True).first()
+        )
+        if anchor_ts is None:
+            raise InvalidMessageCursor("Unknown message id")
+        # timestamp <= / >= هو حد نطاق الفهرس، والـ OR يحسم التساوي
+        if before is not None:
+            messages = messages.filter(
+                Q(timestamp__lte=anchor_ts),
+                Q(timestamp__lt=anchor_ts) | Q(timestamp=anchor_ts, id__lt=anchor_id),
+            )
+        else:
+            messages = messages.filter(
+                Q(timestamp__gte=anchor_ts),
+                Q(timestamp__gt=anchor_ts) | Q(timestamp=anchor_ts, id__gt=anchor_id),
+            )
+
+    if after is not None:
+        rows = list(messages.order_by('timestamp', 'id')[:page_size + 1])
+        has_more = len(rows) > page_size
+        return rows[:page_size], has_more
+
+    rows = list(messages.order_by('-timestamp', '-id')[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    rows.reverse()
+    return rows, has_more
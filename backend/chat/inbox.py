@@ -0,0 +1,147 @@
+"""
+Denormalized inbox state on Conversation.
+
+``record_messages`` is called for every inserted message (post_save for
+single creates, explicitly after ``bulk_create``) and moves
+``last_message`` / ``last_message_at`` forward, bumps ``message_count``
+and the unread counter of the side that did not send the message.
+``mark_read`` / ``mark_all_read`` flip ``Message.is_read`` and reset the
+reader's counter. The inbox itself then needs no per-row queries.
+
+Both also keep the per-user ``chat`` counter in ``notifications.unread``
+in step, which pushes the change to the user's open sockets. That counter
+only covers conversations whose order status is in
+``Conversation.UNREAD_ORDER_STATUSES``; ``order_status_changed`` moves a
+conversation's unread messages in or out of it when the order does.
+"""
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Max, Q, Value, When
+from django.utils import timezone
+
+from notifications import unread
+from orders.models import Order
+from .models import Conversation, Message
+
+
+def record_messages(conversation_id, messages):
+    """
+    Fold newly inserted ``messages`` (all in one conversation) into the
+    summary row.
+    """
+    if not messages:
+        return
+    # الحالة تُقرأ في كل مرة: قد يُقبل الطلب أو يُلغى والغرفة مفتوحة
+    customer_id, worker_id, status = (
+        Order.objects.filter(conversation__id=conversation_id)
+        .values_list("customer_id", "worker_id", "status").first()
+    ) or (None, None, None)
+    last = max(messages, key=lambda m: (m.timestamp, m.id))
+    from_customer = sum(1 for m in messages if m.sender_id == customer_id)
+    from_others = len(messages) - from_customer
+    # رسالة أقدم من الملخص الحالي لا تغيّر آخر رسالة
+    is_newer = Q(last_message_at__lte=last.timestamp)
+
+    Conversation.objects.filter(pk=conversation_id).update(
+        message_count=F("message_count") + len(messages),
+        customer_unread=F("customer_unread") + from_others,
+        worker_unread=F("worker_unread") + from_customer,
+        last_message=Case(
+            When(is_newer, then=Value(last.id)),
+            default=F("last_message"),
+            output_field=models.BigIntegerField(),
+        ),
+        last_message_at=Case(
+            When(is_newer, then=Value(last.timestamp)),
+            default=F("last_message_at"),
+            output_field=models.DateTimeField(),
+        ),
+    )
+    if status in Conversation.UNREAD_ORDER_STATUSES:
+        unread.add(unread.CHAT, {customer_id: from_others, worker_id: from_customer})
+
+
+def order_status_changed(order, old_status):
+    """
+    Add (or remove) the unread messages of ``order``'s conversation to the
+    participants' counters when the order enters (or leaves) the counted
+    statuses.
+    """
+    was_counted = old_status in Conversation.UNREAD_ORDER_STATUSES
+    if was_counted == (order.status in Conversation.UNREAD_ORDER_STATUSES):
+        return
+    pending = (
+        Conversation.objects.filter(order=order)
+        .values_list("customer_unread", "worker_unread").first()
+    )
+    if not pending:
+        return
+    sign = -1 if was_counted else 1
+    unread.add(unread.CHAT, {
+        order.customer_id: sign * pending[0],
+        order.worker_id: sign * pending[1],
+    })
+
+
+def _unread_from_others(queryset, user):
+    return queryset.filter(is_read=False).exclude(sender=user)
+
+
+def mark_read(conversation, user):
+    """Mark the other side's messages in ``conversation`` read for ``user``."""
+    updated = _unread_from_others(conversation.messages, user).update(
+        is_read=True, read_at=timezone.now()
+    )
+    counter = "customer_unread" if user.id == conversation.order.customer_id else "worker_unread"
+    Conversation.objects.filter(pk=conversation.pk).update(**{counter: 0})
+    if conversation.order.status in Conversation.UNREAD_ORDER_STATUSES:
+        unread.add(unread.CHAT, {user.id: -updated})
+    return updated
+
+
+def mark_all_read(user):
+    participant = Q(order__customer=user) | Q(order__worker=user)
+    updated = _unread_from_others(
+        Message.objects.filter(
+            Q(conversation__order__customer=user) | Q(conversation__order__worker=user)
+        ), user
+    ).update(is_read=True, read_at=timezone.now())
+    conversations = Conversation.objects.filter(participant)
+    conversations.filter(order__customer=user).update(customer_unread=0)
+    conversations.exclude(order__customer=user).update(worker_unread=0)
+    unread.reset(unread.CHAT, user.id)
+    return updated
+
+
+def rebuild_inbox(batch_size=1000):
+    """Recompute the summary columns of every conversation from its messages."""
+    from_customer = Q(sender_id=F("conversation__order__customer_id"))
+    rows = (
+        Message.objects.order_by()
+        .values("conversation_id")
+        .annotate(
+            count=Count("id"),
+            last_id=Max("id"),
+            last_at=Max("timestamp"),
+            unread_from_customer=Count("id", filter=Q(is_read=False) & from_customer),
+            unread_from_others=Count("id", filter=Q(is_read=False) & ~from_customer),
+        )
+    )
+    fields = ["last_message", "last_message_at", "message_count", "customer_unread", "worker_unread"]
+    with transaction.atomic():
+        Conversation.objects.update(
+            last_message=None, last_message_at=F("created_at"),
+            message_count=0, customer_unread=0, worker_unread=0,
+        )
+        conversations = [
+            Conversation(
+                pk=row["conversation_id"],
+                last_message_id=row["last_id"],
+                last_message_at=row["last_at"],
+                message_count=row["count"],
+                customer_unread=row["unread_from_others"],
+                worker_unread=row["unread_from_customer"],
+            )
+            for row in rows.iterator(chunk_size=batch_size)
+        ]
+        Conversation.objects.bulk_update(conversations, fields, batch_size=batch_size)
+    return len(conversations)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from chat.inbox import rebuild_inbox
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized inbox columns on Conversation (last message, counts, unread) from the messages."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        conversations = rebuild_inbox(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt inbox summary for {conversations} conversations"))
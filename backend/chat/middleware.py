@@ -1,22 +1,17 @@
 from urllib.parse import parse_qs
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from rest_framework_simplejwt.tokens import UntypedToken
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from django.contrib.auth import get_user_model
-
-User = get_user_model()
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from accounts.authentication import CachedJWTAuthentication
 
 @database_sync_to_async
 def get_user_from_token(token):
     try:
-        # تحقق من صلاحية التوكن
-        UntypedToken(token)
-        from rest_framework_simplejwt.authentication import JWTAuthentication
-        validated = JWTAuthentication().get_validated_token(token)
-        user = JWTAuthentication().get_user(validated)
-        return user
-    except (InvalidToken, TokenError, User.DoesNotExist):
+        # تحقق من صلاحية التوكن مرة واحدة، والمستخدم من الكاش
+        authentication = CachedJWTAuthentication()
+        validated = authentication.get_validated_token(token)
+        return authentication.get_user(validated)
+    except (InvalidToken, TokenError, AuthenticationFailed):
         return AnonymousUser()
 
 class JWTAuthMiddleware:
@@ -0,0 +1,68 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Q
+
+
+def backfill_inbox(apps, schema_editor):
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+
+    Conversation.objects.update(last_message_at=F('created_at'))
+    from_customer = Q(sender_id=F('conversation__order__customer_id'))
+    rows = (Message.objects.order_by().values('conversation_id').annotate(
+        count=Count('id'),
+        last_id=Max('id'),
+        last_at=Max('timestamp'),
+        unread_from_customer=Count('id', filter=Q(is_read=False) & from_customer),
+        unread_from_others=Count('id', filter=Q(is_read=False) & ~from_customer),
+    ))
+    for row in rows:
+        Conversation.objects.filter(pk=row['conversation_id']).update(
+            last_message_id=row['last_id'],
+            last_message_at=row['last_at'],
+            message_count=row['count'],
+            customer_unread=row['unread_from_others'],
+            worker_unread=row['unread_from_customer'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_initial'),
+        ('chat', '0002_message_is_read_message_read_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='customer_unread',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='worker_unread',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['-last_message_at', '-id'], name='conversation_inbox_idx'),
+        ),
+    ]
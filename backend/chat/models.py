@@ -1,22 +1,52 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from orders.models import Order
 
 class Conversation(models.Model):
+    # حالات الطلب التي تُحسب رسائلها في عدّاد غير المقروء (كما كان get_unread_message_count)
+    UNREAD_ORDER_STATUSES = ('accepted', 'in_progress', 'completed')
+
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name="conversation")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # ملخص صندوق الوارد، يُحدَّث عند إضافة رسالة وعند القراءة (chat.inbox)
+    last_message = models.ForeignKey(
+        "Message", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    last_message_at = models.DateTimeField(default=timezone.now)
+    message_count = models.PositiveIntegerField(default=0)
+    # غير المقروء لكل طرف: العميل، والطرف الآخر (العامل / مقدم الخدمة)
+    customer_unread = models.PositiveIntegerField(default=0)
+    worker_unread = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-last_message_at", "-id"], name="conversation_inbox_idx"),
+        ]
+
     def __str__(self):
         return f"Conversation for Order #{self.order.id}"
 
+    def unread_for(self, user):
+        if user.id == self.order.customer_id:
+            return self.customer_unread
+        return self.worker_unread
+
 
 class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # يُعيَّن عند الاستلام (وليس عند الحفظ) حتى يحافظ الحفظ المؤجل على الترتيب
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     is_read = models.BooleanField(default=False)  
     read_at = models.DateTimeField(null=True, blank=True)  
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["conversation", "timestamp", "id"], name="message_history_idx"),
+        ]
+
     def __str__(self):
         return f"Message from {self.sender.username} in Order {self.conversation.order.id}"
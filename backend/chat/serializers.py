@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Conversation, Message
 from orders.models import Order
+from .history import message_page
 
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -22,24 +23,38 @@ class MessageSerializer(serializers.ModelSerializer):
 
 
 class ConversationSerializer(serializers.ModelSerializer):
-    """تفاصيل المحادثة مع كل الرسائل"""
-    messages = MessageSerializer(many=True, read_only=True)
+    """تفاصيل المحادثة مع آخر صفحة من الرسائل (الأقدم عبر messages/?before=<id>)"""
+    messages = serializers.SerializerMethodField()
+    has_more_messages = serializers.SerializerMethodField()
     order_id = serializers.IntegerField(source='order.id', read_only=True)
     
     class Meta:
         model = Conversation
-        fields = ['id', 'order_id', 'created_at', 'messages']
+        fields = ['id', 'order_id', 'created_at', 'messages', 'has_more_messages']
         read_only_fields = ['id', 'created_at']
+    
+    def _latest_page(self, obj):
+        if not hasattr(obj, '_latest_page'):
+            obj._latest_page = message_page(obj)
+        return obj._latest_page
+    
+    def get_messages(self, obj):
+        messages, _ = self._latest_page(obj)
+        return MessageSerializer(messages, many=True).data
+    
+    def get_has_more_messages(self, obj):
+        _, has_more = self._latest_page(obj)
+        return has_more
 
 
 class ConversationListSerializer(serializers.ModelSerializer):
-    """ملخص المحادثات للـ sidebar / القائمة"""
+    """ملخص المحادثات للـ sidebar / القائمة (من الأعمدة المحفوظة على Conversation)"""
     order_id = serializers.IntegerField(source='order.id', read_only=True)
-    order_title = serializers.CharField(source='order.service_type', read_only=True)
+    order_title = serializers.CharField(source='order.service.title', read_only=True)
     other_participant = serializers.SerializerMethodField()
     last_message = serializers.SerializerMethodField()
     message_count = serializers.IntegerField(read_only=True)
-    last_message_time = serializers.DateTimeField(read_only=True)
+    last_message_time = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()  # 🟢 جديد
     
     class Meta:
@@ -53,7 +68,7 @@ class ConversationListSerializer(serializers.ModelSerializer):
     
     def get_other_participant(self, obj):
         current_user = self.context['request'].user
-        if obj.order.customer == current_user:
+        if obj.order.customer_id == current_user.id:
             other_user = obj.order.worker
         else:
             other_user = obj.order.customer
@@ -65,17 +80,19 @@ class ConversationListSerializer(serializers.ModelSerializer):
         }
     
     def get_last_message(self, obj):
-        last_message = obj.messages.order_by('-timestamp').first()
+        last_message = obj.last_message
         if last_message:
             return {
                 'message': last_message.message[:100] + ('...' if len(last_message.message) > 100 else ''),
                 'sender': last_message.sender.get_full_name() or last_message.sender.username,
                 'timestamp': last_message.timestamp,
-                'is_from_current_user': last_message.sender == self.context['request'].user,
+                'is_from_current_user': last_message.sender_id == self.context['request'].user.id,
                 'is_read': last_message.is_read   
             }
         return None
     
+    def get_last_message_time(self, obj):
+        return self.fields['created_at'].to_representation(obj.last_message_at) if obj.last_message_id else None
+    
     def get_unread_count(self, obj):
-        current_user = self.context['request'].user
-        return obj.messages.filter(is_read=False).exclude(sender=current_user).count()
+        return obj.unread_for(self.context['request'].user)
@@ -1,9 +1,22 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from orders.models import Order
-from .models import Conversation
+from .models import Conversation, Message
+from .inbox import order_status_changed, record_messages
 
 @receiver(post_save, sender=Order)
 def create_conversation_for_order(sender, instance, created, **kwargs):
     if created:
         Conversation.objects.create(order=instance)
+
+# رسائل المحادثة تدخل عدّاد غير المقروء أو تخرج منه مع حالة الطلب
+@receiver(post_save, sender=Order)
+def update_unread_on_order_status(sender, instance, created, raw=False, **kwargs):
+    if not (created or raw) and instance.has_changed('status'):
+        order_status_changed(instance, instance.previous('status'))
+
+# تحديث ملخص صندوق الوارد (آخر رسالة وعدادات غير المقروء)
+@receiver(post_save, sender=Message)
+def update_inbox_on_message(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_messages(instance.conversation_id, [instance])
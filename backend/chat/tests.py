@@ -1,3 +1,187 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from notifications import unread
+from orders.models import Order
+from services.models import Service
+from . import buffer
+from .models import Conversation, Message
+from .views import MessageListCreateView, UserConversationsView
+
+User = get_user_model()
+
+
+def make_user(username, role="client"):
+    return User.objects.create_user(
+        username=username, email=f"{username}@example.com", password="pass", role=role
+    )
+
+
+class ChatTestCase(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.customer = make_user("client")
+        self.worker = make_user("worker", role="worker")
+        self.service = Service.objects.create(provider=self.worker, title="سباكة")
+
+    def make_conversation(self):
+        order = Order.objects.create(
+            customer=self.customer, worker=self.worker, service=self.service, status="accepted"
+        )
+        # المحادثة تُنشأ مع الطلب (chat.signals)
+        return Conversation.objects.get(order=order)
+
+    def get(self, view, user, path="/", **params):
+        request = self.factory.get(path, params)
+        force_authenticate(request, user=user)
+        return view(request)
+
+
+class UserConversationsViewTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.conversations = [self.make_conversation() for _ in range(3)]
+        self.view = UserConversationsView.as_view()
+
+    def test_plain_list_without_cursor(self):
+        response = self.get(self.view, self.customer)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(
+            [row["id"] for row in response.data],
+            [c.id for c in reversed(self.conversations)],
+        )
+
+    def test_cursor_pages(self):
+        first = self.get(self.view, self.customer, cursor="", page_size=2)
+
+        self.assertEqual(len(first.data["results"]), 2)
+        self.assertTrue(first.data["has_more"])
+
+        second = self.get(self.view, self.customer, cursor=first.data["next_cursor"], page_size=2)
+
+        self.assertEqual([row["id"] for row in second.data["results"]], [self.conversations[0].id])
+        self.assertIsNone(second.data["next_cursor"])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.get(self.view, self.customer, cursor="not-a-cursor")
+
+        self.assertEqual(response.status_code, 400)
+
+
+class MessageListViewTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.conversation = self.make_conversation()
+        self.messages = [
+            Message.objects.create(conversation=self.conversation, sender=self.customer, message=f"رسالة {i}")
+            for i in range(5)
+        ]
+        self.view = MessageListCreateView.as_view()
+
+    def get_messages(self, **params):
+        request = self.factory.get("/", params)
+        force_authenticate(request, user=self.customer)
+        return self.view(request, order_id=self.conversation.order_id)
+
+    def test_whole_thread_without_cursor(self):
+        response = self.get_messages()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["id"] for row in response.data], [m.id for m in self.messages])
+
+    def test_before_returns_older_page_in_chronological_order(self):
+        response = self.get_messages(before=self.messages[3].id, page_size=2)
+
+        self.assertEqual([row["id"] for row in response.data["results"]], [m.id for m in self.messages[1:3]])
+        self.assertTrue(response.data["has_more"])
+
+    def test_after_returns_newer_page(self):
+        response = self.get_messages(after=self.messages[2].id)
+
+        self.assertEqual([row["id"] for row in response.data["results"]], [m.id for m in self.messages[3:]])
+        self.assertFalse(response.data["has_more"])
+
+    def test_unknown_anchor_is_rejected(self):
+        other = self.make_conversation()
+        foreign = Message.objects.create(conversation=other, sender=self.customer, message="x")
+
+        self.assertEqual(self.get_messages(before=foreign.id).status_code, 400)
+        self.assertEqual(self.get_messages(after=999999).status_code, 400)
+
+
+class MessageBufferTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.conversation = self.make_conversation()
+
+    def message(self, text):
+        return Message(
+            conversation_id=self.conversation.id, sender_id=self.customer.id,
+            message=text, timestamp=timezone.now(),
+        )
+
+    async def test_messages_arriving_during_a_write_share_the_next_batch(self):
+        room = buffer.buffer_for(self.conversation.id)
+        with mock.patch("chat.buffer.persist_messages", wraps=buffer.persist_messages) as persist:
+            saved = await asyncio.gather(*(room.save(self.message(f"رسالة {i}")) for i in range(3)))
+
+        self.assertEqual([len(call.args[1]) for call in persist.call_args_list], [1, 2])
+        self.assertTrue(all(message.pk for message in saved))
+        self.assertEqual(await Message.objects.filter(conversation=self.conversation).acount(), 3)
+        self.assertNotIn(self.conversation.id, buffer._buffers)
+
+    async def test_failed_write_is_raised_to_the_sender(self):
+        room = buffer.buffer_for(self.conversation.id)
+        with mock.patch("chat.buffer.persist_messages", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                await room.save(self.message("رسالة"))
+
+        self.assertFalse(await Message.objects.filter(conversation=self.conversation).aexists())
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class UnreadChatCounterTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.order = Order.objects.create(
+            customer=self.customer, worker=self.worker, service=self.service, status="pending"
+        )
+        self.conversation = Conversation.objects.get(order=self.order)
+
+    def send(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                Message.objects.create(conversation=self.conversation, sender=self.customer, message=f"رسالة {i}")
+
+    def set_status(self, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.status = status
+            self.order.save()
+
+    def worker_count(self):
+        return unread.get_count(unread.CHAT, self.worker.id)
+
+    def test_only_accepted_in_progress_and_completed_orders_are_counted(self):
+        self.assertEqual(self.worker_count(), 0)
+        self.send(2)
+        self.assertEqual(self.worker_count(), 0)
+
+        self.set_status("accepted")
+        self.assertEqual(self.worker_count(), 2)
+        self.send(1)
+        self.set_status("in_progress")
+        self.assertEqual(self.worker_count(), 3)
+
+        self.set_status("cancelled")
+        self.assertEqual(self.worker_count(), 0)
+        self.assertEqual(unread.counts_from_db(unread.CHAT, [self.worker.id]), {self.worker.id: 0})
 
-# Create your tests here.
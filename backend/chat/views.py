@@ -3,11 +3,14 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count, Max
-from django.utils import timezone
+from django.db.models import Q
 from .models import Conversation, Message
 from .serializers import ConversationSerializer, MessageSerializer, ConversationListSerializer
 from orders.models import Order
+from orders.pagination import InvalidCursor, keyset_page, parse_page_size
+from notifications import unread
+from .inbox import mark_read, mark_all_read
+from .history import InvalidMessageCursor, message_page
 
 
 class ConversationDetailView(generics.RetrieveAPIView):
@@ -38,24 +41,64 @@ class ConversationDetailView(generics.RetrieveAPIView):
 
 
 class MessageListCreateView(generics.ListCreateAPIView):
+    """
+    GET: the whole thread in chronological order, or with before=, after=
+         or pagination=cursor one page of it:
+         ?before=<message id> older messages, ?after=<message id> newer ones,
+         pagination=cursor alone = the latest page; page_size defaults to 50 (max 100).
+    POST: send a message
+    """
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_queryset(self):
+    def get_conversation(self):
         order_id = self.kwargs['order_id']
-        order = get_object_or_404(Order, id=order_id)
+        order = get_object_or_404(Order.objects.select_related('service'), id=order_id)
 
         if order.status == 'cancelled':
-            return Message.objects.none()
+            return None
 
-        if not (self.request.user == order.customer or
-                self.request.user == order.worker or
-                (order.service.provider and self.request.user == order.service.provider) or
+        user_id = self.request.user.id
+        if not (user_id == order.customer_id or
+                user_id == order.worker_id or
+                (order.service.provider_id and user_id == order.service.provider_id) or
                 self.request.user.is_staff):
-            return Message.objects.none()
+            return None
 
         conversation, _ = Conversation.objects.get_or_create(order=order)
-        return Message.objects.filter(conversation=conversation).order_by('timestamp')
+        return conversation
+
+    def get_queryset(self):
+        conversation = self.get_conversation()
+        if conversation is None:
+            return Message.objects.none()
+        return Message.objects.filter(conversation=conversation).select_related('sender').order_by('timestamp', 'id')
+
+    def list(self, request, *args, **kwargs):
+        # بدون before/after نعيد المحادثة كاملة كما كانت (الواجهة الحالية تتوقع مصفوفة)
+        if not ({'before', 'after'} & set(request.GET) or request.GET.get('pagination') == 'cursor'):
+            return super().list(request, *args, **kwargs)
+
+        conversation = self.get_conversation()
+        if conversation is None:
+            return Response({'results': [], 'has_more': False})
+
+        try:
+            messages, has_more = message_page(
+                conversation,
+                before=request.GET.get('before'),
+                after=request.GET.get('after'),
+                page_size=request.GET.get('page_size'),
+            )
+        except InvalidMessageCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'results': self.get_serializer(messages, many=True).data,
+            'has_more': has_more,
+            'before': messages[0].id if messages else None,
+            'after': messages[-1].id if messages else None,
+        })
 
     def perform_create(self, serializer):
         order_id = self.kwargs['order_id']
@@ -81,7 +124,11 @@ class MessageListCreateView(generics.ListCreateAPIView):
 
 
 class UserConversationsView(generics.ListAPIView):
-    """Get all conversations for the current user"""
+    """
+    Get all conversations for the current user, most recent activity first.
+    Pass cursor= (or pagination=cursor) for keyset pages on
+    (last_message_at, id): ?cursor=<next_cursor>&page_size=N
+    """
     serializer_class = ConversationListSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -93,30 +140,43 @@ class UserConversationsView(generics.ListAPIView):
             order__status='cancelled'
         ).filter(
             order__status__in=['accepted', 'completed', 'in_progress']
-        ).annotate(
-            message_count=Count('messages'),
-            last_message_time=Max('messages__timestamp')
-        ).order_by('-last_message_time')
+        ).select_related(
+            'order__customer', 'order__worker', 'order__service',
+            'last_message__sender',
+        )
 
         return conversations
 
+    def list(self, request, *args, **kwargs):
+        # بدون cursor نعيد القائمة كاملة كما كانت (الواجهة الحالية تتوقع مصفوفة)
+        if 'cursor' not in request.GET and request.GET.get('pagination') != 'cursor':
+            conversations = self.get_queryset().order_by('-last_message_at', '-id')
+            return Response(self.get_serializer(conversations, many=True).data)
+
+        page_size = parse_page_size(request.GET.get('page_size'), default=20)
+        try:
+            conversations, next_cursor = keyset_page(
+                self.get_queryset(), request.GET.get('cursor'), page_size, field='last_message_at'
+            )
+        except InvalidCursor:
+            return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(conversations, many=True)
+        return Response({
+            'results': serializer.data,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'page_size': page_size,
+        })
+
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_unread_message_count(request):
     """Get the count of unread messages for the current user"""
     try:
-        user = request.user
-        unread_count = Message.objects.filter(
-            Q(conversation__order__customer=user) | Q(conversation__order__worker=user)
-        ).exclude(
-            sender=user
-        ).exclude(
-            conversation__order__status='cancelled'
-        ).filter(
-            conversation__order__status__in=['accepted', 'completed', 'in_progress'],
-            is_read=False
-        ).count()
+        # عدّاد المستخدم المحفوظ في Redis (notifications.unread)
+        unread_count = unread.get_count(unread.CHAT, request.user.id)
 
         return Response({
             'unread_count': min(unread_count, 99),
@@ -173,18 +233,13 @@ class MarkConversationReadView(APIView):
 
     def post(self, request, order_id):
         try:
-            conversation = Conversation.objects.get(order_id=order_id)
+            conversation = Conversation.objects.select_related('order').get(order_id=order_id)
 
             # Ensure user has access
-            if request.user not in [conversation.order.customer, conversation.order.worker]:
+            if request.user.id not in [conversation.order.customer_id, conversation.order.worker_id]:
                 return Response({"error": "ليس لديك صلاحية لعرض هذه المحادثة"}, status=403)
 
-            updated_count = conversation.messages.filter(
-                is_read=False
-            ).exclude(sender=request.user).update(
-                is_read=True,
-                read_at=timezone.now()
-            )
+            updated_count = mark_read(conversation, request.user)
 
             return Response({"success": True, "updated": updated_count})
 
@@ -197,14 +252,7 @@ class MarkAllMessagesReadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        user = request.user
-        updated_count = Message.objects.filter(
-            Q(conversation__order__customer=user) | Q(conversation__order__worker=user),
-            is_read=False
-        ).exclude(sender=user).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        updated_count = mark_all_read(request.user)
 
         return Response({"success": True, "updated": updated_count})
 
@@ -218,18 +266,13 @@ def mark_messages_as_read(request):
         if not order_id:
             return Response({"error": "order_id is required"}, status=400)
 
-        conversation = Conversation.objects.get(order_id=order_id)
+        conversation = Conversation.objects.select_related('order').get(order_id=order_id)
 
         # Ensure user has access
-        if request.user not in [conversation.order.customer, conversation.order.worker]:
+        if request.user.id not in [conversation.order.customer_id, conversation.order.worker_id]:
             return Response({"error": "ليس لديك صلاحية لعرض هذه المحادثة"}, status=403)
 
-        updated_count = conversation.messages.filter(
-            is_read=False
-        ).exclude(sender=request.user).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        updated_count = mark_read(conversation, request.user)
 
         return Response({"success": True, "updated": updated_count})
 
@@ -244,14 +287,7 @@ def mark_messages_as_read(request):
 def mark_all_messages_as_read(request):
     """Mark all messages in all conversations as read"""
     try:
-        user = request.user
-        updated_count = Message.objects.filter(
-            Q(conversation__order__customer=user) | Q(conversation__order__worker=user),
-            is_read=False
-        ).exclude(sender=user).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        updated_count = mark_all_read(request.user)
 
         return Response({"success": True, "updated": updated_count})
     except Exception as e:
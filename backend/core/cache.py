@@ -0,0 +1,259 @@
+"""
+Versioned response cache with tag invalidation.
+
+Cached responses are keyed by the request path and query string plus the
+current version of every tag the response depends on. Invalidation never
+deletes entries: ``bump_tags`` moves a tag to a new version, so every key
+built with the old version simply stops being looked up and expires on
+its own. Tag versions start from the current time in milliseconds, so a
+tag key evicted from Redis never comes back at a version that was
+already used.
+
+Hit/miss counters are kept per process and added to shared counters in
+the cache every ``STATS_FLUSH_EVERY`` lookups; ``response_cache_stats``
+reads them back.
+
+``get_or_compute`` is a read-through cache for expensive lookups (external
+APIs) that coalesces concurrent misses of the same key: one caller
+computes, the others in this process wait for its in-flight call and the
+others in other processes poll the cache until the value shows up. No
+process-wide lock is held while waiting or computing, so a slow key
+never blocks lookups of other keys.
+"""
+import functools
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 300
+STATS_FLUSH_EVERY = 50
+
+TAG_PREFIX = "tagver:"
+RESPONSE_PREFIX = "resp:"
+STATS_PREFIX = "respstats:"
+LOCK_PREFIX = "lock:"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+_stats_names = set()
+
+
+def _new_version():
+    return int(time.time() * 1000)
+
+
+def tag_versions(tags):
+    """Current version of each tag, creating missing ones."""
+    keys = {tag: f"{TAG_PREFIX}{tag}" for tag in tags}
+    found = cache.get_many(list(keys.values()))
+    versions = {}
+    for tag, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = _new_version()
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+        versions[tag] = version
+    return versions
+
+
+def bump_tags(*tags):
+    """Invalidate every cached response that depends on any of ``tags``."""
+    for tag in tags:
+        key = f"{TAG_PREFIX}{tag}"
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), timeout=None)
+        except Exception as e:
+            logger.warning(f"Failed to bump cache tag {tag}: {e}")
+
+
+def _record(name, outcome):
+    with _stats_lock:
+        _stats[(name, outcome)] += 1
+        _stats_names.add(name)
+        if sum(_stats.values()) < STATS_FLUSH_EVERY:
+            return
+        pending = dict(_stats)
+        _stats.clear()
+    flush_stats(pending)
+
+
+def flush_stats(pending=None):
+    if pending is None:
+        with _stats_lock:
+            pending = dict(_stats)
+            _stats.clear()
+    for (name, outcome), count in pending.items():
+        key = f"{STATS_PREFIX}{name}:{outcome}"
+        try:
+            if not cache.add(key, count, timeout=None):
+                cache.incr(key, count)
+        except Exception as e:
+            logger.warning(f"Failed to flush cache stats for {name}: {e}")
+
+
+def response_cache_stats(names=None):
+    """``{name: {"hits", "misses", "hit_ratio"}}`` across all processes (flushed counts)."""
+    names = sorted(names or _stats_names)
+    keys = [f"{STATS_PREFIX}{name}:{outcome}" for name in names for outcome in ("hit", "miss")]
+    found = cache.get_many(keys)
+    result = {}
+    for name in names:
+        hits = found.get(f"{STATS_PREFIX}{name}:hit", 0)
+        misses = found.get(f"{STATS_PREFIX}{name}:miss", 0)
+        total = hits + misses
+        result[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None,
+        }
+    return result
+
+
+def _response_key(name, request, versions):
+    query = sorted(request.GET.lists())
+    raw = f"{request.path}?{query}".encode()
+    version = ".".join(str(versions[tag]) for tag in sorted(versions))
+    return f"{RESPONSE_PREFIX}{name}:{hashlib.md5(raw).hexdigest()}:{version}"
+
+
+def cached_response(name, tags, timeout=DEFAULT_TIMEOUT):
+    """
+    Cache the ``Response.data`` of successful GET requests of a DRF view.
+
+    ``tags`` is a list of tag names, or a callable taking the view's
+    ``(request, *args, **kwargs)`` and returning one. Only use this on
+    responses that do not depend on the requesting user.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            from rest_framework.response import Response
+
+            view_tags = tags(request, *args, **kwargs) if callable(tags) else tags
+            try:
+                key = _response_key(name, request, tag_versions(view_tags))
+                data = cache.get(key)
+            except Exception as e:
+                logger.warning(f"Response cache unavailable for {name}: {e}")
+                return view(request, *args, **kwargs)
+
+            if data is not None:
+                _record(name, "hit")
+                return Response(data)
+
+            _record(name, "miss")
+            response = view(request, *args, **kwargs)
+            if getattr(response, "status_code", None) == 200 and hasattr(response, "data"):
+                try:
+                    cache.set(key, response.data, timeout)
+                except Exception as e:
+                    logger.warning(f"Failed to store cached response for {name}: {e}")
+            return response
+        return wrapper
+    return decorator
+
+
+# ---------------- Coalesced read-through cache ----------------
+class _Call:
+    """A ``get_or_compute`` in flight in this process; other callers of the same key wait on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def _cached(key):
+    try:
+        entry = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Cache unavailable for {key}: {e}")
+        return None
+    # القيم مغلفة في tuple حتى يمكن تخزين None كنتيجة
+    return entry if isinstance(entry, tuple) else None
+
+
+def _fill(key, compute, timeout, lock_timeout, wait, poll):
+    """Cross-process part of ``get_or_compute``; returns the ``(value,)`` entry."""
+    entry = _cached(key)
+    if entry is not None:
+        return entry
+
+    lock_key = f"{LOCK_PREFIX}{key}"
+    try:
+        owner = cache.add(lock_key, 1, timeout=lock_timeout)
+    except Exception:
+        owner = True
+    if not owner:
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(poll)
+            entry = _cached(key)
+            if entry is not None:
+                return entry
+
+    try:
+        entry = (compute(),)
+        try:
+            cache.set(key, entry, timeout)
+        except Exception as e:
+            logger.warning(f"Failed to cache {key}: {e}")
+        return entry
+    finally:
+        if owner:
+            try:
+                cache.delete(lock_key)
+            except Exception:
+                pass
+
+
+def get_or_compute(key, compute, timeout=DEFAULT_TIMEOUT, lock_timeout=10, wait=5.0, poll=0.05):
+    """
+    Return the cached value of ``key``, or ``compute()`` it once and cache it.
+
+    Concurrent misses are coalesced: within a process the first caller
+    computes and the others wait for its result, across processes by a
+    short-lived ``cache.add`` lock (``lock_timeout`` seconds). Callers that
+    lose the race wait up to ``wait`` seconds for the winner's value before
+    computing it themselves. Exceptions raised by ``compute`` propagate and
+    nothing is cached.
+    """
+    entry = _cached(key)
+    if entry is not None:
+        return entry[0]
+
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        # القفل العام غير مأخوذ هنا: ننتظر نداء هذا المفتاح فقط
+        if call.done.wait(wait) and call.entry is not None:
+            return call.entry[0]
+        # فشل النداء الأول أو تأخر: نكمل بأنفسنا عبر القفل الموزع
+        return _fill(key, compute, timeout, lock_timeout, wait, poll)[0]
+
+    try:
+        call.entry = _fill(key, compute, timeout, lock_timeout, wait, poll)
+        return call.entry[0]
+    finally:
+        with _calls_lock:
+            _calls.pop(key, None)
+        call.done.set()
@@ -0,0 +1,33 @@
+"""
+Single-instance guard for the periodic management commands.
+
+``single_instance(name)`` takes a PostgreSQL session advisory lock keyed
+by ``name``; only one process across all replicas holds it at a time. The
+lock belongs to the database session, so it is released when the command
+exits or its connection dies and a standby (restarted by
+``docker/worker.sh``) takes over on its next attempt.
+"""
+import hashlib
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+def _lock_id(name):
+    # مفتاح bigint ثابت من الاسم
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+@contextmanager
+def single_instance(name):
+    """Yield True while holding the lock for ``name``, or False if another process holds it."""
+    lock_id = _lock_id(name)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock_id])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
@@ -94,7 +94,7 @@ CORS_ALLOW_ALL_ORIGINS = True # Allow all origins for development purposes
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -108,6 +108,7 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,  
     'AUTH_HEADER_TYPES': ('Bearer',),
     'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.MyTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.MyTokenRefreshSerializer',
 }
 
 TEMPLATES = [
@@ -141,6 +142,84 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache: Redis in every environment except the test runner, which gets an
+# isolated in-process cache so tests never share or pollute Redis state.
+TESTING = "test" in sys.argv or "pytest" in sys.modules
+
+if TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "khadamatk",
+            "TIMEOUT": 300,
+        },
+    }
+
+# Admin dashboard stats: when > 0, /api/admin/stats/ is served from the
+# AdminStatsSnapshot row while it is younger than this many seconds
+# (kept fresh by `manage.py refresh_admin_stats --interval N`).
+ADMIN_STATS_SNAPSHOT_MAX_AGE = config("ADMIN_STATS_SNAPSHOT_MAX_AGE", cast=int, default=0)
+
+# Order outbox: side effects of order changes are applied by the
+# drain_order_outbox worker (started by docker/start.sh next to gunicorn, or
+# the Procfile's `outbox` process). Eager mode also drains right after each
+# commit (handy for local development without the worker running).
+ORDER_OUTBOX_EAGER = config("ORDER_OUTBOX_EAGER", cast=bool, default=False)
+
+# Users behind JWTs are cached this many seconds (accounts.authentication);
+# saving or deleting a user drops the entry right away.
+AUTH_USER_CACHE_TIMEOUT = config("AUTH_USER_CACHE_TIMEOUT", cast=int, default=300)
+
+# Chat WebSocket: messages are saved before they are broadcast; messages of
+# one room arriving while a write is in flight are inserted together (at
+# most CHAT_FLUSH_MAX_MESSAGES per bulk insert, see chat.buffer).
+CHAT_FLUSH_MAX_MESSAGES = config("CHAT_FLUSH_MAX_MESSAGES", cast=int, default=50)
+
+# Notification retention (`manage.py prune_notifications`): read notifications
+# older than NOTIFICATION_RETENTION_DAYS are moved to NotificationArchive, or
+# deleted outright when NOTIFICATION_ARCHIVE is off. Unread ones are kept.
+NOTIFICATION_RETENTION_DAYS = config("NOTIFICATION_RETENTION_DAYS", cast=int, default=90)
+NOTIFICATION_ARCHIVE = config("NOTIFICATION_ARCHIVE", cast=bool, default=True)
+
+# Worker locations for the map (`location.spatial`) are served from an
+# in-memory index, fully rebuilt every SPATIAL_INDEX_MAX_AGE seconds and
+# kept current in between through a Redis change feed.
+SPATIAL_INDEX_MAX_AGE = config("SPATIAL_INDEX_MAX_AGE", cast=int, default=600)
+
+# Live location tracking (`location.track`): batches of at most
+# LOCATION_TRACK_MAX_BATCH fixes per request. `manage.py compact_location_tracks`
+# keeps every fix for LOCATION_TRACK_RAW_DAYS days, then one per user per
+# LOCATION_TRACK_BUCKET_SECONDS, and drops days older than LOCATION_TRACK_RETENTION_DAYS.
+# A worker's live position replaces their saved one in CurrentLocation while it
+# is at most LOCATION_LIVE_MAX_AGE seconds old.
+LOCATION_TRACK_MAX_BATCH = config("LOCATION_TRACK_MAX_BATCH", cast=int, default=100)
+LOCATION_TRACK_RAW_DAYS = config("LOCATION_TRACK_RAW_DAYS", cast=int, default=2)
+LOCATION_TRACK_BUCKET_SECONDS = config("LOCATION_TRACK_BUCKET_SECONDS", cast=int, default=300)
+LOCATION_TRACK_RETENTION_DAYS = config("LOCATION_TRACK_RETENTION_DAYS", cast=int, default=30)
+LOCATION_LIVE_MAX_AGE = config("LOCATION_LIVE_MAX_AGE", cast=int, default=900)
+
+# Geocoding (`location.geocoding`): a local gazetteer file in tests, a geopy
+# provider otherwise. Reverse lookups are cached per GEOCODING_GRID_DEGREES cell.
+GEOCODING_GAZETTEER = BASE_DIR / "location" / "data" / "gazetteer.json"
+if TESTING:
+    GEOCODING_BACKEND = "location.geocoding.GazetteerBackend"
+    GEOCODING_OPTIONS = {}
+else:
+    GEOCODING_BACKEND = config("GEOCODING_BACKEND", default="location.geocoding.GeopyBackend")
+    GEOCODING_OPTIONS = {
+        "provider": config("GEOCODING_PROVIDER", default="nominatim"),
+        "user_agent": config("GEOCODING_USER_AGENT", default="khadamatk"),
+        "timeout": config("GEOCODING_TIMEOUT", cast=float, default=5),
+    } if GEOCODING_BACKEND.endswith("GeopyBackend") else {}
+GEOCODING_GRID_DEGREES = config("GEOCODING_GRID_DEGREES", cast=float, default=0.01)
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -280,5 +359,19 @@ GDAL_LIBRARY_PATH = "/opt/conda/lib/libgdal.so"
 
 SOCIALACCOUNT_ADAPTER = 'accounts.adapters.CustomSocialAccountAdapter'
 GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
+GOOGLE_PLACES_API_KEY = os.getenv('GOOGLE_PLACES_API_KEY')
+
+# Nearby places lookup (location.places): results are cached per grid cell,
+# requests have hard (connect, read) timeouts, and the circuit breaker opens
+# after PLACES_BREAKER_FAILURES failures within PLACES_BREAKER_RESET seconds.
+PLACES_API_URL = config("PLACES_API_URL", default="https://maps.googleapis.com/maps/api/place/nearbysearch/json")
+PLACES_TIMEOUT = (
+    config("PLACES_CONNECT_TIMEOUT", cast=float, default=1.0),
+    config("PLACES_READ_TIMEOUT", cast=float, default=2.0),
+)
+PLACES_GRID_DEGREES = config("PLACES_GRID_DEGREES", cast=float, default=0.005)
+PLACES_CACHE_TIMEOUT = config("PLACES_CACHE_TIMEOUT", cast=int, default=6 * 3600)
+PLACES_BREAKER_FAILURES = config("PLACES_BREAKER_FAILURES", cast=int, default=5)
+PLACES_BREAKER_RESET = config("PLACES_BREAKER_RESET", cast=int, default=60)
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
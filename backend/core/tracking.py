@@ -0,0 +1,86 @@
+"""
+Field change tracking for models.
+
+A model lists the fields it cares about in ``tracked_fields``; the values
+loaded from the database (or passed to the constructor) are snapshotted in
+``__init__``, which also runs for every row built by ``from_db``. Signals
+and ``save()`` overrides can then ask ``has_changed('status')`` or
+``previous('status')`` without re-fetching the row. The snapshot is reset
+once ``save()`` returns, so post_save receivers still see the old values.
+"""
+import copy
+
+
+class TrackedFieldsMixin:
+    tracked_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tracked_snapshot = {}
+        self._snapshot_tracked_fields()
+
+    def _tracked_attname(self, name):
+        return self._meta.get_field(name).attname
+
+    def _snapshot_tracked_fields(self, names=None):
+        for name in names if names is not None else self.tracked_fields:
+            attname = self._tracked_attname(name)
+            # الحقول المؤجلة (defer/only) لا نعرف قيمتها بدون استعلام
+            if attname in self.__dict__:
+                self._tracked_snapshot[name] = copy.deepcopy(self.__dict__[attname])
+            else:
+                self._tracked_snapshot.pop(name, None)
+
+    def _previous_from_db(self, name):
+        attname = self._tracked_attname(name)
+        value = (
+            type(self)._base_manager.using(self._state.db)
+            .filter(pk=self.pk).values_list(attname, flat=True).first()
+        )
+        self._tracked_snapshot[name] = value
+        return value
+
+    def previous(self, name):
+        """Value of ``name`` when the instance was loaded or last saved; None for new rows."""
+        if name not in self.tracked_fields:
+            raise ValueError(f"{type(self).__name__}.{name} is not a tracked field")
+        if self._state.adding or self.pk is None:
+            return None
+        if name not in self._tracked_snapshot:
+            # الحقل كان مؤجلاً عند التحميل: استعلام واحد ثم نحتفظ بالقيمة
+            return self._previous_from_db(name)
+        return self._tracked_snapshot[name]
+
+    def has_changed(self, name):
+        """True for new rows, otherwise whether ``name`` differs from ``previous(name)``."""
+        if self._state.adding or self.pk is None:
+            return True
+        return getattr(self, self._tracked_attname(name)) != self.previous(name)
+
+    def changed_fields(self):
+        """``{field: previous value}`` for every tracked field that changed."""
+        return {
+            name: self.previous(name)
+            for name in self.tracked_fields
+            if self.has_changed(name)
+        }
+
+    def _tracked_subset(self, fields):
+        if fields is None:
+            return None
+        fields = set(fields)
+        return [
+            name for name in self.tracked_fields
+            if name in fields or self._tracked_attname(name) in fields
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_tracked_fields(self._tracked_subset(kwargs.get('update_fields')))
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        fields = kwargs.get('fields')
+        if fields is None and len(args) > 1:
+            fields = args[1]
+        self._snapshot_tracked_fields(self._tracked_subset(fields))
@@ -1,10 +1,48 @@
 #!/usr/bin/env bash
+# Container entrypoint (backend/Dockerfile, deployed by railway.json): migrate,
+# start the background workers, then serve with gunicorn.
+#
+# The workers are the same commands as the Procfile's non-web processes. Set
+# RUN_WORKERS=0 when they run as separate processes/services (Procfile does).
 set -o errexit
 set -o pipefail
 set -o nounset
 
 export PORT="${PORT:-8000}"
+RUN_WORKERS="${RUN_WORKERS:-1}"
 
 python manage.py migrate --noinput
 python manage.py collectstatic --noinput
-gunicorn core.wsgi:application --bind 0.0.0.0:${PORT} --workers 3
\ No newline at end of file
+
+pids=()
+start_worker() {
+    bash docker/worker.sh "$@" &
+    pids+=($!)
+}
+
+if [ "${RUN_WORKERS}" = "1" ]; then
+    # الأوامر الدورية محمية بقفل (core.locks.single_instance) فتكرارها مع أكثر من نسخة آمن
+    start_worker drain_order_outbox
+    start_worker reconcile_unread_counters --interval 900
+    start_worker prune_notifications --interval 86400
+    start_worker compact_location_tracks --interval 300
+    start_worker backfill_geo_areas --interval 3600
+fi
+
+gunicorn core.wsgi:application --bind 0.0.0.0:${PORT} --workers "${WEB_CONCURRENCY:-3}" --timeout 120 &
+web=$!
+
+stop() {
+    kill -TERM ${pids[@]+"${pids[@]}"} "$web" 2>/dev/null || true
+    wait || true
+    exit 0
+}
+trap stop TERM INT
+
+# إذا توقف gunicorn نوقف الـ workers ليُعاد تشغيل الحاوية كلها
+set +o errexit
+wait "$web"
+status=$?
+[ ${#pids[@]} -gt 0 ] && kill -TERM "${pids[@]}" 2>/dev/null
+wait
+exit "$status"
@@ -0,0 +1,19 @@
+#!/usr/bin/env bash
+# Run one management command as a long-lived worker, restarting it if it exits.
+#   docker/worker.sh drain_order_outbox
+#   docker/worker.sh reconcile_unread_counters --interval 900
+set -o nounset
+
+RESTART_DELAY="${WORKER_RESTART_DELAY:-5}"
+child=0
+
+# نمرر إشارة الإيقاف للأمر نفسه ثم نخرج بدل إعادة تشغيله
+trap 'kill -TERM "$child" 2>/dev/null; wait "$child"; exit 0' TERM INT
+
+while true; do
+    python manage.py "$@" &
+    child=$!
+    wait "$child"
+    echo "worker '$1' exited with status $?, restarting in ${RESTART_DELAY}s" >&2
+    sleep "${RESTART_DELAY}"
+done
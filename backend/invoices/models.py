@@ -1,8 +1,9 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.utils import timezone
+from core.tracking import TrackedFieldsMixin
 
-class Invoice(models.Model):
+class Invoice(TrackedFieldsMixin, models.Model):
     STATUS_PAID = 'paid'
     STATUS_UNPAID = 'unpaid'
     STATUS_PENDING = 'pending'
@@ -24,6 +25,7 @@ class Invoice(models.Model):
         (PAYMENT_WALLET, 'محفظة إلكترونية'),
         (PAYMENT_BANK, 'تحويل بنكي'),
     ]
+    tracked_fields = ('status',)
     
     order = models.OneToOneField(
         'orders.Order', 
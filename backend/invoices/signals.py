@@ -2,20 +2,26 @@
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
-from orders.models import Order
+from orders.models import OutboxEvent
+from orders.outbox import order_event
 from .models import Invoice, WorkerEarnings
 import logging
 
 logger = logging.getLogger(__name__)
 
-@receiver(post_save, sender=Order)
-def handle_booking_status_change(sender, instance, created, **kwargs):
+@receiver(order_event)
+def handle_booking_status_change(sender, event, order, effects, **kwargs):
     """
     إدارة الفواتير تلقائياً عند تغيير حالة الحجز
+    يُنفذ من عامل الـ outbox، وقد يُعاد تنفيذه لنفس الحدث لذلك يجب أن يبقى idempotent
     """
-    logger.info(f"Signal triggered for Order {instance.id}: status={instance.status}, created={created}")
+    if order is None or event.topic not in (OutboxEvent.TOPIC_ORDER_CREATED, OutboxEvent.TOPIC_ORDER_STATUS_CHANGED):
+        return
+    instance = order
+    status = event.new_status
+    logger.info(f"Outbox event {event.id} for Order {instance.id}: status={status}, topic={event.topic}")
     
-    if instance.status == 'completed':
+    if status == 'completed':
         invoice_exists = Invoice.objects.filter(order=instance).exists()
         logger.info(f"Invoice exists for order {instance.id}: {invoice_exists}")
         
@@ -39,28 +45,20 @@ def handle_booking_status_change(sender, instance, created, **kwargs):
                 
             except Exception as e:
                 logger.error(f"خطأ في إنشاء الفاتورة: {e}")
-                logger.error(f"Order details: id={instance.id}, status={instance.status}, service={instance.service}")
+                logger.error(f"Order details: id={instance.id}, status={status}, service={instance.service}")
     
-    elif instance.status in ['cancelled', 'pending']:
-        try:
-            invoice = Invoice.objects.get(order=instance)
-            invoice.delete()
+    elif status in ['cancelled', 'pending']:
+        deleted, _ = Invoice.objects.filter(order=instance).delete()
+        if deleted:
             logger.info(f"تم حذف فاتورة الحجز #{instance.id}")
-        except Invoice.DoesNotExist:
-            pass
 
 @receiver(pre_save, sender=Invoice)
 def handle_invoice_payment(sender, instance, **kwargs):
     """
     تحديث وقت الدفع تلقائياً عند تغيير حالة الفاتورة إلى مدفوعة
     """
-    if instance.pk: 
-        try:
-            old_instance = Invoice.objects.get(pk=instance.pk)
-            if old_instance.status != instance.STATUS_PAID and instance.status == instance.STATUS_PAID:
-                instance.paid_at = timezone.now()
-        except Invoice.DoesNotExist:
-            pass
+    if instance.pk and instance.status == instance.STATUS_PAID and instance.has_changed('status'):
+        instance.paid_at = timezone.now()
 
 
 @receiver(post_save, sender=Invoice)
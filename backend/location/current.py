@@ -0,0 +1,101 @@
+"""
+Maintenance of ``CurrentLocation`` (one row per worker).
+
+A worker's current location is their primary ``UserLocation`` or, when
+none is primary, the most recent one with coordinates. While the worker
+is being tracked (a ``LivePosition`` recorded in the last
+``LOCATION_LIVE_MAX_AGE`` seconds) the live point replaces the saved
+one's coordinates; the address, city and neighborhood stay those of the
+saved place. ``ingest_fixes`` refreshes the worker on every batch and
+``expire_live_positions`` (run by ``compact_location_tracks``) moves
+workers whose tracking stopped back to their saved place.
+
+The rows are recomputed in SQL (``DISTINCT ON``) and upserted, so a
+refresh costs one statement plus a delete of workers left without a
+location, whatever the size of their history.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from .models import CurrentLocation, LivePosition, UserLocation
+
+COLUMNS = ("location", "address", "city", "neighborhood")
+
+
+def _sql(for_users):
+    table = CurrentLocation._meta.db_table
+    locations = UserLocation._meta.db_table
+    live = LivePosition._meta.db_table
+    users = get_user_model()._meta.db_table
+    saved_filter = "AND l.user_id = ANY(%(users)s)" if for_users else ""
+    live_filter = "AND lp.user_id = ANY(%(users)s)" if for_users else ""
+    columns = ", ".join(COLUMNS)
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in ("source_id",) + COLUMNS)
+    upsert = f"""
+        WITH saved AS (
+            SELECT DISTINCT ON (l.user_id)
+                l.user_id, l.id, {", ".join(f"l.{column}" for column in COLUMNS)}
+            FROM "{locations}" l
+            JOIN "{users}" u ON u.id = l.user_id AND u.role = 'worker'
+            WHERE l.location IS NOT NULL {saved_filter}
+            ORDER BY l.user_id, l.is_primary DESC, l.created_at DESC, l.id DESC
+        ), live AS (
+            SELECT lp.user_id, lp.location
+            FROM "{live}" lp
+            JOIN "{users}" u ON u.id = lp.user_id AND u.role = 'worker'
+            WHERE lp.recorded_at >= now() - make_interval(secs => %(max_age)s) {live_filter}
+        )
+        INSERT INTO "{table}" (user_id, source_id, {columns}, updated_at)
+        SELECT
+            COALESCE(saved.user_id, live.user_id), saved.id,
+            COALESCE(live.location, saved.location), saved.address, saved.city, saved.neighborhood,
+            now()
+        FROM saved FULL OUTER JOIN live ON live.user_id = saved.user_id
+        ON CONFLICT (user_id) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at
+    """
+    stale = f"""
+        DELETE FROM "{table}" c
+        WHERE {"c.user_id = ANY(%(users)s) AND" if for_users else ""} NOT EXISTS (
+            SELECT 1 FROM "{locations}" l
+            JOIN "{users}" u ON u.id = l.user_id AND u.role = 'worker'
+            WHERE l.user_id = c.user_id AND l.location IS NOT NULL
+        ) AND NOT EXISTS (
+            SELECT 1 FROM "{live}" lp
+            JOIN "{users}" u ON u.id = lp.user_id AND u.role = 'worker'
+            WHERE lp.user_id = c.user_id
+            AND lp.recorded_at >= now() - make_interval(secs => %(max_age)s)
+        )
+    """
+    return upsert, stale
+
+
+def refresh_current_locations(user_ids=None):
+    """Recompute the current location of ``user_ids`` (every worker when None)."""
+    if user_ids is not None:
+        user_ids = sorted({user_id for user_id in user_ids if user_id})
+        if not user_ids:
+            return
+    params = {"users": user_ids, "max_age": settings.LOCATION_LIVE_MAX_AGE}
+    upsert, stale = _sql(for_users=user_ids is not None)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(upsert, params)
+        cursor.execute(stale, params)
+
+
+def expire_live_positions():
+    """Refresh the workers whose live position went stale since their row was last computed."""
+    with connection.cursor() as cursor:
+        # updated_at قبل انتهاء صلاحية الموقع المباشر = الصف ما زال يستخدمه
+        cursor.execute(
+            f"""
+            SELECT c.user_id FROM "{CurrentLocation._meta.db_table}" c
+            JOIN "{LivePosition._meta.db_table}" lp ON lp.user_id = c.user_id
+            WHERE lp.recorded_at < now() - make_interval(secs => %(max_age)s)
+            AND c.updated_at < lp.recorded_at + make_interval(secs => %(max_age)s)
+            """,
+            {"max_age": settings.LOCATION_LIVE_MAX_AGE},
+        )
+        user_ids = [row[0] for row in cursor.fetchall()]
+    refresh_current_locations(user_ids)
+    return len(user_ids)
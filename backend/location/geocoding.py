@@ -0,0 +1,349 @@
+"""
+Geocoding: free-text places and coordinates to normalized ``City`` / ``Area`` rows.
+
+The lookups go through a pluggable backend (``GEOCODING_BACKEND``, built
+with ``GEOCODING_OPTIONS``): ``GazetteerBackend`` answers from a local
+JSON file (tests, local runs) and ``GeopyBackend`` wraps a geopy geocoder
+(Nominatim by default) in production.
+
+Results are cached at two levels: the shared cache (Redis) in front of
+``GeocodeCache`` rows in the database, which never expire. Reverse
+lookups are keyed by grid cell (coordinates snapped to
+``GEOCODING_GRID_DEGREES``, ~1 km), forward lookups by normalized name.
+Concurrent misses of the same key are coalesced (``core.cache.get_or_compute``),
+so a burst of saves in one neighbourhood costs one provider call.
+
+``assign_areas`` is cheap (local names and cached lookups only, never the
+provider) and runs on every save of ``UserLocation`` and ``Service``;
+``backfill_areas`` (``manage.py backfill_geo_areas``) resolves the rows it
+could not, calling the backend where needed. A row whose lookups are all
+recorded as finding nothing is flagged ``geocode_failed`` and left out of
+later passes until its city or coordinates change.
+"""
+import functools
+import json
+import logging
+import math
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils.module_loading import import_string
+
+from core.cache import get_or_compute
+from .models import Area, City, GeocodeCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "geo:"
+CACHE_TIMEOUT = 7 * 24 * 3600
+
+_ARABIC = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ة": "ه", "ى": "ي", "ؤ": "و", "ئ": "ي"})
+_DIACRITICS = re.compile(r"[\u064B-\u065F\u0670\u0640]")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_name(text):
+    """Comparable form of a place name: no diacritics, unified letters, lower case."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = _DIACRITICS.sub("", text).translate(_ARABIC).casefold()
+    return _SPACES.sub(" ", _PUNCTUATION.sub(" ", text)).strip()[:100]
+
+
+@dataclass
+class GeoResult:
+    city: str
+    area: Optional[str] = None
+    country: Optional[str] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+
+
+# ---------------- Backends ----------------
+class GeocodingBackend:
+    def reverse(self, lat, lng):
+        """``GeoResult`` for the place at (lat, lng), or None."""
+        raise NotImplementedError
+
+    def geocode(self, query):
+        """``GeoResult`` for a free-text place name, or None."""
+        raise NotImplementedError
+
+
+class GazetteerBackend(GeocodingBackend):
+    """
+    Offline backend: a JSON list of ``{"city", "area", "country", "lat",
+    "lng", "aliases"}`` entries. ``reverse`` returns the nearest entry within
+    ``max_distance_km``; ``geocode`` matches city, area or alias names.
+    """
+
+    def __init__(self, path=None, max_distance_km=15):
+        self.max_distance_km = max_distance_km
+        with open(path or settings.GEOCODING_GAZETTEER, encoding="utf-8") as f:
+            raw_entries = json.load(f)
+        self.entries = []
+        self.names = {}
+        for raw in raw_entries:
+            entry = GeoResult(raw["city"], raw.get("area"), raw.get("country"), raw["lat"], raw["lng"])
+            self.entries.append(entry)
+            # اسم المدينة يشير للمدينة كلها وليس لحي منها
+            city = GeoResult(entry.city, None, entry.country, entry.lat, entry.lng)
+            self.names.setdefault(normalize_name(entry.city), city)
+            for name in [entry.area, *raw.get("aliases", [])]:
+                if name:
+                    self.names.setdefault(normalize_name(name), entry if entry.area else city)
+
+    def reverse(self, lat, lng):
+        best, best_distance = None, self.max_distance_km
+        for entry in self.entries:
+            distance = _distance_km(lat, lng, entry.lat, entry.lng)
+            if distance <= best_distance:
+                best, best_distance = entry, distance
+        return best
+
+    def geocode(self, query):
+        return self.names.get(normalize_name(query))
+
+
+class GeopyBackend(GeocodingBackend):
+    """Online backend on top of a geopy geocoder (``provider`` is a geopy service name)."""
+
+    CITY_KEYS = ("city", "town", "village", "municipality", "county", "state")
+    AREA_KEYS = ("suburb", "neighbourhood", "quarter", "city_district", "district")
+
+    def __init__(self, provider="nominatim", user_agent="khadamatk", timeout=5, language="ar",
+                 min_delay_seconds=1, **options):
+        from geopy.extra.rate_limiter import RateLimiter
+        from geopy.geocoders import get_geocoder_for_service
+
+        self.language = language
+        geocoder = get_geocoder_for_service(provider)(user_agent=user_agent, timeout=timeout, **options)
+        # سياسة Nominatim العامة: طلب واحد في الثانية على الأكثر
+        self._reverse = RateLimiter(geocoder.reverse, min_delay_seconds=min_delay_seconds, max_retries=0, swallow_exceptions=False)
+        self._geocode = RateLimiter(geocoder.geocode, min_delay_seconds=min_delay_seconds, max_retries=0, swallow_exceptions=False)
+
+    def _result(self, location):
+        if location is None:
+            return None
+        address = (location.raw or {}).get("address", {})
+        city = next((address[k] for k in self.CITY_KEYS if address.get(k)), None)
+        if not city:
+            return None
+        area = next((address[k] for k in self.AREA_KEYS if address.get(k)), None)
+        return GeoResult(city, area, address.get("country"), location.latitude, location.longitude)
+
+    def reverse(self, lat, lng):
+        return self._result(self._reverse((lat, lng), exactly_one=True, language=self.language))
+
+    def geocode(self, query):
+        return self._result(self._geocode(
+            query, exactly_one=True, language=self.language, addressdetails=True
+        ))
+
+
+@functools.lru_cache(maxsize=1)
+def get_backend():
+    backend = import_string(settings.GEOCODING_BACKEND)
+    return backend(**settings.GEOCODING_OPTIONS)
+
+
+def _distance_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(min(a, 1.0)))
+
+
+# ---------------- Normalized rows ----------------
+def _get_or_create(model, lookup, defaults):
+    try:
+        with transaction.atomic():
+            obj, _ = model.objects.get_or_create(**lookup, defaults=defaults)
+    except IntegrityError:
+        # إنشاء متزامن لنفس الاسم
+        obj = model.objects.get(**lookup)
+    return obj
+
+
+def get_city(name, country=None, lat=None, lng=None):
+    normalized = normalize_name(name)
+    if not normalized:
+        return None
+    location = Point(lng, lat, srid=4326) if lat is not None and lng is not None else None
+    return _get_or_create(
+        City, {"name_normalized": normalized},
+        {"name": name.strip()[:100], "country": country, "location": location},
+    )
+
+
+def get_area(city, name):
+    normalized = normalize_name(name)
+    if city is None or not normalized:
+        return None
+    return _get_or_create(Area, {"city": city, "name_normalized": normalized}, {"name": name.strip()[:100]})
+
+
+def _store(key, result):
+    """Save a backend result as a GeocodeCache row; returns ``(city_id, area_id)``."""
+    city = area = None
+    if result is not None:
+        city = get_city(result.city, result.country, result.lat, result.lng)
+        area = get_area(city, result.area) if result.area else None
+    entry, _ = GeocodeCache.objects.update_or_create(key=key, defaults={"city": city, "area": area})
+    return (entry.city_id, entry.area_id)
+
+
+def _lookup(key, backend_call, offline=False):
+    """
+    ``(city_id, area_id)`` for ``key``: shared cache, then GeocodeCache, then
+    (unless ``offline``) the backend. None when unknown or the backend failed.
+    """
+    cache_key = f"{CACHE_PREFIX}{key}"
+
+    def from_db():
+        row = GeocodeCache.objects.filter(key=key).values_list("city_id", "area_id").first()
+        return tuple(row) if row is not None else None
+
+    if offline:
+        # بدون المزود: لا نخزن "غير موجود" في الكاش حتى لا يحجب الاستعلام الحقيقي لاحقاً
+        try:
+            entry = cache.get(cache_key)
+        except Exception:
+            entry = None
+        if isinstance(entry, tuple):
+            return entry[0]
+        return from_db()
+
+    def compute():
+        found = from_db()
+        if found is not None:
+            return found
+        return _store(key, backend_call())
+
+    try:
+        return get_or_compute(cache_key, compute, timeout=CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Geocoding failed for {key}: {e}")
+        return None
+
+
+def grid_key(lat, lng):
+    step = settings.GEOCODING_GRID_DEGREES
+    digits = max(0, -math.floor(math.log10(step)))
+    snap = lambda value: round(math.floor(value / step) * step + step / 2, digits + 1)
+    return snap(lat), snap(lng)
+
+
+def reverse_geocode(lat, lng, offline=False):
+    """``(city_id, area_id)`` for the grid cell of (lat, lng), or None if unknown."""
+    cell_lat, cell_lng = grid_key(lat, lng)
+    return _lookup(
+        f"rev:{cell_lat}:{cell_lng}",
+        lambda: get_backend().reverse(cell_lat, cell_lng),
+        offline=offline,
+    )
+
+
+def resolve_city(name, offline=False):
+    """Id of the City called ``name`` (any spelling the backend knows), or None."""
+    normalized = normalize_name(name)
+    if not normalized:
+        return None
+    city_id = City.objects.filter(name_normalized=normalized).values_list("id", flat=True).first()
+    if city_id is not None:
+        return city_id
+    found = _lookup(f"fwd:{normalized}", lambda: get_backend().geocode(name), offline=offline)
+    return found[0] if found else None
+
+
+# ---------------- Assignment ----------------
+def _area_for_text(city_id, name):
+    normalized = normalize_name(name)
+    if city_id is None or not normalized:
+        return None
+    return Area.objects.filter(city_id=city_id, name_normalized=normalized).values_list("id", flat=True).first()
+
+
+def _resolve(instance, area_text, offline):
+    city_id = area_id = None
+    if instance.city:
+        city_id = resolve_city(instance.city, offline=offline)
+        area_id = _area_for_text(city_id, area_text)
+    point = getattr(instance, "location", None)
+    if point is not None and (city_id is None or area_id is None):
+        found = reverse_geocode(point.y, point.x, offline=offline)
+        if found:
+            # المدينة المكتوبة لها الأولوية؛ الإحداثيات تكمل الناقص
+            if city_id is None:
+                city_id, area_id = found
+            elif found[0] == city_id:
+                area_id = area_id or found[1]
+    return city_id, area_id
+
+
+def _lookup_keys(instance):
+    keys = []
+    normalized = normalize_name(instance.city)
+    if normalized:
+        keys.append(f"fwd:{normalized}")
+    point = getattr(instance, "location", None)
+    if point is not None:
+        keys.append("rev:{}:{}".format(*grid_key(point.y, point.x)))
+    return keys
+
+
+def _known_unresolvable(instance):
+    """True when every lookup for ``instance`` is stored in GeocodeCache as finding no city."""
+    keys = _lookup_keys(instance)
+    # خطأ مؤقت من الـ backend لا يُحفظ، فيُعاد المحاولة في الدورة التالية
+    return GeocodeCache.objects.filter(key__in=keys, city__isnull=True).count() == len(keys)
+
+
+def assign_areas(instance, area_text=None):
+    """Set ``normalized_city`` / ``normalized_area`` from local data and cached lookups only."""
+    instance.normalized_city_id, instance.normalized_area_id = _resolve(instance, area_text, offline=True)
+    if instance.has_changed("city") or instance.has_changed("location"):
+        instance.geocode_failed = False
+
+
+def backfill_areas(queryset, area_field=None, batch_size=500):
+    """
+    Resolve ``normalized_city`` / ``normalized_area`` for every row of
+    ``queryset`` that has none yet, calling the backend when needed.
+    Rows flagged ``geocode_failed`` are skipped. Returns ``(updated,
+    failed)``: the rows resolved and the rows newly flagged.
+    """
+    fields = ["id", "city", "normalized_city", "normalized_area", "location"]
+    if area_field:
+        fields.append(area_field)
+    rows = (
+        queryset.filter(normalized_city__isnull=True, geocode_failed=False)
+        .only(*fields).order_by("id")
+    )
+    model = queryset.model
+    updated, failed, batch = 0, [], []
+    for instance in rows.iterator(chunk_size=batch_size):
+        city_id, area_id = _resolve(instance, getattr(instance, area_field) if area_field else None, offline=False)
+        if city_id is None:
+            if _known_unresolvable(instance):
+                failed.append(instance.pk)
+            continue
+        instance.normalized_city_id, instance.normalized_area_id = city_id, area_id
+        batch.append(instance)
+        if len(batch) >= batch_size:
+            updated += model.objects.bulk_update(batch, ["normalized_city", "normalized_area"])
+            batch = []
+    if batch:
+        updated += model.objects.bulk_update(batch, ["normalized_city", "normalized_area"])
+    flagged = 0
+    for start in range(0, len(failed), batch_size):
+        # update() بدون save: لا يعيد assign_areas تصفير العلامة
+        flagged += model.objects.filter(
+            pk__in=failed[start:start + batch_size], normalized_city__isnull=True
+        ).update(geocode_failed=True)
+    return updated, flagged
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.locks import single_instance
+from location.geocoding import backfill_areas
+from location.models import UserLocation
+from services.models import Service
+
+
+class Command(BaseCommand):
+    help = (
+        "Resolve normalized city/area ids for UserLocation and Service rows that "
+        "have none yet (geocoding the city name or coordinates, with caching)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Keep running every N seconds (default: run once and exit).")
+
+    def handle(self, *args, **options):
+        with single_instance("backfill_geo_areas") as acquired:
+            if not acquired:
+                self.stdout.write("Another backfill_geo_areas is already running")
+                return
+            batch_size = options["batch_size"]
+            interval = options["interval"]
+            while True:
+                locations, failed_locations = backfill_areas(
+                    UserLocation.objects.all(), area_field="neighborhood", batch_size=batch_size
+                )
+                services, failed_services = backfill_areas(Service.objects.all(), batch_size=batch_size)
+                self.stdout.write(self.style.SUCCESS(
+                    f"Resolved areas for {locations} locations and {services} services; "
+                    f"{failed_locations} locations and {failed_services} services could not be resolved"
+                ))
+                if not interval:
+                    break
+                time.sleep(interval)
@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.locks import single_instance
+from location.current import expire_live_positions
+from location.track import downsample_partitions, drop_partitions, ensure_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming daily location-track partitions, downsample the fixes of "
+        "days older than LOCATION_TRACK_RAW_DAYS, drop days past the retention and move "
+        "workers whose live position expired back to their saved location."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days-ahead", type=int, default=7)
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Keep running every N seconds (default: run once and exit).")
+
+    def handle(self, *args, **options):
+        with single_instance("compact_location_tracks") as acquired:
+            if not acquired:
+                self.stdout.write("Another compact_location_tracks is already running")
+                return
+            interval = options["interval"]
+            while True:
+                expired = expire_live_positions()
+                created = ensure_partitions(days_ahead=options["days_ahead"])
+                now = timezone.now()
+                dropped = drop_partitions(now - timedelta(days=settings.LOCATION_TRACK_RETENTION_DAYS))
+                deleted = downsample_partitions(
+                    now - timedelta(days=settings.LOCATION_TRACK_RAW_DAYS),
+                    bucket_seconds=settings.LOCATION_TRACK_BUCKET_SECONDS,
+                )
+                if not interval:
+                    break
+                time.sleep(interval)
+            self.stdout.write(self.style.SUCCESS(
+                f"Expired {expired} live positions, downsampled away {deleted} fixes, "
+                f"created {len(created)} and dropped {len(dropped)} partitions"
+            ))
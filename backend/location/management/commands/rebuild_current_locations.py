@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from location.current import refresh_current_locations
+from location.models import CurrentLocation
+
+
+class Command(BaseCommand):
+    help = "Recompute CurrentLocation (one row per worker: primary or most recent location) from UserLocation."
+
+    def handle(self, *args, **options):
+        refresh_current_locations()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt current location for {CurrentLocation.objects.count()} workers"))
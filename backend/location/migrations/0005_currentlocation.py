@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:00
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_current_locations(apps, schema_editor):
+    CurrentLocation = apps.get_model('location', 'CurrentLocation')
+    UserLocation = apps.get_model('location', 'UserLocation')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    schema_editor.execute(
+        f"""
+        INSERT INTO "{CurrentLocation._meta.db_table}"
+            (user_id, source_id, location, address, city, neighborhood, updated_at)
+        SELECT DISTINCT ON (l.user_id)
+            l.user_id, l.id, l.location, l.address, l.city, l.neighborhood, now()
+        FROM "{UserLocation._meta.db_table}" l
+        JOIN "{User._meta.db_table}" u ON u.id = l.user_id AND u.role = 'worker'
+        WHERE l.location IS NOT NULL
+        ORDER BY l.user_id, l.is_primary DESC, l.created_at DESC, l.id DESC
+        """
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('location', '0004_userlocation_additional_details_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentLocation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='current_location', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='المستخدم')),
+                ('location', django.contrib.gis.db.models.fields.PointField(srid=4326, verbose_name='الموقع الجغرافي')),
+                ('address', models.CharField(blank=True, max_length=255, null=True, verbose_name='العنوان المفصل')),
+                ('city', models.CharField(blank=True, max_length=100, null=True, verbose_name='المدينة')),
+                ('neighborhood', models.CharField(blank=True, max_length=100, null=True, verbose_name='الحي')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+                ('source', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='location.userlocation', verbose_name='الموقع المصدر')),
+            ],
+            options={
+                'verbose_name': 'الموقع الحالي للعامل',
+                'verbose_name_plural': 'المواقع الحالية للعمال',
+            },
+        ),
+        migrations.RunPython(fill_current_locations, migrations.RunPython.noop),
+    ]
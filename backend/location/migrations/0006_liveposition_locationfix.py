@@ -0,0 +1,96 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:00
+"""
+Add LivePosition and LocationFix, and turn location_locationfix into a
+table partitioned by day on recorded_at (see location.track).
+"""
+from datetime import timedelta
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+TABLE = 'location_locationfix'
+DAYS_AHEAD = 7
+
+
+def partition_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    execute = schema_editor.execute
+
+    # الجدول جديد وفارغ: نعيد إنشاءه مقسّماً بنفس الأعمدة
+    execute(f'ALTER TABLE "{TABLE}" RENAME TO "{TABLE}_old"')
+    execute(
+        f'CREATE TABLE "{TABLE}" (LIKE "{TABLE}_old" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+        f'PARTITION BY RANGE (recorded_at)'
+    )
+    execute(f'DROP TABLE "{TABLE}_old"')
+    # مفتاح الجدول المقسّم يجب أن يشمل عمود التقسيم
+    execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id, recorded_at)')
+    execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT')
+
+    day = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(DAYS_AHEAD + 1):
+        execute(
+            f'CREATE TABLE "{TABLE}_p{day:%Y%m%d}" PARTITION OF "{TABLE}" FOR VALUES FROM (%s) TO (%s)',
+            [day, day + timedelta(days=1)],
+        )
+        day += timedelta(days=1)
+
+    execute(f'CREATE SEQUENCE "{TABLE}_id_seq" OWNED BY "{TABLE}".id')
+    execute(f'ALTER TABLE "{TABLE}" ALTER COLUMN id SET DEFAULT nextval(\'"{TABLE}_id_seq"\')')
+    execute(
+        f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_user_id_fk" FOREIGN KEY (user_id) '
+        f'REFERENCES "{user_table}" (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+    execute(f'CREATE INDEX "locfix_user_recorded_idx" ON "{TABLE}" (user_id, recorded_at)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('location', '0005_currentlocation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LivePosition',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='live_position', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='المستخدم')),
+                ('location', django.contrib.gis.db.models.fields.PointField(srid=4326, verbose_name='الموقع الجغرافي')),
+                ('accuracy', models.FloatField(blank=True, null=True, verbose_name='الدقة (متر)')),
+                ('speed', models.FloatField(blank=True, null=True, verbose_name='السرعة (م/ث)')),
+                ('heading', models.FloatField(blank=True, null=True, verbose_name='الاتجاه')),
+                ('recorded_at', models.DateTimeField(verbose_name='وقت التسجيل')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+            ],
+            options={
+                'verbose_name': 'الموقع المباشر',
+                'verbose_name_plural': 'المواقع المباشرة',
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationFix',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('location', django.contrib.gis.db.models.fields.PointField(spatial_index=False, srid=4326, verbose_name='الموقع الجغرافي')),
+                ('accuracy', models.FloatField(blank=True, null=True, verbose_name='الدقة (متر)')),
+                ('speed', models.FloatField(blank=True, null=True, verbose_name='السرعة (م/ث)')),
+                ('heading', models.FloatField(blank=True, null=True, verbose_name='الاتجاه')),
+                ('recorded_at', models.DateTimeField(verbose_name='وقت التسجيل')),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='وقت الاستلام')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='location_fixes', to=settings.AUTH_USER_MODEL, verbose_name='المستخدم')),
+            ],
+            options={
+                'verbose_name': 'نقطة تتبع',
+                'verbose_name_plural': 'نقاط التتبع',
+                'indexes': [models.Index(fields=['user', 'recorded_at'], name='locfix_user_recorded_idx')],
+            },
+        ),
+        migrations.RunPython(partition_table, migrations.RunPython.noop),
+    ]
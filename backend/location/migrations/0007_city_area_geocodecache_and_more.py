@@ -0,0 +1,67 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:00
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('location', '0006_liveposition_locationfix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='الاسم')),
+                ('name_normalized', models.CharField(max_length=100, unique=True, verbose_name='الاسم الموحد')),
+                ('country', models.CharField(blank=True, max_length=100, null=True, verbose_name='الدولة')),
+                ('location', django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326, verbose_name='المركز')),
+            ],
+            options={
+                'verbose_name': 'مدينة',
+                'verbose_name_plural': 'المدن',
+            },
+        ),
+        migrations.CreateModel(
+            name='Area',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='الاسم')),
+                ('name_normalized', models.CharField(max_length=100, verbose_name='الاسم الموحد')),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='areas', to='location.city', verbose_name='المدينة')),
+            ],
+            options={
+                'verbose_name': 'حي',
+                'verbose_name_plural': 'الأحياء',
+                'constraints': [models.UniqueConstraint(fields=('city', 'name_normalized'), name='area_city_name_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='location.area')),
+                ('city', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='location.city')),
+            ],
+            options={
+                'verbose_name': 'نتيجة geocoding',
+                'verbose_name_plural': 'نتائج geocoding',
+            },
+        ),
+        migrations.AddField(
+            model_name='userlocation',
+            name='normalized_area',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='user_locations', to='location.area', verbose_name='الحي (موحد)'),
+        ),
+        migrations.AddField(
+            model_name='userlocation',
+            name='normalized_city',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='user_locations', to='location.city', verbose_name='المدينة (موحدة)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('location', '0007_city_area_geocodecache_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userlocation',
+            name='geocode_failed',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -3,9 +3,9 @@ from django.conf import settings
 from django.contrib.gis.db import models as gis_models
 from django.contrib.gis.geos import Point
 from django.contrib.gis.db.models.functions import Distance
-from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from core.tracking import TrackedFieldsMixin
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +14,7 @@ class UserLocationManager(gis_models.Manager):
     def nearby(self, latitude, longitude, max_results=20, radius_km=10, exclude_user=None):
         """
         إرجاع المواقع الأقرب لنقطة معينة ضمن نصف قطر بالكيلومتر
+        (استعلام PostGIS؛ لمواقع العمال على الخريطة استخدم location.spatial.worker_index)
         """
         point = Point(longitude, latitude, srid=4326)
         queryset = self.get_queryset().filter(
@@ -43,13 +44,14 @@ class UserLocationManager(gis_models.Manager):
             return None
 
 
-class UserLocation(models.Model):
+class UserLocation(TrackedFieldsMixin, models.Model):
     LOCATION_TYPES = (
         ('home', _('المنزل')),
         ('work', _('العمل')),
         ('favorite', _('المفضلة')),
         ('other', _('أخرى')),
     )
+    tracked_fields = ('is_primary', 'user', 'city', 'neighborhood', 'location')
     
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -150,6 +152,28 @@ class UserLocation(models.Model):
         verbose_name=_("الدولة")
     )
     
+    # المدينة والحي بعد التوحيد (location.geocoding) للتصفية بالمساواة بدل البحث النصي
+    normalized_city = models.ForeignKey(
+        'City',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='user_locations',
+        verbose_name=_("المدينة (موحدة)")
+    )
+
+    normalized_area = models.ForeignKey(
+        'Area',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='user_locations',
+        verbose_name=_("الحي (موحد)")
+    )
+    # كل بحث عن هذا العنوان محفوظ كنتيجة فارغة في GeocodeCache: backfill_geo_areas
+    # لا يعيد قراءته حتى تتغيّر المدينة أو الإحداثيات
+    geocode_failed = models.BooleanField(default=False, editable=False)
+    
     is_primary = models.BooleanField(
         default=False,
         verbose_name=_("موقع رئيسي"),
@@ -181,8 +205,9 @@ class UserLocation(models.Model):
     
     def save(self, *args, **kwargs):
         # إذا تم تعيين هذا الموقع كموقع رئيسي، إلغاء تعيين أي مواقع رئيسية أخرى للمستخدم
-        if self.is_primary and self.user:
-            UserLocation.objects.filter(user=self.user, is_primary=True).update(is_primary=False)
+        # (فقط عند تغيّر is_primary أو المستخدم، وليس مع كل حفظ)
+        if self.is_primary and self.user_id and (self.has_changed('is_primary') or self.has_changed('user')):
+            UserLocation.objects.filter(user_id=self.user_id, is_primary=True).exclude(pk=self.pk).update(is_primary=False)
         super().save(*args, **kwargs)
     
     def get_lat_lng(self):
@@ -205,62 +230,14 @@ class UserLocation(models.Model):
     def get_nearby_places(self, radius_km=5, place_type=''):
         """
         الحصول على أماكن قريبة باستخدام Google Places API
+        (مع كاش مشترك ومهلة محددة وقاطع دائرة، انظر location.places)
         """
-        from django.conf import settings
-        import requests
-        
-        # التحقق من وجود مفتاح API
-        if not hasattr(settings, 'GOOGLE_PLACES_API_KEY') or not settings.GOOGLE_PLACES_API_KEY:
-            return []
-        
+        from .places import nearby_places
+
         lat, lng = self.get_lat_lng()
-        if not lat or not lng:
+        if lat is None or lng is None:
             return []
-        
-        # مفتاح التخزين المؤقت
-        cache_key = f'nearby_places_{lat}_{lng}_{radius_km}_{place_type}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
-        try:
-            url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-            params = {
-                'location': f'{lat},{lng}',
-                'radius': radius_km * 1000,  # تحويل إلى أمتار
-                'key': settings.GOOGLE_PLACES_API_KEY,
-                'language': 'ar'
-            }
-            
-            if place_type:
-                params['type'] = place_type
-            
-            response = requests.get(url, params=params)
-            data = response.json()
-            
-            if data.get('status') == 'OK':
-                # معالجة النتائج وتخزين المعلومات المهمة فقط
-                processed_results = []
-                for place in data['results']:
-                    processed_results.append({
-                        'name': place.get('name'),
-                        'vicinity': place.get('vicinity'),
-                        'types': place.get('types', []),
-                        'rating': place.get('rating'),
-                        'user_ratings_total': place.get('user_ratings_total'),
-                        'location': place['geometry']['location'] if 'geometry' in place else None,
-                        'place_id': place.get('place_id')
-                    })
-                
-                # تخزين النتائج لمدة ساعة (3600 ثانية)
-                cache.set(cache_key, processed_results, 3600)
-                return processed_results
-            
-        except Exception as e:
-            logger.error(f"Error fetching nearby places: {e}")
-        
-        return []
+        return nearby_places(lat, lng, radius_km, place_type)
     
     def get_distance_to(self, latitude, longitude, unit='km'):
         """
@@ -312,6 +289,111 @@ class UserLocation(models.Model):
         return f"{base_url}?center={lat},{lng}&zoom={zoom}&size={width}x{height}&markers={markers}&key={settings.GOOGLE_MAPS_API_KEY}"
 
 
+class CurrentLocation(models.Model):
+    """
+    الموقع الحالي لكل عامل: صف واحد لكل عامل (الموقع الرئيسي وإلا الأحدث)
+
+    Provider-distance queries (service search, the public provider
+    profile, provider locations in service lists) join this table instead
+    of picking a row out of the worker's whole location history. Kept in
+    sync by location.current.refresh_current_locations, called from the
+    UserLocation / User signals and on every live tracking batch (a fresh
+    LivePosition replaces the saved coordinates).
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='current_location',
+        verbose_name=_("المستخدم")
+    )
+    source = models.ForeignKey(
+        UserLocation,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name=_("الموقع المصدر")
+    )
+    location = gis_models.PointField(srid=4326, verbose_name=_("الموقع الجغرافي"))
+    address = models.CharField(max_length=255, blank=True, null=True, verbose_name=_("العنوان المفصل"))
+    city = models.CharField(max_length=100, blank=True, null=True, verbose_name=_("المدينة"))
+    neighborhood = models.CharField(max_length=100, blank=True, null=True, verbose_name=_("الحي"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("تاريخ التحديث"))
+
+    class Meta:
+        verbose_name = _('الموقع الحالي للعامل')
+        verbose_name_plural = _('المواقع الحالية للعمال')
+
+    def __str__(self):
+        return f"{self.user_id} - {self.city or 'غير محدد'}"
+
+
+class LivePosition(models.Model):
+    """
+    آخر موقع مباشر (GPS) للمستخدم: صف واحد يُحدَّث مع كل دفعة
+
+    Written by the batched ingestion endpoint (location.track.ingest_fixes)
+    with one upsert per batch; the raw fixes go to LocationFix. Saved
+    places (UserLocation) are not touched; a worker's CurrentLocation
+    follows this row while it is fresh.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='live_position',
+        verbose_name=_("المستخدم")
+    )
+    location = gis_models.PointField(srid=4326, verbose_name=_("الموقع الجغرافي"))
+    accuracy = models.FloatField(null=True, blank=True, verbose_name=_("الدقة (متر)"))
+    speed = models.FloatField(null=True, blank=True, verbose_name=_("السرعة (م/ث)"))
+    heading = models.FloatField(null=True, blank=True, verbose_name=_("الاتجاه"))
+    recorded_at = models.DateTimeField(verbose_name=_("وقت التسجيل"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("تاريخ التحديث"))
+
+    class Meta:
+        verbose_name = _('الموقع المباشر')
+        verbose_name_plural = _('المواقع المباشرة')
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.recorded_at}"
+
+
+class LocationFix(models.Model):
+    """
+    سجل المواقع الخام (append-only)
+
+    PostgreSQL table partitioned by day on ``recorded_at`` (see
+    location.track): recent days keep every fix, older days are
+    downsampled to one fix per user per bucket and dropped after the
+    retention period.
+    """
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='location_fixes',
+        db_index=False,
+        verbose_name=_("المستخدم")
+    )
+    location = gis_models.PointField(srid=4326, spatial_index=False, verbose_name=_("الموقع الجغرافي"))
+    accuracy = models.FloatField(null=True, blank=True, verbose_name=_("الدقة (متر)"))
+    speed = models.FloatField(null=True, blank=True, verbose_name=_("السرعة (م/ث)"))
+    heading = models.FloatField(null=True, blank=True, verbose_name=_("الاتجاه"))
+    recorded_at = models.DateTimeField(verbose_name=_("وقت التسجيل"))
+    received_at = models.DateTimeField(default=timezone.now, verbose_name=_("وقت الاستلام"))
+
+    class Meta:
+        verbose_name = _('نقطة تتبع')
+        verbose_name_plural = _('نقاط التتبع')
+        indexes = [
+            models.Index(fields=['user', 'recorded_at'], name='locfix_user_recorded_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.recorded_at}"
+
+
 class LocationShare(models.Model):
     """
     نموذج لمشاركة المواقع بين المستخدمين
@@ -361,5 +443,58 @@ class LocationShare(models.Model):
         """التحقق إذا انتهت صلاحية المشاركة"""
         from django.utils import timezone
         return self.expires_at and self.expires_at < timezone.now()
-   
-   
\ No newline at end of file
+
+
+class City(models.Model):
+    """مدينة موحدة (من ملف الـ gazetteer أو مزود الـ geocoding)"""
+    name = models.CharField(max_length=100, verbose_name=_("الاسم"))
+    name_normalized = models.CharField(max_length=100, unique=True, verbose_name=_("الاسم الموحد"))
+    country = models.CharField(max_length=100, blank=True, null=True, verbose_name=_("الدولة"))
+    location = gis_models.PointField(srid=4326, null=True, blank=True, verbose_name=_("المركز"))
+
+    class Meta:
+        verbose_name = _('مدينة')
+        verbose_name_plural = _('المدن')
+
+    def __str__(self):
+        return self.name
+
+
+class Area(models.Model):
+    """حي أو منطقة داخل مدينة"""
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='areas', verbose_name=_("المدينة"))
+    name = models.CharField(max_length=100, verbose_name=_("الاسم"))
+    name_normalized = models.CharField(max_length=100, verbose_name=_("الاسم الموحد"))
+
+    class Meta:
+        verbose_name = _('حي')
+        verbose_name_plural = _('الأحياء')
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'name_normalized'], name='area_city_name_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.city}"
+
+
+class GeocodeCache(models.Model):
+    """
+    نتائج الـ geocoding المحفوظة
+
+    ``key`` is ``rev:<lat>:<lng>`` for a reverse lookup of a grid cell
+    (coordinates snapped to GEOCODING_GRID_DEGREES) or ``fwd:<normalized
+    name>`` for a forward lookup. A row with no city records a lookup
+    that found nothing, so it is not repeated either.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    city = models.ForeignKey(City, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('نتيجة geocoding')
+        verbose_name_plural = _('نتائج geocoding')
+
+    def __str__(self):
+        return self.key
+
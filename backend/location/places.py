@@ -0,0 +1,147 @@
+"""
+Nearby places lookup (Google Places "nearby search") for ``UserLocation.get_nearby_places``.
+
+The third party is kept off the request path as much as possible:
+
+* the search centre is snapped to a ``PLACES_GRID_DEGREES`` grid (~500 m)
+  and the radius to half kilometres, so nearby callers share one cache
+  entry in the shared cache (Redis) for ``PLACES_CACHE_TIMEOUT`` seconds;
+* concurrent misses of the same key are coalesced (``core.cache.get_or_compute``),
+  so a burst costs one call;
+* every call has hard connect/read timeouts (``PLACES_TIMEOUT``) and no
+  retries;
+* a circuit breaker shared through the cache opens after
+  ``PLACES_BREAKER_FAILURES`` failures (errors or timeouts) within
+  ``PLACES_BREAKER_RESET`` seconds; while it is open lookups return an
+  empty list immediately, without calling the provider.
+
+The endpoint is ``PLACES_API_URL``, so tests can point it at
+``location.places_stub.PlacesStubServer``.
+"""
+import logging
+import math
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import get_or_compute
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "places:"
+BREAKER_OPEN_KEY = "places:breaker:open"
+BREAKER_FAILURES_KEY = "places:breaker:failures"
+
+_session = requests.Session()
+
+
+class PlacesUnavailable(Exception):
+    """The provider failed, timed out or the circuit breaker is open."""
+
+
+# ---------------- Circuit breaker ----------------
+def breaker_open():
+    try:
+        return bool(cache.get(BREAKER_OPEN_KEY))
+    except Exception:
+        return False
+
+
+def _record_failure():
+    try:
+        if cache.add(BREAKER_FAILURES_KEY, 1, timeout=settings.PLACES_BREAKER_RESET):
+            failures = 1
+        else:
+            failures = cache.incr(BREAKER_FAILURES_KEY)
+        if failures >= settings.PLACES_BREAKER_FAILURES:
+            cache.set(BREAKER_OPEN_KEY, 1, timeout=settings.PLACES_BREAKER_RESET)
+            cache.delete(BREAKER_FAILURES_KEY)
+            logger.warning("Places circuit breaker opened")
+    except Exception as e:
+        logger.warning(f"Failed to record places failure: {e}")
+
+
+def _record_success():
+    try:
+        cache.delete(BREAKER_FAILURES_KEY)
+    except Exception:
+        pass
+
+
+# ---------------- Lookup ----------------
+def snap(lat, lng, radius_km):
+    """Grid-snapped centre and radius used for both the cache key and the request."""
+    step = settings.PLACES_GRID_DEGREES
+    digits = max(0, -math.floor(math.log10(step))) + 1
+    centre = lambda value: round(math.floor(value / step) * step + step / 2, digits)
+    radius = max(0.5, round(float(radius_km) * 2) / 2)
+    return centre(lat), centre(lng), radius
+
+
+def _process(place):
+    return {
+        'name': place.get('name'),
+        'vicinity': place.get('vicinity'),
+        'types': place.get('types', []),
+        'rating': place.get('rating'),
+        'user_ratings_total': place.get('user_ratings_total'),
+        'location': place['geometry']['location'] if 'geometry' in place else None,
+        'place_id': place.get('place_id'),
+    }
+
+
+def _fetch(lat, lng, radius_km, place_type):
+    params = {
+        'location': f'{lat},{lng}',
+        'radius': int(radius_km * 1000),  # تحويل إلى أمتار
+        'key': settings.GOOGLE_PLACES_API_KEY,
+        'language': 'ar',
+    }
+    if place_type:
+        params['type'] = place_type
+
+    try:
+        response = _session.get(settings.PLACES_API_URL, params=params, timeout=settings.PLACES_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        _record_failure()
+        raise PlacesUnavailable(str(e)) from e
+
+    status = data.get('status')
+    if status == 'ZERO_RESULTS':
+        _record_success()
+        return []
+    if status != 'OK':
+        # OVER_QUERY_LIMIT / REQUEST_DENIED ...: لا نخزن النتيجة
+        _record_failure()
+        raise PlacesUnavailable(f"Places API status {status}: {data.get('error_message', '')}")
+    _record_success()
+    return [_process(place) for place in data.get('results', [])]
+
+
+def nearby_places(lat, lng, radius_km=5, place_type=''):
+    """Places around (lat, lng), or [] when the API is not configured or unavailable."""
+    if not getattr(settings, 'GOOGLE_PLACES_API_KEY', None):
+        return []
+    lat, lng, radius_km = snap(lat, lng, radius_km)
+    key = f"{CACHE_PREFIX}{lat}:{lng}:{radius_km}:{place_type or ''}"
+
+    def compute():
+        if breaker_open():
+            raise PlacesUnavailable("circuit breaker open")
+        return _fetch(lat, lng, radius_km, place_type)
+
+    # المنتظرون لا ينتظرون أكثر من مهلة الطلب نفسه
+    connect_timeout, read_timeout = settings.PLACES_TIMEOUT
+    try:
+        return get_or_compute(
+            key, compute,
+            timeout=settings.PLACES_CACHE_TIMEOUT,
+            lock_timeout=math.ceil(connect_timeout + read_timeout) + 1,
+            wait=connect_timeout + read_timeout,
+        )
+    except PlacesUnavailable as e:
+        logger.warning(f"Nearby places unavailable: {e}")
+        return []
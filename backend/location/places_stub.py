@@ -0,0 +1,81 @@
+"""
+Local stand-in for the Places API, for tests and local runs.
+
+    with PlacesStubServer(delay=0, results=[...]) as server:
+        with override_settings(PLACES_API_URL=server.url, GOOGLE_PLACES_API_KEY="test"):
+            ...
+
+The server answers every request with ``{"status": status, "results":
+results}`` after sleeping ``delay`` seconds (to exercise timeouts and the
+circuit breaker) and records the query parameters of each request in
+``server.requests``.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_RESULTS = [
+    {
+        "name": "صيدلية الشفاء",
+        "vicinity": "شارع التحرير",
+        "types": ["pharmacy", "health"],
+        "rating": 4.5,
+        "user_ratings_total": 120,
+        "geometry": {"location": {"lat": 30.0445, "lng": 31.2358}},
+        "place_id": "stub-pharmacy-1",
+    },
+]
+
+
+class PlacesStubServer:
+    def __init__(self, results=None, status="OK", delay=0.0, host="127.0.0.1", port=0):
+        self.results = DEFAULT_RESULTS if results is None else results
+        self.status = status
+        self.delay = delay
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append(parse_qs(urlparse(self.path).query))
+                if stub.delay:
+                    time.sleep(stub.delay)
+                body = json.dumps({"status": stub.status, "results": stub.results}).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # العميل أغلق الاتصال بعد انتهاء المهلة
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/maps/api/place/nearbysearch/json"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,6 +1,9 @@
 # location/serializers.py
 from rest_framework import serializers
 from django.contrib.gis.geos import Point
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 from .models import UserLocation
 
 class UserLocationSerializer(serializers.ModelSerializer):
@@ -140,3 +143,38 @@ class ProviderSearchResultSerializer(serializers.Serializer):
     created_at = serializers.DateTimeField()
     search_metadata = serializers.DictField()
 
+
+class LocationFixSerializer(serializers.Serializer):
+    """نقطة GPS واحدة ضمن دفعة التتبع"""
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    accuracy = serializers.FloatField(required=False, allow_null=True, min_value=0)
+    speed = serializers.FloatField(required=False, allow_null=True, min_value=0)
+    heading = serializers.FloatField(required=False, allow_null=True, min_value=0, max_value=360)
+    recorded_at = serializers.DateTimeField(required=False)
+
+    def validate_recorded_at(self, value):
+        now = timezone.now()
+        if value > now + timedelta(minutes=5):
+            raise serializers.ValidationError("وقت التسجيل في المستقبل")
+        # الأيام الأقدم تم ضغطها (downsampling) فلا نقبل نقاطاً جديدة فيها
+        if value < now - timedelta(days=settings.LOCATION_TRACK_RAW_DAYS):
+            raise serializers.ValidationError("وقت التسجيل قديم جداً")
+        return value
+
+    def validate(self, data):
+        data['location'] = Point(data.pop('lng'), data.pop('lat'), srid=4326)
+        data.setdefault('recorded_at', timezone.now())
+        return data
+
+
+class LocationTrackSerializer(serializers.Serializer):
+    """دفعة من نقاط GPS: {"fixes": [{lat, lng, accuracy, speed, heading, recorded_at}, ...]}"""
+    fixes = serializers.ListField(child=LocationFixSerializer(), allow_empty=False)
+
+    def validate_fixes(self, value):
+        if len(value) > settings.LOCATION_TRACK_MAX_BATCH:
+            raise serializers.ValidationError(
+                f"الحد الأقصى {settings.LOCATION_TRACK_MAX_BATCH} نقطة في الطلب الواحد"
+            )
+        return value
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .current import refresh_current_locations
+from .geocoding import assign_areas
+from .models import UserLocation
+from .spatial import location_changed
+
+# تحديث فهرس مواقع العمال (location.spatial) بعد أي تعديل أو حذف
+@receiver(post_save, sender=UserLocation)
+@receiver(post_delete, sender=UserLocation)
+def reindex_worker_location(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    location_changed(instance.pk)
+
+# الموقع الحالي للعامل (CurrentLocation) يتبع الموقع الرئيسي أو الأحدث
+@receiver(post_save, sender=UserLocation)
+@receiver(post_delete, sender=UserLocation)
+def refresh_current_location(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_current_locations({instance.user_id, instance.previous('user')})
+
+# تغيّر دور المستخدم يضيفه إلى الجدول أو يحذفه منه
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_current_location_on_role_change(sender, instance, created, raw=False, **kwargs):
+    if raw or created or not instance.has_changed('role'):
+        return
+    refresh_current_locations([instance.pk])
+
+# المدينة والحي الموحدان (location.geocoding) عند تغيّر العنوان أو الإحداثيات
+@receiver(pre_save, sender=UserLocation)
+def assign_location_areas(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.normalized_city_id is None or any(
+        instance.has_changed(name) for name in ('city', 'neighborhood', 'location')
+    ):
+        assign_areas(instance, instance.neighborhood)
@@ -0,0 +1,299 @@
+"""
+In-process spatial index of worker locations.
+
+``worker_index`` keeps every ``UserLocation`` of a worker (the rows the
+map's ``nearby`` endpoint can return) in memory: coordinates in NumPy
+arrays, bucketed in a fixed lat/lng grid of ``CELL_DEG`` degrees. Radius
+and k-nearest queries only compute great-circle distances for the points
+in the grid cells that can contain a match, so they never touch the
+database.
+
+Keeping it current across processes: every ``UserLocation`` save or
+delete appends the row id to a Redis stream (``FEED_KEY``) once the
+transaction commits. Each process polls the stream at most every
+``FEED_POLL_INTERVAL`` seconds and reloads only the changed rows (one
+query). The index is loaded on first use and rebuilt from scratch every
+``SPATIAL_INDEX_MAX_AGE`` seconds, or when the process fell behind a
+trimmed stream; that also picks up changes the feed does not carry
+(ratings, hourly rates, a user's role). Without Redis (tests, local
+runs) changes are applied to the local index directly.
+"""
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.32
+CELL_DEG = 0.05  # ~5.5 كم
+
+FEED_KEY = "khadamatk:location:worker-changes"
+FEED_MAXLEN = 20000
+FEED_POLL_INTERVAL = 0.5
+
+_redis_client = None
+
+
+def _feed():
+    """Redis client for the change feed, or None when it is not available."""
+    global _redis_client
+    if getattr(settings, "TESTING", False):
+        return None
+    if _redis_client is None:
+        try:
+            import redis
+            _redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1)
+        except Exception as e:
+            logger.warning(f"Worker location feed unavailable: {e}")
+            return None
+    return _redis_client
+
+
+def _cell(lat, lng):
+    return (math.floor(lat / CELL_DEG), math.floor(lng / CELL_DEG))
+
+
+def _haversine_km(lat, lng, lats, lngs):
+    """Distances in km from (lat, lng) to the points in ``lats``/``lngs`` (all radians)."""
+    a = (
+        np.sin((lats - lat) / 2) ** 2
+        + np.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _load_rows(location_ids=None):
+    from .models import UserLocation
+
+    queryset = UserLocation.objects.filter(user__role="worker", location__isnull=False)
+    if location_ids is not None:
+        queryset = queryset.filter(id__in=location_ids)
+    rows = queryset.values(
+        "id", "location", "address", "city", "country", "created_at",
+        "user_id", "user__username", "user__first_name", "user__last_name", "user__role",
+        "user__worker_profile__hourly_rate", "user__rating_summary__rating_avg",
+    ).order_by()
+    for row in rows.iterator(chunk_size=2000):
+        point = row.pop("location")
+        row["lat"], row["lng"] = point.y, point.x
+        yield row
+
+
+class WorkerLocationIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+        self._loaded_at = None
+        self._feed_id = None
+        self._polled_at = 0.0
+        self._local_changes = set()
+
+    def _clear(self):
+        self._rows = []          # slot -> row dict (None when free)
+        self._slots = {}         # location id -> slot
+        self._free = []
+        self._cells = defaultdict(set)
+        self._lat = np.zeros(0)  # radians
+        self._lng = np.zeros(0)
+
+    def __len__(self):
+        return len(self._slots)
+
+    # ---------------- Maintenance ----------------
+    def load(self):
+        """Rebuild the whole index from the database."""
+        feed = _feed()
+        feed_id = "0-0"
+        if feed is not None:
+            try:
+                last = feed.xrevrange(FEED_KEY, count=1)
+                feed_id = last[0][0] if last else "0-0"
+            except Exception as e:
+                logger.warning(f"Worker location feed unavailable: {e}")
+                feed_id = None
+
+        rows = list(_load_rows())
+        with self._lock:
+            self._clear()
+            self._lat = np.zeros(len(rows))
+            self._lng = np.zeros(len(rows))
+            self._rows = [None] * len(rows)
+            for slot, row in enumerate(rows):
+                self._put(slot, row)
+            self._feed_id = feed_id
+            self._loaded_at = time.monotonic()
+            self._local_changes.clear()
+        logger.info(f"Worker location index loaded ({len(rows)} locations)")
+
+    def _put(self, slot, row):
+        self._rows[slot] = row
+        self._slots[row["id"]] = slot
+        self._lat[slot] = math.radians(row["lat"])
+        self._lng[slot] = math.radians(row["lng"])
+        self._cells[_cell(row["lat"], row["lng"])].add(slot)
+
+    def _remove(self, location_id):
+        slot = self._slots.pop(location_id, None)
+        if slot is None:
+            return
+        row = self._rows[slot]
+        cell = self._cells.get(_cell(row["lat"], row["lng"]))
+        if cell is not None:
+            cell.discard(slot)
+            if not cell:
+                del self._cells[_cell(row["lat"], row["lng"])]
+        self._rows[slot] = None
+        self._free.append(slot)
+
+    def _upsert(self, row):
+        self._remove(row["id"])
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._rows)
+            self._rows.append(None)
+            if slot >= len(self._lat):
+                size = max(16, len(self._lat) * 2)
+                self._lat = np.resize(self._lat, size)
+                self._lng = np.resize(self._lng, size)
+        self._put(slot, row)
+
+    def refresh_locations(self, location_ids):
+        """Reload the given rows from the database (removing those that no longer qualify)."""
+        location_ids = set(location_ids)
+        if not location_ids:
+            return
+        rows = list(_load_rows(location_ids))
+        with self._lock:
+            for location_id in location_ids:
+                self._remove(location_id)
+            for row in rows:
+                self._upsert(row)
+
+    def location_changed(self, location_id):
+        feed = _feed()
+        if feed is not None:
+            try:
+                feed.xadd(FEED_KEY, {"id": location_id}, maxlen=FEED_MAXLEN, approximate=True)
+                return
+            except Exception as e:
+                logger.warning(f"Failed to publish worker location change {location_id}: {e}")
+        with self._lock:
+            self._local_changes.add(location_id)
+
+    def _poll_feed(self):
+        feed = _feed()
+        if feed is None or self._feed_id is None:
+            return
+        try:
+            first = feed.xrange(FEED_KEY, count=1)
+            entries = feed.xrange(FEED_KEY, min=f"({_decode(self._feed_id)}", count=FEED_MAXLEN)
+        except Exception as e:
+            logger.warning(f"Worker location feed unavailable: {e}")
+            return
+        # تأخرنا أكثر من طول الـ stream: تغييرات ضاعت، نعيد التحميل
+        if first and self._feed_id != "0-0" and _stream_id(first[0][0]) > _stream_id(self._feed_id):
+            self.load()
+            return
+        if entries:
+            self.refresh_locations(int(fields[b"id"]) for _, fields in entries)
+            self._feed_id = entries[-1][0]
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        max_age = getattr(settings, "SPATIAL_INDEX_MAX_AGE", 600)
+        if self._loaded_at is None or now - self._loaded_at > max_age:
+            with self._lock:
+                if self._loaded_at is None or now - self._loaded_at > max_age:
+                    self.load()
+            return
+        if self._local_changes:
+            with self._lock:
+                changes, self._local_changes = self._local_changes, set()
+            self.refresh_locations(changes)
+        if now - self._polled_at >= FEED_POLL_INTERVAL:
+            self._polled_at = now
+            self._poll_feed()
+
+    # ---------------- Queries ----------------
+    def _candidate_slots(self, lat, lng, radius_km):
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlng = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+        (min_x, min_y), (max_x, max_y) = _cell(lat - dlat, lng - dlng), _cell(lat + dlat, lng + dlng)
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > len(self._cells):
+            # النطاق أكبر من عدد الخلايا المستخدمة: نمر على الخلايا نفسها
+            return [
+                slot for (x, y), slots in self._cells.items()
+                if min_x <= x <= max_x and min_y <= y <= max_y
+                for slot in slots
+            ]
+        slots = []
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                slots.extend(self._cells.get((x, y), ()))
+        return slots
+
+    def _within(self, lat, lng, radius_km, exclude_user_id=None):
+        slots = self._candidate_slots(lat, lng, radius_km)
+        if exclude_user_id is not None:
+            slots = [s for s in slots if self._rows[s]["user_id"] != exclude_user_id]
+        if not slots:
+            return np.zeros(0, dtype=int), np.zeros(0)
+        slots = np.fromiter(slots, dtype=int, count=len(slots))
+        distances = _haversine_km(
+            math.radians(lat), math.radians(lng), self._lat[slots], self._lng[slots]
+        )
+        inside = distances <= radius_km
+        return slots[inside], distances[inside]
+
+    def _results(self, slots, distances, limit):
+        order = np.argsort(distances, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return [(self._rows[slots[i]], float(distances[i])) for i in order]
+
+    def within(self, lat, lng, radius_km, limit=None, exclude_user_id=None):
+        """``[(row, distance_km), ...]`` within ``radius_km``, nearest first."""
+        self.ensure_fresh()
+        with self._lock:
+            slots, distances = self._within(lat, lng, radius_km, exclude_user_id)
+            return self._results(slots, distances, limit)
+
+    def nearest(self, lat, lng, k, max_radius_km=None, exclude_user_id=None):
+        """The ``k`` nearest rows (optionally no farther than ``max_radius_km``)."""
+        self.ensure_fresh()
+        with self._lock:
+            radius = CELL_DEG * KM_PER_DEG_LAT
+            while True:
+                if max_radius_km is not None:
+                    radius = min(radius, max_radius_km)
+                slots, distances = self._within(lat, lng, radius, exclude_user_id)
+                # كل نقطة خارج الدائرة أبعد من كل نقطة داخلها
+                if (len(slots) >= k or len(slots) == len(self._slots)
+                        or radius == max_radius_km or radius >= math.pi * EARTH_RADIUS_KM):
+                    return self._results(slots, distances, k)
+                radius *= 2
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _stream_id(value):
+    ms, _, seq = _decode(value).partition("-")
+    return (int(ms), int(seq or 0))
+
+
+worker_index = WorkerLocationIndex()
+
+
+def location_changed(location_id):
+    """Queue ``location_id`` for re-indexing once the current transaction commits."""
+    transaction.on_commit(lambda: worker_index.location_changed(location_id))
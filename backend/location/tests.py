@@ -1,3 +1,333 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.cache import get_or_compute
+from . import places
+from .current import expire_live_positions, refresh_current_locations
+from .geocoding import backfill_areas, grid_key, normalize_name, resolve_city
+from .models import City, CurrentLocation, GeocodeCache, LivePosition, LocationFix, UserLocation
+from .places_stub import PlacesStubServer
+from .spatial import worker_index
+from .views import UserLocationViewSet
+
+User = get_user_model()
+
+CAIRO = (30.0444, 31.2357)
+GIZA = (30.0131, 31.2089)
+
+
+def make_user(username, role="worker"):
+    return User.objects.create_user(
+        username=username, email=f"{username}@example.com", password="pass", role=role
+    )
+
+
+class LiveTrackingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.worker = make_user("worker")
+        self.saved = UserLocation.objects.create(
+            user=self.worker, location=Point(CAIRO[1], CAIRO[0], srid=4326),
+            address="وسط البلد", city="القاهرة", is_primary=True,
+        )
+        self.view = UserLocationViewSet.as_view({"post": "track"})
+        self.factory = APIRequestFactory()
+
+    def track(self, *fixes, user=None):
+        request = self.factory.post("/track/", {"fixes": list(fixes)}, format="json")
+        force_authenticate(request, user=user or self.worker)
+        return self.view(request)
+
+    def fix(self, lat, lng, minutes_ago=0):
+        return {"lat": lat, "lng": lng, "recorded_at": timezone.now() - timedelta(minutes=minutes_ago)}
+
+    def test_batch_is_stored_and_feeds_current_location(self):
+        response = self.track(self.fix(*CAIRO, minutes_ago=2), self.fix(*GIZA, minutes_ago=1))
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["accepted"], 2)
+        self.assertEqual(LocationFix.objects.filter(user=self.worker).count(), 2)
+        self.assertEqual(UserLocation.objects.filter(user=self.worker).count(), 1)
+
+        current = CurrentLocation.objects.get(user=self.worker)
+        self.assertAlmostEqual(current.location.y, GIZA[0])
+        # العنوان يبقى من الموقع المحفوظ
+        self.assertEqual(current.source_id, self.saved.id)
+        self.assertEqual(current.address, "وسط البلد")
+
+    def test_out_of_order_batch_returns_the_stored_position(self):
+        self.track(self.fix(*GIZA, minutes_ago=1))
+
+        response = self.track(self.fix(*CAIRO, minutes_ago=10))
+
+        live = LivePosition.objects.get(user=self.worker)
+        self.assertAlmostEqual(live.location.y, GIZA[0])
+        self.assertAlmostEqual(response.data["live_position"]["lat"], GIZA[0])
+        self.assertEqual(response.data["live_position"]["recorded_at"], live.recorded_at)
+
+    def test_expired_live_position_falls_back_to_saved_location(self):
+        self.track(self.fix(*GIZA))
+        LivePosition.objects.filter(user=self.worker).update(
+            recorded_at=timezone.now() - timedelta(hours=2)
+        )
+        CurrentLocation.objects.filter(user=self.worker).update(
+            updated_at=timezone.now() - timedelta(hours=2)
+        )
+
+        self.assertEqual(expire_live_positions(), 1)
+        current = CurrentLocation.objects.get(user=self.worker)
+        self.assertAlmostEqual(current.location.y, CAIRO[0])
+        self.assertEqual(expire_live_positions(), 0)
+
+    def test_client_tracking_does_not_create_current_location(self):
+        client = make_user("client", role="client")
+
+        response = self.track(self.fix(*GIZA), user=client)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(LivePosition.objects.filter(user=client).exists())
+        self.assertFalse(CurrentLocation.objects.filter(user=client).exists())
+
+
+class GeocodingTests(TestCase):
+    """location.geocoding against the offline GazetteerBackend (the TESTING backend)."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name("  القَاهِرَة!! "), "القاهره")
+        self.assertEqual(normalize_name("أسوان"), "اسوان")
+        self.assertEqual(normalize_name("Nasr   City"), "nasr city")
+        self.assertEqual(normalize_name(None), "")
+
+    def test_grid_key_snaps_to_cell_centre(self):
+        self.assertEqual(grid_key(30.0444, 31.2357), (30.045, 31.235))
+        self.assertEqual(grid_key(30.0401, 31.2399), grid_key(30.0444, 31.2357))
+        self.assertNotEqual(grid_key(30.0501, 31.2357), grid_key(30.0444, 31.2357))
+
+    def test_resolve_city_by_alias_then_by_normalized_name(self):
+        city_id = resolve_city("Cairo")
+
+        self.assertEqual(City.objects.get(pk=city_id).name, "القاهرة")
+        with self.assertNumQueries(1):
+            self.assertEqual(resolve_city("القاهره"), city_id)
+
+    def test_unknown_city(self):
+        self.assertIsNone(resolve_city("Atlantis", offline=True))
+        self.assertFalse(GeocodeCache.objects.exists())
+
+        self.assertIsNone(resolve_city("Atlantis"))
+        self.assertIsNone(GeocodeCache.objects.get(key="fwd:atlantis").city_id)
+
+    def test_backfill_areas_uses_city_and_coordinates(self):
+        location = UserLocation.objects.create(
+            user=make_user("client", role="client"), city="Cairo",
+            location=Point(31.2197, 30.0609, srid=4326),  # الزمالك
+        )
+        self.assertIsNone(location.normalized_city_id)
+
+        self.assertEqual(backfill_areas(UserLocation.objects.all(), area_field="neighborhood"), (1, 0))
+
+        location.refresh_from_db()
+        self.assertEqual(location.normalized_city.name, "القاهرة")
+        self.assertEqual(location.normalized_area.name, "الزمالك")
+        self.assertEqual(backfill_areas(UserLocation.objects.all(), area_field="neighborhood"), (0, 0))
+
+    def test_unresolvable_rows_are_skipped_until_they_change(self):
+        location = UserLocation.objects.create(
+            user=make_user("client", role="client"), city="Atlantis", location=Point(0, 0, srid=4326),
+        )
+
+        self.assertEqual(backfill_areas(UserLocation.objects.all()), (0, 1))
+        with self.assertNumQueries(1):
+            self.assertEqual(backfill_areas(UserLocation.objects.all()), (0, 0))
+
+        location.refresh_from_db()
+        location.city = "Cairo"
+        location.save()
+        self.assertFalse(location.geocode_failed)
+
+
+class NearbyPlacesTests(TestCase):
+    """location.places against a local PlacesStubServer."""
+
+    def setUp(self):
+        cache.clear()
+
+    def stub(self, server, **settings):
+        # الإعدادات تتغير مرة واحدة للاختبار كله، لا داخل كل thread
+        return override_settings(**{
+            "PLACES_API_URL": server.url, "GOOGLE_PLACES_API_KEY": "test",
+            "PLACES_TIMEOUT": (0.5, 0.5), **settings,
+        })
+
+    def lookup(self, lat=CAIRO[0], lng=CAIRO[1]):
+        return places.nearby_places(lat, lng, radius_km=2)
+
+    def test_nearby_coordinates_share_one_cached_call(self):
+        with PlacesStubServer() as server, self.stub(server):
+            first = self.lookup(30.0441, 31.2351)
+            second = self.lookup(30.0449, 31.2359)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first[0]["place_id"], "stub-pharmacy-1")
+        self.assertEqual(len(server.requests), 1)
+        lat, lng, radius = places.snap(30.0441, 31.2351, 2)
+        self.assertEqual(server.requests[0]["location"], [f"{lat},{lng}"])
+        self.assertEqual(server.requests[0]["radius"], [str(int(radius * 1000))])
+
+    def test_concurrent_misses_are_coalesced(self):
+        results = []
+        with PlacesStubServer(delay=0.3) as server, self.stub(server):
+            threads = [
+                threading.Thread(target=lambda: results.append(self.lookup()))
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result == results[0] and result for result in results))
+
+    def test_timeout_returns_empty_and_is_not_cached(self):
+        with PlacesStubServer(delay=1) as server, self.stub(server, PLACES_TIMEOUT=(0.5, 0.2)):
+            self.assertEqual(self.lookup(), [])
+            server.delay = 0
+            self.assertTrue(self.lookup())
+
+        self.assertEqual(len(server.requests), 2)
+
+    def test_breaker_opens_after_failures_and_resets(self):
+        with PlacesStubServer(status="OVER_QUERY_LIMIT") as server, \
+                self.stub(server, PLACES_BREAKER_FAILURES=2, PLACES_BREAKER_RESET=1):
+            # مفاتيح مختلفة حتى لا يتشارك الطلبان نفس الـ cache
+            self.assertEqual(self.lookup(30.0, 31.0), [])
+            self.assertEqual(self.lookup(30.1, 31.1), [])
+            self.assertTrue(places.breaker_open())
+
+            server.status = "OK"
+            self.assertEqual(self.lookup(30.2, 31.2), [])
+            self.assertEqual(len(server.requests), 2)
+
+            time.sleep(1.1)
+            self.assertFalse(places.breaker_open())
+            self.assertTrue(self.lookup(30.2, 31.2))
+            self.assertEqual(len(server.requests), 3)
+
+    def test_slow_lookup_does_not_block_other_keys(self):
+        with PlacesStubServer(delay=0.5) as server, self.stub(server):
+            slow = threading.Thread(target=self.lookup)
+            slow.start()
+            time.sleep(0.1)
+            started = time.monotonic()
+            values = [get_or_compute(f"test:{i}", lambda i=i: i) for i in range(64)]
+            elapsed = time.monotonic() - started
+            slow.join()
+
+        self.assertEqual(values, list(range(64)))
+        self.assertLess(elapsed, 0.3)
+
+
+class WorkerLocationIndexTests(TestCase):
+    def setUp(self):
+        self.near = make_user("near")
+        self.far = make_user("far")
+        self.save_location(self.near, 30.0450, 31.2360)      # أقل من كيلومتر
+        self.save_location(self.far, 30.0800, 31.2357)       # ~4 كم
+        self.save_location(make_user("client", role="client"), 30.0444, 31.2357)
+        worker_index.load()
+
+    def save_location(self, user, lat, lng):
+        return UserLocation.objects.create(user=user, location=Point(lng, lat, srid=4326))
+
+    def test_within_returns_workers_nearest_first(self):
+        results = worker_index.within(*CAIRO, radius_km=10)
+
+        self.assertEqual([row["user_id"] for row, _ in results], [self.near.id, self.far.id])
+        self.assertLess(results[0][1], 1)
+        self.assertEqual(worker_index.within(*CAIRO, radius_km=1, exclude_user_id=self.near.id), [])
+
+    def test_nearest_widens_until_k_found(self):
+        results = worker_index.nearest(*CAIRO, k=2)
+        self.assertEqual([row["user_id"] for row, _ in results], [self.near.id, self.far.id])
+
+        self.assertEqual(len(worker_index.nearest(*CAIRO, k=2, max_radius_km=1)), 1)
+
+    def test_saved_and_deleted_locations_are_reindexed_after_commit(self):
+        other = make_user("other")
+        with self.captureOnCommitCallbacks(execute=True):
+            location = self.save_location(other, 30.0445, 31.2358)
+
+        self.assertEqual(worker_index.nearest(*CAIRO, k=1)[0][0]["user_id"], other.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            location.delete()
+
+        self.assertNotIn(other.id, [row["user_id"] for row, _ in worker_index.within(*CAIRO, radius_km=10)])
+
+
+class CurrentLocationTests(TestCase):
+    def setUp(self):
+        self.worker = make_user("worker")
+
+    def save_location(self, lat, lng, **fields):
+        return UserLocation.objects.create(user=self.worker, location=Point(lng, lat, srid=4326), **fields)
+
+    def current(self):
+        return CurrentLocation.objects.filter(user=self.worker).first()
+
+    def test_primary_location_wins_over_newer_ones(self):
+        primary = self.save_location(*CAIRO, is_primary=True, city="القاهرة")
+        self.save_location(*GIZA, city="الجيزة")
+
+        self.assertEqual(self.current().source_id, primary.id)
+        self.assertEqual(self.current().city, "القاهرة")
+
+    def test_latest_location_without_primary_and_fallback_on_delete(self):
+        older = self.save_location(*CAIRO)
+        newer = self.save_location(*GIZA)
+        self.assertEqual(self.current().source_id, newer.id)
+
+        newer.delete()
+        self.assertEqual(self.current().source_id, older.id)
+
+        older.delete()
+        self.assertIsNone(self.current())
+
+    def test_role_change_adds_and_removes_the_row(self):
+        self.save_location(*CAIRO)
+        self.worker.role = "client"
+        self.worker.save(update_fields=["role"])
+        self.assertIsNone(self.current())
+
+        self.worker.role = "worker"
+        self.worker.save()
+        self.assertIsNotNone(self.current())
+
+    def test_saving_without_role_change_skips_the_refresh(self):
+        self.worker.first_name = "عامل"
+        with mock.patch("location.signals.refresh_current_locations") as refresh:
+            self.worker.save()
+
+        refresh.assert_not_called()
+
+    def test_full_rebuild(self):
+        self.save_location(*CAIRO)
+        CurrentLocation.objects.all().delete()
+
+        refresh_current_locations()
+
+        self.assertAlmostEqual(self.current().location.y, CAIRO[0])
@@ -0,0 +1,205 @@
+"""
+High-frequency location ingestion and the raw track table.
+
+``ingest_fixes`` stores a batch of GPS fixes sent by one user: the fixes
+are appended to ``LocationFix`` with one multi-row insert and the newest
+fix is upserted into ``LivePosition`` (an older, out-of-order batch never
+moves the live position back). A tracked worker's ``CurrentLocation`` is
+refreshed in the same transaction, so provider-distance queries see the
+live point (see ``location.current``). Saved places (``UserLocation``)
+are not touched, so that table stays small.
+
+Since migration 0006 ``location_locationfix`` is partitioned by range on
+``recorded_at``: one partition per day (``<table>_pYYYYMMDD``) plus a
+default partition. ``compact_location_tracks`` runs the maintenance:
+
+* ``ensure_partitions`` creates the partitions for the coming days;
+* ``downsample_partitions`` keeps one fix per user per
+  ``LOCATION_TRACK_BUCKET_SECONDS`` in the days older than
+  ``LOCATION_TRACK_RAW_DAYS`` (each partition is compacted once and
+  marked with a table comment);
+* ``drop_partitions`` drops the days older than
+  ``LOCATION_TRACK_RETENTION_DAYS``.
+"""
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .current import refresh_current_locations
+from .models import LivePosition, LocationFix
+
+TABLE = LocationFix._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_RE = re.compile(rf"^{TABLE}_p(\d{{4}})(\d{{2}})(\d{{2}})$")
+DOWNSAMPLED = "downsampled"
+
+
+def day_start(value):
+    return value.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(day):
+    return f"{TABLE}_p{day:%Y%m%d}"
+
+
+# ---------------- Ingestion ----------------
+def ingest_fixes(user, fixes):
+    """
+    Store ``fixes`` (dicts with ``location``, ``recorded_at`` and optional
+    ``accuracy``/``speed``/``heading``) for ``user``. Returns the LocationFix
+    rows and the user's stored LivePosition, which stays on a newer fix when
+    the batch arrived out of order.
+    """
+    if not fixes:
+        return [], LivePosition.objects.filter(user=user).first()
+    now = timezone.now()
+    rows = [
+        LocationFix(
+            user=user,
+            location=fix["location"],
+            accuracy=fix.get("accuracy"),
+            speed=fix.get("speed"),
+            heading=fix.get("heading"),
+            recorded_at=fix["recorded_at"],
+            received_at=now,
+        )
+        for fix in fixes
+    ]
+    latest = max(rows, key=lambda row: row.recorded_at)
+    with transaction.atomic():
+        LocationFix.objects.bulk_create(rows)
+        _upsert_live_position(latest)
+        if user.role == "worker":
+            refresh_current_locations([user.id])
+        live = LivePosition.objects.get(user=user)
+    return rows, live
+
+
+def _upsert_live_position(fix):
+    table = LivePosition._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO "{table}" AS live
+                (user_id, location, accuracy, speed, heading, recorded_at, updated_at)
+            VALUES (%s, ST_GeomFromEWKB(%s), %s, %s, %s, %s, now())
+            ON CONFLICT (user_id) DO UPDATE SET
+                location = EXCLUDED.location,
+                accuracy = EXCLUDED.accuracy,
+                speed = EXCLUDED.speed,
+                heading = EXCLUDED.heading,
+                recorded_at = EXCLUDED.recorded_at,
+                updated_at = EXCLUDED.updated_at
+            WHERE live.recorded_at < EXCLUDED.recorded_at
+            """,
+            [
+                fix.user_id, bytes(fix.location.ewkb), fix.accuracy, fix.speed,
+                fix.heading, fix.recorded_at,
+            ],
+        )
+
+
+# ---------------- Partitions ----------------
+def existing_partitions():
+    """``{day start: (partition name, comment)}`` for the daily partitions."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, obj_description(child.oid, 'pg_class') FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    partitions = {}
+    for name, comment in rows:
+        match = PARTITION_RE.match(name)
+        if match:
+            day = datetime(int(match[1]), int(match[2]), int(match[3]), tzinfo=dt_timezone.utc)
+            partitions[day] = (name, comment)
+    return partitions
+
+
+def create_partition(day):
+    """Create and attach the partition for ``day``, moving its rows out of the default partition."""
+    day = day_start(day)
+    name = partition_name(day)
+    start, end = day, day + timedelta(days=1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM "{DEFAULT_PARTITION}"
+                WHERE recorded_at >= %s AND recorded_at < %s
+                RETURNING *
+            )
+            INSERT INTO "{name}" SELECT * FROM moved
+            """,
+            [start, end],
+        )
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+    return name
+
+
+def ensure_partitions(days_ahead=7):
+    """Make sure today and the next ``days_ahead`` days have a partition."""
+    existing = existing_partitions()
+    created = []
+    day = day_start(timezone.now())
+    for _ in range(days_ahead + 1):
+        if day not in existing:
+            created.append(create_partition(day))
+        day += timedelta(days=1)
+    return created
+
+
+def downsample_partitions(before, bucket_seconds):
+    """
+    Keep the first fix per user per ``bucket_seconds`` in every daily
+    partition that ends before ``before`` and was not compacted yet.
+    Returns the number of fixes deleted.
+    """
+    deleted = 0
+    for day, (name, comment) in sorted(existing_partitions().items()):
+        if day + timedelta(days=1) > before or comment == DOWNSAMPLED:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                DELETE FROM "{name}" WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, row_number() OVER (
+                            PARTITION BY user_id, floor(extract(epoch FROM recorded_at) / %s)
+                            ORDER BY recorded_at, id
+                        ) AS position
+                        FROM "{name}"
+                    ) ranked
+                    WHERE position > 1
+                )
+                """,
+                [bucket_seconds],
+            )
+            deleted += cursor.rowcount
+            cursor.execute(f"COMMENT ON TABLE \"{name}\" IS '{DOWNSAMPLED}'")
+    return deleted
+
+
+def drop_partitions(before):
+    """Detach and drop the daily partitions that end before ``before``."""
+    dropped = []
+    for day, (name, _) in sorted(existing_partitions().items()):
+        if day + timedelta(days=1) > before:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+        dropped.append(name)
+    return dropped
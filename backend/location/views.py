@@ -3,12 +3,12 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Distance
-from django.contrib.gis.measure import D
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from .models import UserLocation
-from .serializers import UserLocationSerializer
+from .spatial import worker_index
+from .serializers import LocationTrackSerializer, UserLocationSerializer
+from .track import ingest_fixes
 
 class UserLocationViewSet(viewsets.ModelViewSet):
     """
@@ -138,6 +138,25 @@ class UserLocationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['post'], url_path='track')
+    def track(self, request):
+        """
+        استقبال دفعة من مواقع GPS المباشرة (تتبع العامل)
+        النقاط تُحفظ في سجل التتبع ويُحدَّث الموقع المباشر، دون إنشاء مواقع محفوظة جديدة
+        """
+        serializer = LocationTrackSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        fixes, live = ingest_fixes(request.user, serializer.validated_data['fixes'])
+        # الموقع المخزَّن فعلاً: دفعة متأخرة لا تُرجع الموقع المباشر إلى الخلف
+        return Response({
+            'accepted': len(fixes),
+            'live_position': {
+                'lat': live.location.y,
+                'lng': live.location.x,
+                'recorded_at': live.recorded_at
+            }
+        }, status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=['delete'], url_path='delete-my-location')
     def delete_my_location(self, request, pk=None):
         """حذف موقع محدد للمستخدم"""
@@ -186,7 +205,7 @@ class UserLocationViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            user_point = Point(float(lng), float(lat), srid=4326)
+            lat, lng = float(lat), float(lng)
             radius = float(radius)
             max_results = int(max_results)
         except ValueError:
@@ -195,36 +214,30 @@ class UserLocationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # البحث عن المواقع القريبة - فقط العمال (workers)
-        nearby_locations = UserLocation.objects.filter(user__role='worker').annotate(
-            distance=Distance('location', user_point)
-        ).filter(
-            location__distance_lte=(user_point, D(km=radius)),
-            location__isnull=False
-        ).select_related('user').order_by('distance')[:max_results]
+        # البحث عن المواقع القريبة - فقط العمال (workers)، من الفهرس في الذاكرة
+        nearby_locations = worker_index.within(lat, lng, radius, limit=max(max_results, 0))
 
         # تنسيق النتائج
         results = []
-        for location in nearby_locations:
+        for location, distance_km in nearby_locations:
             results.append({
-                'id': location.id,
+                'id': location['id'],
                 'user': {
-                    'id': location.user.id,
-                    'username': location.user.username,
-                    'first_name': location.user.first_name,
-                    'last_name': location.user.last_name,
-                    'role': location.user.role,
-                    'email': location.user.email,
-                    'rating': getattr(location.user, 'average_rating', 0),  # إضافة التقييم
-                    'price': getattr(location.user, 'hourly_rate', 0)  # إضافة السعر
+                    'id': location['user_id'],
+                    'username': location['user__username'],
+                    'first_name': location['user__first_name'],
+                    'last_name': location['user__last_name'],
+                    'role': location['user__role'],
+                    'rating': location['user__rating_summary__rating_avg'] or 0,
+                    'price': location['user__worker_profile__hourly_rate'] or 0
                 },
-                'lat': location.location.y,
-                'lng': location.location.x,
-                'address': location.address,
-                'city': location.city,
-                'country': location.country,
-                'distance_km': round(location.distance.km, 2),
-                'created_at': location.created_at
+                'lat': location['lat'],
+                'lng': location['lng'],
+                'address': location['address'],
+                'city': location['city'],
+                'country': location['country'],
+                'distance_km': round(distance_km, 2),
+                'created_at': location['created_at']
             })
 
         return Response(results)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.contenttypes.models import ContentType
-from .models import Notification
+from .models import Notification, NotificationArchive
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
@@ -34,4 +34,20 @@ class NotificationAdmin(admin.ModelAdmin):
     def is_read(self, obj):
         return obj.read_at is not None
     is_read.boolean = True
-    is_read.short_description = 'مقروء'
\ No newline at end of file
+    is_read.short_description = 'مقروء'
+
+
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'recipient_user', 'short_message', 'level', 'created_at', 'archived_at')
+    list_filter = ('level', 'created_at')
+    search_fields = ('message', 'verb')
+    list_select_related = ('recipient_user',)
+    date_hierarchy = 'created_at'
+    list_per_page = 20
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
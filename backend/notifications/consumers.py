@@ -0,0 +1,123 @@
+import json
+from urllib.parse import parse_qs
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from . import stream, unread
+
+
+class UnreadCountConsumer(AsyncWebsocketConsumer):
+    """Pushes the user's unread chat / notification counters as they change."""
+
+    async def connect(self):
+        self.user = self.scope["user"]
+
+        # Check if user is authenticated
+        if not self.user.is_authenticated:
+            await self.close(code=4001)
+            return
+
+        self.group_name = unread.user_group(self.user.id)
+        await self.channel_layer.group_add(
+            self.group_name,
+            self.channel_name
+        )
+        await self.accept()
+
+        # القيم الحالية مرة واحدة، ثم التغييرات فقط
+        counts = await database_sync_to_async(unread.get_counts)(self.user.id)
+        await self.send(text_data=json.dumps({
+            'type': 'unread.snapshot',
+            'counts': counts
+        }))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(
+                self.group_name,
+                self.channel_name
+            )
+
+    async def unread_update(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'unread.update',
+            'kind': event['kind'],
+            'delta': event['delta'],
+            'count': event['count']
+        }))
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Live notifications for the connected user. Connect with
+    ``?last_id=<id>`` (or send ``{"action": "resume", "last_id": <id>}``)
+    to get everything newer than ``id`` replayed first.
+    """
+
+    async def connect(self):
+        self.user = self.scope["user"]
+
+        # Check if user is authenticated
+        if not self.user.is_authenticated:
+            await self.close(code=4001)
+            return
+
+        # ما أُرسل في الإعادة قد يصل مرة أخرى من المجموعة، فنتجاهله
+        self.replayed_ids = set()
+        self.group_name = stream.notification_group(self.user.id)
+        await self.channel_layer.group_add(
+            self.group_name,
+            self.channel_name
+        )
+        await self.accept()
+
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        last_id = params.get("last_id", [None])[0]
+        if last_id is not None:
+            await self.resume(last_id)
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(
+                self.group_name,
+                self.channel_name
+            )
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({
+                'error': 'Invalid JSON format'
+            }))
+            return
+
+        if data.get('action') == 'resume':
+            await self.resume(data.get('last_id'))
+
+    async def resume(self, last_id):
+        try:
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            await self.send(text_data=json.dumps({
+                'error': 'Invalid last_id'
+            }))
+            return
+
+        notifications, has_more = await database_sync_to_async(stream.replay)(self.user.id, last_id)
+        self.replayed_ids.update(n['id'] for n in notifications)
+        await self.send(text_data=json.dumps({
+            'type': 'notifications.replay',
+            'notifications': notifications,
+            # أكثر من REPLAY_LIMIT فاتت: العميل يعيد تحميل القائمة عبر الـ API
+            'has_more': has_more
+        }))
+
+    async def notification_created(self, event):
+        notification = event['notification']
+        if notification['id'] in self.replayed_ids:
+            self.replayed_ids.discard(notification['id'])
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'notification.created',
+            'notification': notification
+        }))
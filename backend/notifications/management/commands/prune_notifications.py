@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.locks import single_instance
+from notifications.retention import archive_read_notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive (or delete) read notifications older than the retention period, "
+        "in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None,
+                            help="Retention in days (default: NOTIFICATION_RETENTION_DAYS).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--pause", type=float, default=0.1,
+                            help="Seconds to sleep between batches.")
+        parser.add_argument("--delete", action="store_true",
+                            help="Delete instead of archiving (default: NOTIFICATION_ARCHIVE).")
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Keep running every N seconds (default: run once and exit).")
+
+    def handle(self, *args, **options):
+        with single_instance("prune_notifications") as acquired:
+            if not acquired:
+                self.stdout.write("Another prune_notifications is already running")
+                return
+            days = options["days"] if options["days"] is not None else settings.NOTIFICATION_RETENTION_DAYS
+            delete_only = options["delete"] or not settings.NOTIFICATION_ARCHIVE
+            action = "Deleted" if delete_only else "Archived"
+            interval = options["interval"]
+            while True:
+                cutoff = timezone.now() - timedelta(days=days)
+                removed = archive_read_notifications(
+                    cutoff, batch_size=options["batch_size"], delete_only=delete_only, pause=options["pause"]
+                )
+                self.stdout.write(self.style.SUCCESS(f"{action} {removed} notifications"))
+                if not interval:
+                    break
+                time.sleep(interval)
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.locks import single_instance
+from notifications.unread import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-user unread chat / notification counters from the database and fix drifted ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Keep reconciling every N seconds (default: run once and exit).")
+
+    def handle(self, *args, **options):
+        with single_instance("reconcile_unread_counters") as acquired:
+            if not acquired:
+                self.stdout.write("Another reconcile_unread_counters is already running")
+                return
+            interval = options["interval"]
+            while True:
+                corrected = reconcile(batch_size=options["batch_size"])
+                if not interval:
+                    break
+                time.sleep(interval)
+            self.stdout.write(self.style.SUCCESS(f"Reconciled unread counters ({corrected} corrected)"))
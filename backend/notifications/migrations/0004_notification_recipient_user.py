@@ -0,0 +1,45 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_recipient_user(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Notification = apps.get_model('notifications', 'Notification')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    user_type = ContentType.objects.filter(
+        app_label=User._meta.app_label, model=User._meta.model_name
+    ).first()
+    if user_type is None:
+        return
+    Notification.objects.filter(
+        recipient_content_type=user_type,
+        recipient_object_id__in=User.objects.values('id'),
+    ).update(recipient_user=models.F('recipient_object_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notifications', '0003_alter_notification_location_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='recipient_user',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='received_notifications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_recipient_user, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient_user', 'read_at', 'created_at'], name='notif_user_read_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient_user', '-created_at', '-id'], name='notif_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notifications', '0004_notification_recipient_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('recipient_object_id', models.PositiveIntegerField()),
+                ('verb', models.CharField(blank=True, max_length=140)),
+                ('message', models.TextField(blank=True)),
+                ('short_message', models.CharField(blank=True, max_length=100)),
+                ('level', models.CharField(choices=[('info', 'معلومات'), ('success', 'نجاح'), ('warning', 'تحذير'), ('error', 'خطأ')], default='info', max_length=10)),
+                ('target_object_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('url', models.CharField(blank=True, max_length=512)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('recipient_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('recipient_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL)),
+                ('target_content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'إشعار مؤرشف',
+                'verbose_name_plural': 'الإشعارات المؤرشفة',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['recipient_user', '-created_at'], name='notif_archive_user_idx')],
+            },
+        ),
+    ]
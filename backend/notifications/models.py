@@ -1,16 +1,19 @@
+from django.apps import apps
 from django.db import models
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.utils import timezone
+from core.tracking import TrackedFieldsMixin
 
-class Notification(models.Model):
+class Notification(TrackedFieldsMixin, models.Model):
     LEVEL_CHOICES = [
         ('info', 'معلومات'),
         ('success', 'نجاح'),
         ('warning', 'تحذير'),
         ('error', 'خطأ'),
     ]
+    tracked_fields = ('read_at', 'action_taken')
     
     # المستلم (Generic Foreign Key)
     recipient_content_type = models.ForeignKey(
@@ -20,6 +23,15 @@ class Notification(models.Model):
     )
     recipient_object_id = models.PositiveIntegerField()
     recipient = GenericForeignKey('recipient_content_type', 'recipient_object_id')
+    # نسخة مباشرة من المستلم عندما يكون مستخدماً، لاستعلامات القائمة والعدّ بالفهرس
+    recipient_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='received_notifications'
+    )
     
     # المسبب (يمكن أن يكون User أو None)
     actor = models.ForeignKey(
@@ -70,9 +82,28 @@ class Notification(models.Model):
         ordering = ['-created_at']
         verbose_name = 'إشعار'
         verbose_name_plural = 'الإشعارات'
+        indexes = [
+            models.Index(fields=['recipient_user', 'read_at', 'created_at'], name='notif_user_read_created_idx'),
+            models.Index(fields=['recipient_user', '-created_at', '-id'], name='notif_user_created_idx'),
+            # دفعات الأرشفة (prune_notifications) تمشي على created_at
+            models.Index(fields=['created_at'], name='notif_read_created_idx',
+                         condition=models.Q(read_at__isnull=False)),
+        ]
 
     def __str__(self):
         return f"إشعار لـ {self.recipient} - {self.verb}"
+
+    def save(self, *args, **kwargs):
+        self.fill_recipient_user()
+        super().save(*args, **kwargs)
+
+    def fill_recipient_user(self):
+        """Copy the generic recipient into ``recipient_user`` (call before bulk_create)."""
+        user_type = ContentType.objects.get_for_model(apps.get_model(settings.AUTH_USER_MODEL))
+        if self.recipient_content_type_id == user_type.id:
+            self.recipient_user_id = self.recipient_object_id
+        else:
+            self.recipient_user_id = None
     
     @property
     def is_read(self):
@@ -81,18 +112,64 @@ class Notification(models.Model):
     def mark_as_read(self):
         if not self.read_at:
             self.read_at = timezone.now()
-            self.save()
+            self.save(update_fields=['read_at'])
     
     def mark_as_unread(self):
         if self.read_at:
             self.read_at = None
-            self.save()    
+            self.save(update_fields=['read_at'])    
     def take_action(self, action_type):
         """Mark notification action as taken"""
         if not self.action_taken:
             self.action_taken = True
             self.action_type = action_type
             self.action_taken_at = timezone.now()
-            self.save()
+            self.save(update_fields=['action_taken', 'action_type', 'action_taken_at'])
             return True
         return False
+
+
+class NotificationArchive(models.Model):
+    """Read notifications moved out of the live table by ``prune_notifications``."""
+    id = models.BigIntegerField(primary_key=True)
+    recipient_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    recipient_object_id = models.PositiveIntegerField()
+    recipient_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='archived_notifications'
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    verb = models.CharField(max_length=140, blank=True)
+    message = models.TextField(blank=True)
+    short_message = models.CharField(max_length=100, blank=True)
+    level = models.CharField(max_length=10, choices=Notification.LEVEL_CHOICES, default='info')
+    target_content_type = models.ForeignKey(
+        ContentType, null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    target_object_id = models.PositiveIntegerField(null=True, blank=True)
+    url = models.CharField(max_length=512, blank=True)
+    # الحقول العريضة (السعر، الموقع، الإجراء) كما كانت وقت الأرشفة
+    payload = models.JSONField(default=dict, blank=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'إشعار مؤرشف'
+        verbose_name_plural = 'الإشعارات المؤرشفة'
+        indexes = [
+            models.Index(fields=['recipient_user', '-created_at'], name='notif_archive_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"إشعار مؤرشف #{self.id} - {self.verb}"
@@ -0,0 +1,79 @@
+"""
+Retention for the notifications table (``prune_notifications``).
+
+Read notifications older than the cutoff are moved to
+``NotificationArchive`` (or just deleted) in batches, one short
+transaction per batch, so the live table is never locked for long. Each
+pass walks the partial index ``notif_read_created_idx``, so a batch only
+touches rows that are due. Unread notifications are kept whatever their
+age.
+"""
+import time
+
+from django.db import connection, transaction
+
+from .models import Notification, NotificationArchive
+
+TABLE = Notification._meta.db_table
+
+# أعمدة الإشعار الثابتة، والباقي (السعر والموقع والإجراء) يُحفظ كـ JSON في الأرشيف
+ARCHIVE_COLUMNS = [
+    "id", "recipient_content_type_id", "recipient_object_id", "recipient_user_id",
+    "actor_id", "verb", "message", "short_message", "level",
+    "target_content_type_id", "target_object_id", "url", "read_at", "created_at",
+]
+PAYLOAD_COLUMNS = [
+    "offered_price", "service_price", "service_name", "job_description",
+    "location_lat", "location_lng", "location_address",
+    "requires_action", "action_taken", "action_type", "action_taken_at",
+]
+
+
+def _archive_batch_sql(delete_only):
+    batch = f"""
+        WITH batch AS (
+            SELECT id FROM "{TABLE}"
+            WHERE read_at IS NOT NULL AND created_at < %s
+            ORDER BY created_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        ), moved AS (
+            DELETE FROM "{TABLE}" n USING batch
+            WHERE n.id = batch.id
+            RETURNING n.*
+        )
+    """
+    if delete_only:
+        return batch + "SELECT count(*) FROM moved"
+
+    archive = NotificationArchive._meta.db_table
+    payload = ", ".join(f"'{column}', {column}" for column in PAYLOAD_COLUMNS)
+    columns = ", ".join(ARCHIVE_COLUMNS)
+    return batch + f"""
+        , archived AS (
+            INSERT INTO "{archive}" ({columns}, payload, archived_at)
+            SELECT {columns}, jsonb_build_object({payload}), now() FROM moved
+            ON CONFLICT (id) DO NOTHING
+            RETURNING 1
+        )
+        SELECT count(*) FROM moved
+    """
+
+
+def archive_read_notifications(cutoff, batch_size=1000, delete_only=False, pause=0):
+    """
+    Move (or delete) read notifications created before ``cutoff``,
+    ``batch_size`` rows per transaction. Returns the number of rows removed.
+    Unread notifications are never touched.
+    """
+    sql = _archive_batch_sql(delete_only)
+    total = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [cutoff, batch_size])
+            removed = cursor.fetchone()[0]
+        total += removed
+        if removed < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
@@ -64,6 +64,17 @@ class NotificationSerializer(serializers.ModelSerializer):
             'time_since'
         ]
 
+    @staticmethod
+    def setup_queryset(queryset):
+        """Load actor, recipient and the generic targets up front instead of per row."""
+        return queryset.select_related(
+            'actor', 'recipient_user', 'target_content_type'
+        ).prefetch_related('recipient', 'target')
+
+    def _recipient(self, obj):
+        # recipient_user يغني عن تحميل الـ GFK لمستلم من نوع مستخدم
+        return obj.recipient_user if obj.recipient_user_id else obj.recipient
+
     def get_actor_full_name(self, obj):
         if obj.actor:
             try:
@@ -74,20 +85,22 @@ class NotificationSerializer(serializers.ModelSerializer):
         return None
 
     def get_recipient_username(self, obj):
-        if obj.recipient and hasattr(obj.recipient, 'user'):
-            return obj.recipient.user.username
-        elif obj.recipient and hasattr(obj.recipient, 'username'):
-            return obj.recipient.username
+        recipient = self._recipient(obj)
+        if recipient and hasattr(recipient, 'user'):
+            return recipient.user.username
+        elif recipient and hasattr(recipient, 'username'):
+            return recipient.username
         return None
 
     def get_recipient_full_name(self, obj):
-        if obj.recipient and hasattr(obj.recipient, 'user'):
+        recipient = self._recipient(obj)
+        if recipient and hasattr(recipient, 'user'):
             try:
-                user = obj.recipient.user
+                user = recipient.user
                 full_name = f"{user.first_name} {user.last_name}".strip()
                 return full_name if full_name else user.username
             except Exception:
-                return getattr(obj.recipient, 'username', None)
+                return getattr(recipient, 'username', None)
         return None
 
     def get_target_repr(self, obj):
@@ -1,13 +1,22 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
-from orders.models import Order
+from orders.models import Order, OutboxEvent
+from orders.outbox import order_event
+from . import stream, unread
 from .models import Notification
 
-@receiver(post_save, sender=Order)
-def order_created_or_updated(sender, instance: Order, created, **kwargs):
-    if kwargs.get('raw', False):
+@receiver(order_event)
+def order_created_or_updated(sender, event, order, effects, **kwargs):
+    if event.topic == OutboxEvent.TOPIC_NOTIFICATION:
+        effects.notify(Notification(**event.payload))
         return
+    if order is None or event.topic not in (OutboxEvent.TOPIC_ORDER_CREATED, OutboxEvent.TOPIC_ORDER_STATUS_CHANGED):
+        return
+    
+    instance = order
+    created = event.topic == OutboxEvent.TOPIC_ORDER_CREATED
+    _notify = lambda **fields: _create_notification(effects, **fields)
     
     provider = getattr(instance.service, 'provider', None)
     customer = instance.customer
@@ -23,7 +32,7 @@ def order_created_or_updated(sender, instance: Order, created, **kwargs):
             if instance.location_lat and instance.location_lng:
                 location_address = f"الموقع: {instance.location_lat:.4f}, {instance.location_lng:.4f}"
             
-            _create_notification(
+            _notify(
                 recipient=provider,
                 actor=customer,
                 verb='order_created',
@@ -41,7 +50,7 @@ def order_created_or_updated(sender, instance: Order, created, **kwargs):
             )
         
         # Notify the customer that their order was created
-        _create_notification(
+        _notify(
             recipient=customer,
             actor=None,
             verb='order_created_confirm',
@@ -61,9 +70,10 @@ def order_created_or_updated(sender, instance: Order, created, **kwargs):
     
     else:
         # Handle status changes
-        old_status = getattr(instance, '_old_status', None)
+        old_status = event.old_status
+        new_status = event.new_status
         
-        if old_status and old_status != instance.status:
+        if old_status and old_status != new_status:
             # Notify customer about status changes
             status_messages = {
                 'accepted': f"تم قبول طلبك رقم #{instance.id}! سيتم التواصل معك قريباً لتنسيق الموعد",
@@ -72,37 +82,37 @@ def order_created_or_updated(sender, instance: Order, created, **kwargs):
                 'in_progress': f"بدأ العمل على طلبك رقم #{instance.id}",
             }
             
-            if instance.status in status_messages:
-                level = 'success' if instance.status in ['accepted', 'completed'] else 'warning' if instance.status == 'cancelled' else 'info'
+            if new_status in status_messages:
+                level = 'success' if new_status in ['accepted', 'completed'] else 'warning' if new_status == 'cancelled' else 'info'
                 
-                _create_notification(
+                _notify(
                     recipient=customer,
                     actor=provider,
-                    verb=f'order_{instance.status}',
-                    message=status_messages[instance.status],
+                    verb=f'order_{new_status}',
+                    message=status_messages[new_status],
                     target=instance,
                     url=order_url,
                     level=level
                 )
             
             # Notify provider about status changes (except when they're the ones changing it)
-            if provider and instance.status in ['cancelled']:
+            if provider and new_status in ['cancelled']:
                 provider_messages = {
                     'cancelled': f"تم إلغاء الطلب رقم #{instance.id} من قبل العميل",
                 }
                 
-                _create_notification(
+                _notify(
                     recipient=provider,
                     actor=customer,
-                    verb=f'order_{instance.status}_provider',
-                    message=provider_messages.get(instance.status, f"تم تغيير حالة الطلب #{instance.id} إلى {_get_status_display(instance.status)}"),
+                    verb=f'order_{new_status}_provider',
+                    message=provider_messages.get(new_status, f"تم تغيير حالة الطلب #{instance.id} إلى {_get_status_display(new_status)}"),
                     target=instance,
                     url=order_url,
-                    level='warning' if instance.status == 'cancelled' else 'info'
+                    level='warning' if new_status == 'cancelled' else 'info'
                 )
 
 
-def _create_notification(recipient, actor, verb, message, target, url, level=None, offered_price=None, service_price=None, service_name=None, job_description=None, location_lat=None, location_lng=None, location_address=None, requires_action=False):
+def _create_notification(effects, recipient, actor, verb, message, target, url, level=None, offered_price=None, service_price=None, service_name=None, job_description=None, location_lat=None, location_lng=None, location_address=None, requires_action=False):
     if not level:
         level = _get_notification_level(verb)
     
@@ -119,7 +129,7 @@ def _create_notification(recipient, actor, verb, message, target, url, level=Non
             target_content_type = ContentType.objects.get_for_model(target)
             target_object_id = target.id
         
-        Notification.objects.create(
+        effects.notify(Notification(
             recipient_content_type=recipient_content_type,
             recipient_object_id=recipient.id,
             actor=actor,
@@ -138,7 +148,7 @@ def _create_notification(recipient, actor, verb, message, target, url, level=Non
             location_lng=location_lng,
             location_address=location_address,
             requires_action=requires_action
-        )
+        ))
     except Exception as e:
         print(f"Error creating notification: {e}")
         # Don't fail the order creation if notification fails
@@ -172,14 +182,24 @@ def _get_status_display(status):
     return status_display.get(status, status)
 
 
-@receiver(pre_save, sender=Order)
-def save_old_status(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old_instance = Order.objects.get(pk=instance.pk)
-            instance._old_status = old_instance.status
-        except Order.DoesNotExist:
-            instance._old_status = None    
+# عدّاد الإشعارات غير المقروءة لكل مستخدم (notifications.unread) والبث المباشر (notifications.stream)
+# الإنشاء الجماعي من الـ outbox يُحتسب في drain لأن bulk_create لا يرسل post_save
+@receiver(post_save, sender=Notification)
+def update_unread_count_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stream.publish([instance])
+        delta = 1 if instance.read_at is None else 0
+    elif instance.has_changed('read_at'):
+        was_unread = instance.previous('read_at') is None
+        delta = (instance.read_at is None) - was_unread
     else:
-        instance._old_status = None
+        return
+    unread.add(unread.NOTIFICATIONS, {instance.recipient_user_id: delta})
+
 
+@receiver(post_delete, sender=Notification)
+def update_unread_count_on_delete(sender, instance, **kwargs):
+    if instance.read_at is None:
+        unread.add(unread.NOTIFICATIONS, {instance.recipient_user_id: -1})
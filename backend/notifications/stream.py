@@ -0,0 +1,67 @@
+"""
+Live notification stream for ``ws/notifications/``.
+
+Once a transaction that created notifications commits, ``publish`` sends
+each one (serialized like the list endpoint) to its recipient's
+``notifications_<user id>`` channel-layer group. A reconnecting client
+passes the id of the last notification it saw and ``replay`` returns the
+newer ones from the database, so nothing published while it was offline
+is lost.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Notification
+from .serializers import NotificationListSerializer
+
+REPLAY_LIMIT = 100
+
+
+def notification_group(user_id):
+    return f"notifications_{user_id}"
+
+
+def _user_notifications(user_id):
+    return Notification.objects.filter(recipient_user_id=user_id)
+
+
+def serialize(notifications):
+    return NotificationListSerializer(notifications, many=True).data
+
+
+def _publish(ids):
+    from orders.outbox import push_channel_messages
+
+    notifications = (
+        Notification.objects.filter(id__in=ids, recipient_user__isnull=False)
+        .select_related('actor').order_by('id')
+    )
+    by_user = defaultdict(list)
+    for notification in notifications:
+        by_user[notification.recipient_user_id].append(notification)
+
+    push_channel_messages([
+        (notification_group(user_id), {
+            'type': 'notification.created',
+            'notification': data,
+        })
+        for user_id, rows in by_user.items()
+        for data in serialize(rows)
+    ])
+
+
+def publish(notifications):
+    """Push freshly inserted ``notifications`` once the current transaction commits."""
+    ids = [n.id for n in notifications if n.id]
+    if ids:
+        transaction.on_commit(lambda: _publish(ids))
+
+
+def replay(user_id, after_id, limit=REPLAY_LIMIT):
+    """``(notifications newer than after_id, oldest first, has_more)`` for a resuming client."""
+    rows = list(
+        _user_notifications(user_id).filter(id__gt=after_id)
+        .select_related('actor').order_by('id')[:limit + 1]
+    )
+    return serialize(rows[:limit]), len(rows) > limit
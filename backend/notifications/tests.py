@@ -1,3 +1,161 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from services.models import Service
+from . import retention, stream, unread
+from .models import Notification, NotificationArchive
+from .views import NotificationListView, notification_stats
+
+User = get_user_model()
+
+IN_MEMORY_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class NotificationsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="client", email="client@example.com", password="pass", role="client"
+        )
+
+    def notify(self, **fields):
+        return Notification.objects.create(recipient=self.user, message="إشعار", **fields)
+
+
+class UnreadReconcileTests(NotificationsTestCase):
+    def key(self):
+        return unread._key(unread.NOTIFICATIONS, self.user.id)
+
+    def test_drifted_counter_is_corrected(self):
+        self.notify()
+        cache.set(self.key(), 5)
+
+        self.assertEqual(unread.reconcile(), 1)
+        self.assertEqual(cache.get(self.key()), 1)
+
+    def test_correct_and_missing_counters_are_left_alone(self):
+        self.notify()
+        cache.set(self.key(), 1)
+
+        self.assertEqual(unread.reconcile(), 0)
+        self.assertEqual(cache.get(self.key()), 1)
+        self.assertIsNone(cache.get(unread._key(unread.CHAT, self.user.id)))
+
+    def test_counter_changed_after_it_was_read_is_not_overwritten(self):
+        self.notify()
+        cache.set(self.key(), 5)
+        get_many = cache.get_many
+
+        def read_then_concurrent_incr(keys):
+            found = get_many(keys)
+            if self.key() in keys:
+                # add() من طلب آخر بعد قراءة reconcile
+                cache.incr(self.key())
+            return found
+
+        with mock.patch.object(cache, "get_many", side_effect=read_then_concurrent_incr):
+            corrected = unread.reconcile()
+
+        self.assertEqual(corrected, 0)
+        self.assertEqual(cache.get(self.key()), 6)
+
+
+class NotificationRetentionTests(NotificationsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+
+    def notify_at(self, days_ago, read):
+        notification = self.notify(read_at=self.now if read else None)
+        created_at = self.now - timedelta(days=days_ago)
+        Notification.objects.filter(pk=notification.pk).update(created_at=created_at)
+        return notification.pk
+
+    def test_archives_old_read_notifications_only(self):
+        old_read = self.notify_at(200, read=True)
+        recent_read = self.notify_at(10, read=True)
+        old_unread = self.notify_at(800, read=False)
+
+        removed = retention.archive_read_notifications(self.now - timedelta(days=90), batch_size=1)
+
+        self.assertEqual(removed, 1)
+        self.assertTrue(NotificationArchive.objects.filter(pk=old_read).exists())
+        self.assertEqual(
+            set(Notification.objects.values_list("pk", flat=True)), {recent_read, old_unread}
+        )
+
+    def test_delete_only_skips_the_archive(self):
+        old_read = self.notify_at(200, read=True)
+
+        removed = retention.archive_read_notifications(self.now - timedelta(days=90), delete_only=True)
+
+        self.assertEqual(removed, 1)
+        self.assertFalse(Notification.objects.filter(pk=old_read).exists())
+        self.assertFalse(NotificationArchive.objects.exists())
+
+
+class NotificationStreamTests(NotificationsTestCase):
+    def test_new_notification_is_pushed_to_the_user_group_after_commit(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(stream.notification_group(self.user.id), channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = self.notify()
+
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(message["type"], "notification.created")
+        self.assertEqual(message["notification"]["id"], notification.id)
+
+    def test_replay_returns_newer_notifications_oldest_first(self):
+        first, second, third = (self.notify() for _ in range(3))
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="pass", role="client"
+        )
+        Notification.objects.create(recipient=other, message="إشعار")
+
+        rows, has_more = stream.replay(self.user.id, first.id)
+        self.assertEqual([row["id"] for row in rows], [second.id, third.id])
+        self.assertFalse(has_more)
+
+        rows, has_more = stream.replay(self.user.id, first.id, limit=1)
+        self.assertEqual([row["id"] for row in rows], [second.id])
+        self.assertTrue(has_more)
+
+
+class RecipientUserTests(NotificationsTestCase):
+    def get(self, view, **params):
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=self.user)
+        return view(request)
+
+    def test_save_copies_user_recipient(self):
+        notification = self.notify()
+        self.assertEqual(notification.recipient_user_id, self.user.id)
+
+        other = Notification.objects.create(recipient=Service.objects.create(title="سباكة"), message="إشعار")
+        self.assertIsNone(other.recipient_user_id)
+
+    def test_list_and_stats_use_recipient_user(self):
+        self.notify(level="info")
+        self.notify(level="warning", read_at=timezone.now())
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="pass", role="client"
+        )
+        Notification.objects.create(recipient=other, message="إشعار")
+
+        listed = self.get(NotificationListView.as_view(), unread="1")
+        self.assertEqual(len(listed.data), 1)
+
+        stats = self.get(notification_stats).data
+        self.assertEqual((stats["total_count"], stats["unread_count"]), (2, 1))
+        self.assertEqual(stats["level_stats"]["warning"]["count"], 1)
@@ -0,0 +1,238 @@
+"""
+Per-user unread counters kept in the cache (Redis in production).
+
+Two counters per user: ``chat`` (unread messages across the user's
+conversations whose order is accepted, in progress or completed, i.e. the
+sum of ``Conversation.customer_unread`` / ``worker_unread`` over those)
+and ``notifications`` (unread notifications addressed
+to the user). Writers call ``add`` / ``reset`` inside their transaction;
+the cache is only touched once it commits, and every change is pushed to
+the user's ``user_<id>`` channel-layer group as a delta, so open clients
+never have to poll.
+
+A missing key is seeded from the database the first time it is read or
+changed, so an evicted or expired counter is never wrong for long.
+``reconcile`` recomputes every counter from the database and fixes the
+ones that drifted (lost increments, bulk deletes, ...); it is run
+periodically by ``manage.py reconcile_unread_counters``. A correction is
+a compare-and-set (a Lua script on Redis): a counter that an ``add`` moved
+after it was read is left alone until the next run.
+"""
+import logging
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+
+logger = logging.getLogger(__name__)
+
+CHAT = "chat"
+NOTIFICATIONS = "notifications"
+KINDS = (CHAT, NOTIFICATIONS)
+
+KEY_PREFIX = "unread:"
+TIMEOUT = 7 * 24 * 3600
+
+
+def user_group(user_id):
+    """Channel-layer group every socket of ``user_id`` joins."""
+    return f"user_{user_id}"
+
+
+def _key(kind, user_id):
+    return f"{KEY_PREFIX}{kind}:{user_id}"
+
+
+# ---------------- Database (source of truth) ----------------
+def _chat_counts(user_ids):
+    from chat.models import Conversation
+
+    counts = Counter()
+    conversations = Conversation.objects.order_by().filter(
+        order__status__in=Conversation.UNREAD_ORDER_STATUSES
+    )
+    for row in (
+        conversations.filter(order__customer_id__in=user_ids)
+        .values("order__customer_id").annotate(total=Sum("customer_unread"))
+    ):
+        counts[row["order__customer_id"]] += row["total"] or 0
+    for row in (
+        conversations.filter(order__worker_id__in=user_ids)
+        .values("order__worker_id").annotate(total=Sum("worker_unread"))
+    ):
+        counts[row["order__worker_id"]] += row["total"] or 0
+    return counts
+
+
+def _notification_counts(user_ids):
+    from .models import Notification
+
+    rows = (
+        Notification.objects.order_by()
+        .filter(
+            recipient_user_id__in=user_ids,
+            read_at__isnull=True,
+        )
+        .values("recipient_user_id").annotate(total=Count("id"))
+    )
+    return Counter({row["recipient_user_id"]: row["total"] for row in rows})
+
+
+def counts_from_db(kind, user_ids):
+    """``{user_id: count}`` for every id in ``user_ids`` (zeros included)."""
+    user_ids = list(user_ids)
+    found = _chat_counts(user_ids) if kind == CHAT else _notification_counts(user_ids)
+    return {user_id: found.get(user_id, 0) for user_id in user_ids}
+
+
+# ---------------- Reads ----------------
+def _seed(kind, user_id):
+    value = counts_from_db(kind, [user_id])[user_id]
+    if not cache.add(_key(kind, user_id), value, timeout=TIMEOUT):
+        value = cache.get(_key(kind, user_id), value)
+    return value
+
+
+def get_counts(user_id, kinds=KINDS):
+    """``{kind: count}`` for one user, seeding missing counters from the database."""
+    try:
+        found = cache.get_many([_key(kind, user_id) for kind in kinds])
+    except Exception as e:
+        logger.warning(f"Unread counters unavailable: {e}")
+        return {kind: counts_from_db(kind, [user_id])[user_id] for kind in kinds}
+
+    counts = {}
+    for kind in kinds:
+        value = found.get(_key(kind, user_id))
+        counts[kind] = max(value, 0) if value is not None else _seed(kind, user_id)
+    return counts
+
+
+def get_count(kind, user_id):
+    return get_counts(user_id, kinds=(kind,))[kind]
+
+
+# ---------------- Writes ----------------
+def _push(updates):
+    from orders.outbox import push_channel_messages
+
+    push_channel_messages([
+        (user_group(user_id), {
+            "type": "unread.update",
+            "kind": kind,
+            "delta": delta,
+            "count": count,
+        })
+        for kind, user_id, delta, count in updates
+    ])
+
+
+def _apply(kind, deltas):
+    updates = []
+    for user_id, delta in deltas.items():
+        try:
+            try:
+                count = cache.incr(_key(kind, user_id), delta)
+            except ValueError:
+                # غير موجود في الكاش: القيمة من قاعدة البيانات تشمل التغيير بعد الـ commit
+                count = _seed(kind, user_id)
+        except Exception as e:
+            logger.warning(f"Failed to update {kind} unread counter of user {user_id}: {e}")
+            continue
+        updates.append((kind, user_id, delta, max(count, 0)))
+    if updates:
+        _push(updates)
+
+
+def add(kind, deltas):
+    """Apply ``{user_id: delta}`` once the current transaction commits."""
+    deltas = {user_id: delta for user_id, delta in deltas.items() if user_id and delta}
+    if deltas:
+        transaction.on_commit(lambda: _apply(kind, deltas))
+
+
+def _reset(kind, user_id):
+    try:
+        previous = cache.get(_key(kind, user_id))
+        cache.set(_key(kind, user_id), 0, timeout=TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Failed to reset {kind} unread counter of user {user_id}: {e}")
+        return
+    _push([(kind, user_id, -(previous or 0), 0)])
+
+
+def reset(kind, user_id):
+    """Set the counter to zero once the current transaction commits."""
+    transaction.on_commit(lambda: _reset(kind, user_id))
+
+
+def notifications_created(notifications):
+    """Count freshly inserted (e.g. bulk-created) unread notifications."""
+    deltas = Counter(
+        n.recipient_user_id for n in notifications
+        if n.recipient_user_id and n.read_at is None
+    )
+    add(NOTIFICATIONS, deltas)
+
+
+# ---------------- Reconciliation ----------------
+def reconcile(batch_size=1000):
+    """Recompute every user's counters from the database; returns how many were wrong."""
+    user_ids = get_user_model().objects.order_by("id").values_list("id", flat=True)
+    corrected = 0
+    batch = []
+    for user_id in user_ids.iterator(chunk_size=batch_size):
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            corrected += _reconcile_batch(batch)
+            batch = []
+    if batch:
+        corrected += _reconcile_batch(batch)
+    return corrected
+
+
+_CAS_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+def _compare_and_set(key, old, new):
+    """Set ``key`` to ``new`` only if it still holds ``old``; returns whether it did."""
+    client = getattr(cache, "_cache", None)
+    if hasattr(client, "get_client"):
+        # RedisCache: الأعداد الصحيحة مخزنة كنص بدون pickle
+        redis_client = client.get_client(key, write=True)
+        return bool(redis_client.eval(
+            _CAS_SCRIPT, 1, cache.make_and_validate_key(key), str(old), str(new), TIMEOUT
+        ))
+    # الكاش المحلي (الاختبارات): لا كتّاب من عمليات أخرى
+    if cache.get(key) != old:
+        return False
+    cache.set(key, new, timeout=TIMEOUT)
+    return True
+
+
+def _reconcile_batch(user_ids):
+    corrected = 0
+    for kind in KINDS:
+        expected = counts_from_db(kind, user_ids)
+        keys = {user_id: _key(kind, user_id) for user_id in user_ids}
+        cached = cache.get_many(list(keys.values()))
+        updates = []
+        for user_id, count in expected.items():
+            old = cached.get(keys[user_id])
+            if old in (None, count):
+                continue
+            # incr متزامن بعد القراءة: نتركه للدورة التالية بدل أن نمحوه
+            if _compare_and_set(keys[user_id], old, count):
+                updates.append((kind, user_id, count - old, count))
+        if updates:
+            corrected += len(updates)
+            _push(updates)
+    return corrected
@@ -2,8 +2,9 @@ from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
+from django.db.models import Count, Q
+from . import unread
 from .models import Notification
 from .serializers import NotificationSerializer, NotificationListSerializer, NotificationUpdateSerializer
 from orders.models import Order
@@ -14,12 +15,7 @@ class NotificationListView(generics.ListAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        content_type = ContentType.objects.get_for_model(user.__class__)
-        
-        qs = Notification.objects.filter(
-            recipient_content_type=content_type,
-            recipient_object_id=user.id
-        )
+        qs = Notification.objects.filter(recipient_user=user).select_related('actor')
         
         unread = self.request.query_params.get('unread')
         if unread and unread.lower() in ('1', 'true', 'yes'):
@@ -50,10 +46,8 @@ class NotificationDetailView(generics.RetrieveUpdateAPIView):
     
     def get_queryset(self):
         user = self.request.user
-        content_type = ContentType.objects.get_for_model(user.__class__)
-        return Notification.objects.filter(
-            recipient_content_type=content_type,
-            recipient_object_id=user.id
+        return NotificationSerializer.setup_queryset(
+            Notification.objects.filter(recipient_user=user)
         )
     
     def _get_user_profile(self):
@@ -68,15 +62,8 @@ class NotificationDetailView(generics.RetrieveUpdateAPIView):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def unread_count(request):
-    user = request.user
-    content_type = ContentType.objects.get_for_model(user.__class__)
-    
-    count = Notification.objects.filter(
-        recipient_content_type=content_type,
-        recipient_object_id=user.id,
-        read_at__isnull=True
-    ).count()
-    
+    # عدّاد محفوظ في Redis (notifications.unread) بدل COUNT على الجدول
+    count = unread.get_count(unread.NOTIFICATIONS, request.user.id)
     return Response({'unread_count': count})
 
 
@@ -84,13 +71,10 @@ def unread_count(request):
 @permission_classes([permissions.IsAuthenticated])
 def mark_read(request, pk):
     user = request.user
-    content_type = ContentType.objects.get_for_model(user.__class__)
-    
     notification = get_object_or_404(
         Notification,
         pk=pk,
-        recipient_content_type=content_type,
-        recipient_object_id=user.id
+        recipient_user=user
     )
     
     notification.mark_as_read()
@@ -101,16 +85,13 @@ def mark_read(request, pk):
 @permission_classes([permissions.IsAuthenticated])
 def mark_all_read(request):
     user = request.user
-    content_type = ContentType.objects.get_for_model(user.__class__)
-    
     notifications = Notification.objects.filter(
-        recipient_content_type=content_type,
-        recipient_object_id=user.id,
+        recipient_user=user,
         read_at__isnull=True
     )
     
-    count = notifications.count()
-    notifications.update(read_at=timezone.now())
+    count = notifications.update(read_at=timezone.now())
+    unread.reset(unread.NOTIFICATIONS, user.id)
     
     return Response({
         'status': 'ok', 
@@ -123,28 +104,22 @@ def mark_all_read(request):
 @permission_classes([permissions.IsAuthenticated])
 def notification_stats(request):
     user = request.user
-    content_type = ContentType.objects.get_for_model(user.__class__)
-    
-    unread_count = Notification.objects.filter(
-        recipient_content_type=content_type,
-        recipient_object_id=user.id,
-        read_at__isnull=True
-    ).count()
-    
-    total_count = Notification.objects.filter(
-        recipient_content_type=content_type,
-        recipient_object_id=user.id
-    ).count()
+    # كل الأعداد في استعلام واحد
+    counts = Notification.objects.filter(recipient_user=user).aggregate(
+        total=Count('id'),
+        unread=Count('id', filter=Q(read_at__isnull=True)),
+        **{
+            f'level_{level_code}': Count('id', filter=Q(level=level_code))
+            for level_code, _ in Notification.LEVEL_CHOICES
+        }
+    )
+    unread_count = counts['unread']
+    total_count = counts['total']
     
     level_stats = {}
     for level_code, level_name in Notification.LEVEL_CHOICES:
-        count = Notification.objects.filter(
-            recipient_content_type=content_type,
-            recipient_object_id=user.id,
-            level=level_code
-        ).count()
         level_stats[level_code] = {
-            'count': count,
+            'count': counts[f'level_{level_code}'],
             'display_name': level_name
         }
     
@@ -169,13 +144,10 @@ def notification_action(request, notification_id):
     """Handle accept/decline actions for notifications"""
     try:
         user = request.user
-        content_type = ContentType.objects.get_for_model(user.__class__)
-        
         notification = get_object_or_404(
             Notification,
             id=notification_id,
-            recipient_content_type=content_type,
-            recipient_object_id=user.id,
+            recipient_user=user,
             requires_action=True,
             action_taken=False
         )
@@ -1,6 +1,41 @@
 from django.contrib import admin
-from .models import Order, Offer, Negotiation
+from .models import Order, Offer, Negotiation, OutboxEvent
+from .outbox import MAX_ATTEMPTS, replay
 
 admin.site.register(Order)
 admin.site.register(Offer)
 admin.site.register(Negotiation)
+
+
+class OutboxStateFilter(admin.SimpleListFilter):
+    title = 'state'
+    parameter_name = 'state'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('pending', 'Pending'),
+            ('processed', 'Processed'),
+            ('dead', f'Dead (failed {MAX_ATTEMPTS} times)'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'pending':
+            return queryset.filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+        if self.value() == 'processed':
+            return queryset.filter(processed_at__isnull=False)
+        if self.value() == 'dead':
+            return queryset.filter(processed_at__isnull=True, attempts__gte=MAX_ATTEMPTS)
+        return queryset
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'order', 'new_status', 'attempts', 'next_attempt_at', 'created_at', 'processed_at')
+    list_filter = (OutboxStateFilter, 'topic')
+    readonly_fields = ('created_at',)
+    actions = ['replay_events']
+
+    @admin.action(description='Replay selected events')
+    def replay_events(self, request, queryset):
+        count = replay(queryset)
+        self.message_user(request, f'{count} event(s) queued again.')
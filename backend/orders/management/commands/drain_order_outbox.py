@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.outbox import drain
+
+
+class Command(BaseCommand):
+    help = "Apply pending order side effects (notifications, invoices, chat pushes) from the order outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--interval", type=float, default=1.0,
+                            help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain what is pending now and exit.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+        while True:
+            processed = drain(batch_size=batch_size)
+            total += processed
+            if processed:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Drained {total} outbox events"))
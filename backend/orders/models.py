@@ -1,10 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from core.tracking import TrackedFieldsMixin
 from services.models import Service
 from django.utils import timezone
 
-class Order(models.Model):
+class Order(TrackedFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ('pending','Pending'),
         ('accepted','Accepted'),
@@ -13,6 +15,7 @@ class Order(models.Model):
         ('completed','Completed'),
         ('cancelled','Cancelled')
     ]
+    tracked_fields = ('status',)
     customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
     worker = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='worker_orders')
     service = models.ForeignKey(Service, on_delete=models.CASCADE)
@@ -30,6 +33,25 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     date_created = models.DateTimeField(auto_now_add=True)  # Legacy field for database compatibility
 
+    class Meta:
+        # Match the order_list shapes: keyset walks on (created_at, id) per
+        # worker, per provider service, per customer and for staff.
+        indexes = [
+            models.Index(fields=['worker', '-created_at', '-id'], name='order_worker_keyset_idx',
+                         condition=models.Q(is_deleted=False)),
+            models.Index(fields=['service', '-created_at', '-id'], name='order_service_keyset_idx',
+                         condition=models.Q(is_deleted=False)),
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_keyset_idx',
+                         condition=models.Q(is_deleted=False)),
+            models.Index(fields=['-created_at', '-id'], name='order_keyset_idx',
+                         condition=models.Q(is_deleted=False)),
+        ]
+
+    def save(self, *args, **kwargs):
+        # post_save يكتب أحداث الـ outbox داخل نفس المعاملة
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 class Offer(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='offers')
     provider = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='offers')
@@ -62,3 +84,40 @@ class Booking(models.Model):
     
     def __str__(self):
         return f"Booking #{self.id} - {self.service.name}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Side effects of an order change, written in the order's transaction and
+    applied later by the ``drain_order_outbox`` worker (at-least-once).
+    """
+    TOPIC_ORDER_CREATED = 'order_created'
+    TOPIC_ORDER_STATUS_CHANGED = 'order_status_changed'
+    TOPIC_NOTIFICATION = 'notification'
+    TOPIC_CHOICES = [
+        (TOPIC_ORDER_CREATED, 'Order created'),
+        (TOPIC_ORDER_STATUS_CHANGED, 'Order status changed'),
+        (TOPIC_NOTIFICATION, 'Notification'),
+    ]
+
+    topic = models.CharField(max_length=40, choices=TOPIC_CHOICES)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, blank=True, related_name='outbox_events')
+    old_status = models.CharField(max_length=20, blank=True)
+    new_status = models.CharField(max_length=20, blank=True)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # بعد كل فشل ننتظر مدة تتضاعف قبل المحاولة التالية
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['id'], name='outbox_pending_idx',
+                         condition=models.Q(processed_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.id} (order {self.order_id})"
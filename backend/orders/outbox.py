@@ -0,0 +1,202 @@
+"""
+Order outbox: side effects of order changes, applied off the request path.
+
+Writers call ``enqueue_*`` inside the transaction that changes the order, so
+an event exists if and only if the change committed. ``drain`` (run by the
+``drain_order_outbox`` worker) locks a batch of pending events, dispatches
+each one through the ``order_event`` signal, bulk-inserts the collected
+notifications and pushes the collected channel-layer messages once the
+batch has committed. Failed events are retried with an exponential
+backoff (``next_attempt_at``) up to ``MAX_ATTEMPTS`` times, so handlers
+must tolerate being run more than once for the same event.
+
+An event that fails ``MAX_ATTEMPTS`` times is dead: it is logged at error
+level and no longer picked up. ``dead_events`` lists them (the admin
+shows them under the "dead" state filter) and ``replay`` puts them back
+in the queue once the cause is fixed.
+"""
+import logging
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Order, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 5
+
+# Sent once per drained event with ``event``, ``order`` (None for events
+# without an order) and ``effects``. Receivers do their database work
+# directly and append notifications / channel messages to ``effects``.
+order_event = Signal()
+
+
+class Effects:
+    def __init__(self):
+        self.notifications = []
+        self.channel_messages = []
+
+    def notify(self, notification):
+        self.notifications.append(notification)
+
+    def group_send(self, group, message):
+        self.channel_messages.append((group, message))
+
+    def extend(self, other):
+        self.notifications.extend(other.notifications)
+        self.channel_messages.extend(other.channel_messages)
+
+
+# ---------------- Writers ----------------
+def enqueue_order_event(order, topic, old_status='', new_status='', payload=None):
+    event = OutboxEvent.objects.create(
+        topic=topic,
+        order=order,
+        old_status=old_status or '',
+        new_status=new_status or '',
+        payload=payload or {},
+    )
+    if getattr(settings, 'ORDER_OUTBOX_EAGER', False):
+        transaction.on_commit(drain)
+    return event
+
+
+def enqueue_notification(recipient, actor=None, target=None, order=None, **fields):
+    """Queue one Notification row; ``fields`` are plain Notification model fields."""
+    payload = dict(fields)
+    payload['recipient_content_type_id'] = ContentType.objects.get_for_model(recipient).id
+    payload['recipient_object_id'] = recipient.pk
+    payload['actor_id'] = actor.pk if actor else None
+    if target is not None:
+        payload['target_content_type_id'] = ContentType.objects.get_for_model(target).id
+        payload['target_object_id'] = target.pk
+    if order is None and isinstance(target, Order):
+        order = target
+    return enqueue_order_event(order, OutboxEvent.TOPIC_NOTIFICATION, payload=payload)
+
+
+# ---------------- Worker ----------------
+def retry_at(attempts, now=None):
+    """When an event that has now failed ``attempts`` times is tried again."""
+    return (now or timezone.now()) + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def _mark_failed(events, errors):
+    now = timezone.now()
+    for event in events:
+        event.attempts += 1
+        event.next_attempt_at = retry_at(event.attempts, now)
+        event.last_error = errors[event.id][:2000]
+        if event.attempts >= MAX_ATTEMPTS:
+            logger.error(
+                f"Outbox event {event.id} ({event.topic}, order {event.order_id}) gave up after "
+                f"{event.attempts} attempts: {event.last_error}"
+            )
+    OutboxEvent.objects.bulk_update(events, ['attempts', 'next_attempt_at', 'last_error'])
+
+
+def dead_events():
+    """Events that failed MAX_ATTEMPTS times and are no longer retried."""
+    return OutboxEvent.objects.filter(processed_at__isnull=True, attempts__gte=MAX_ATTEMPTS)
+
+
+def replay(events):
+    """Queue dead (or failing) ``events`` again right away; returns how many were reset."""
+    count = events.filter(processed_at__isnull=True).update(attempts=0, next_attempt_at=timezone.now())
+    if count and getattr(settings, 'ORDER_OUTBOX_EAGER', False):
+        transaction.on_commit(drain)
+    return count
+
+
+def _apply_batch(batch):
+    from notifications import stream, unread
+    from notifications.models import Notification
+
+    if batch.notifications:
+        for notification in batch.notifications:
+            notification.fill_recipient_user()
+        Notification.objects.bulk_create(batch.notifications, batch_size=500)
+        unread.notifications_created(batch.notifications)
+        stream.publish(batch.notifications)
+
+
+def drain(batch_size=100):
+    """Process one batch of due events. Returns the number of events picked up."""
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(
+                processed_at__isnull=True,
+                attempts__lt=MAX_ATTEMPTS,
+                next_attempt_at__lte=timezone.now(),
+            )
+            .order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        orders = Order.objects.select_related(
+            'customer', 'worker', 'service', 'service__provider'
+        ).in_bulk({event.order_id for event in events if event.order_id})
+
+        batch = Effects()
+        done, failed, errors = [], [], {}
+        try:
+            with transaction.atomic():
+                for event in events:
+                    effects = Effects()
+                    try:
+                        with transaction.atomic():
+                            order_event.send(
+                                sender=OutboxEvent, event=event,
+                                order=orders.get(event.order_id), effects=effects,
+                            )
+                    except Exception as e:
+                        logger.exception(f"Outbox event {event.id} ({event.topic}) failed")
+                        failed.append(event)
+                        errors[event.id] = str(e)
+                        continue
+                    batch.extend(effects)
+                    done.append(event)
+                _apply_batch(batch)
+        except Exception as e:
+            # فشل الإدراج المجمّع: نلغي عمل الدفعة كلها ونحسبه فشلاً لكل أحداثها
+            # بدل أن يوقف الـ worker ويعيد نفس الدفعة للأبد
+            logger.exception(f"Outbox batch of {len(done)} events failed")
+            failed.extend(done)
+            errors.update({event.id: f"batch: {e}" for event in done})
+            done = []
+            batch = Effects()
+
+        OutboxEvent.objects.filter(id__in=[event.id for event in done]).update(processed_at=timezone.now())
+        if failed:
+            _mark_failed(failed, errors)
+
+        if batch.channel_messages:
+            messages = batch.channel_messages
+            transaction.on_commit(lambda: push_channel_messages(messages))
+
+    return len(events)
+
+
+def push_channel_messages(messages):
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not messages:
+        return
+
+    async def _send_all():
+        for group, message in messages:
+            try:
+                await channel_layer.group_send(group, message)
+            except Exception as e:
+                logger.warning(f"Channel push to {group} failed: {e}")
+
+    async_to_sync(_send_all)()
@@ -0,0 +1,86 @@
+"""
+Keyset (cursor) pagination helpers for function-based list views.
+
+Rows are walked newest first on ``(created_at, id)``: the cursor encodes the
+last row of the previous page and the next page starts strictly after it,
+so deep pages cost the same as the first one instead of scanning and
+discarding every earlier row like OFFSET does.
+"""
+import base64
+import json
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor")
+    if created_at is None:
+        raise InvalidCursor("Invalid cursor")
+    return created_at, pk
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        page_size = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def keyset_page(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, field="created_at"):
+    """
+    Return ``(rows, next_cursor)`` for one page of ``queryset`` ordered by
+    ``(-field, -id)``. ``next_cursor`` is None on the last page.
+    Raises InvalidCursor for a malformed cursor.
+    """
+    queryset = queryset.order_by(f"-{field}", "-id")
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        # الشرط الأول وحده هو حد نطاق الفهرس، والثاني يحسم التساوي
+        queryset = queryset.filter(
+            Q(**{f"{field}__lte": value}),
+            Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk}),
+        )
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return rows, next_cursor
+
+
+def approximate_count(queryset):
+    """
+    Planner row estimate for ``queryset`` (PostgreSQL ``EXPLAIN``), without
+    running the count. Good enough for "about N results" on large tables.
+    """
+    queryset = queryset.order_by()
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -1,10 +1,9 @@
 # orders/signals.py
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import Order
+from .models import Order, OutboxEvent
+from .outbox import enqueue_order_event, order_event
 # from invoices.models import Invoice  # Temporarily disabled - invoices app incomplete
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 
 # 1️⃣ إنشاء فاتورة لما الطلب يكتمل - Temporarily disabled
 # @receiver(post_save, sender=Order)
@@ -18,16 +17,32 @@ def create_invoice_when_completed_disabled(sender, instance, created, **kwargs):
     #             total_amount=instance.service.price
     #         )
 
-# 2️⃣ غلق الشات لما الطلب يكتمل أو يُلغى
+# 2️⃣ كتابة أحداث الطلب في الـ outbox داخل نفس المعاملة
 @receiver(post_save, sender=Order)
-def close_chat_on_order_complete(sender, instance, **kwargs):
-    if instance.status in ['completed', 'cancelled']:
-        channel_layer = get_channel_layer()
-        if channel_layer is not None:
-            async_to_sync(channel_layer.group_send)(
-                f'chat_{instance.id}',
-                {
-                    'type': 'order_closed',
-                    'order_id': instance.id,
-                }
-            )
+def enqueue_order_lifecycle_event(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        enqueue_order_event(instance, OutboxEvent.TOPIC_ORDER_CREATED, new_status=instance.status)
+        return
+    # الحالة السابقة محفوظة منذ تحميل الطلب (TrackedFieldsMixin) بدون استعلام إضافي
+    if instance.has_changed('status'):
+        old_status = instance.previous('status')
+        enqueue_order_event(
+            instance, OutboxEvent.TOPIC_ORDER_STATUS_CHANGED,
+            old_status=old_status, new_status=instance.status,
+        )
+
+# 3️⃣ غلق الشات لما الطلب يكتمل أو يُلغى
+@receiver(order_event)
+def close_chat_on_order_complete(sender, event, order, effects, **kwargs):
+    if event.topic != OutboxEvent.TOPIC_ORDER_STATUS_CHANGED:
+        return
+    if event.new_status in ['completed', 'cancelled']:
+        effects.group_send(
+            f'chat_{event.order_id}',
+            {
+                'type': 'order_closed',
+                'order_id': event.order_id,
+            }
+        )
@@ -1,3 +1,141 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+
+from notifications.models import Notification
+from services.models import Service
+from .models import Order, OutboxEvent
+from .outbox import MAX_ATTEMPTS, dead_events, drain, enqueue_notification, order_event, replay
+from .pagination import InvalidCursor, keyset_page
+
+User = get_user_model()
+
+
+class OutboxDrainTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="client", email="client@example.com", password="pass", role="client"
+        )
+
+    def _enqueue(self, verb="test"):
+        return enqueue_notification(
+            recipient=self.user, verb=verb, message="رسالة", short_message="رسالة"
+        )
+
+    def test_drain_inserts_notifications_and_marks_processed(self):
+        events = [self._enqueue(), self._enqueue()]
+
+        self.assertEqual(drain(), 2)
+
+        self.assertEqual(Notification.objects.filter(recipient_object_id=self.user.pk).count(), 2)
+        for event in events:
+            event.refresh_from_db()
+            self.assertIsNotNone(event.processed_at)
+        self.assertEqual(drain(), 0)
+
+    def test_failed_event_is_retried_after_backoff(self):
+        event = self._enqueue(verb="boom")
+
+        def fail(sender, event, **kwargs):
+            if event.payload.get("verb") == "boom":
+                raise RuntimeError("handler failed")
+
+        order_event.connect(fail)
+        try:
+            ok = self._enqueue()
+            self.assertEqual(drain(), 2)
+        finally:
+            order_event.disconnect(fail)
+
+        event.refresh_from_db()
+        ok.refresh_from_db()
+        self.assertIsNone(event.processed_at)
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("handler failed", event.last_error)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        self.assertIsNotNone(ok.processed_at)
+
+        # لم يحن موعد المحاولة التالية بعد
+        self.assertEqual(drain(), 0)
+
+        OutboxEvent.objects.filter(id=event.id).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(drain(), 1)
+        event.refresh_from_db()
+        self.assertIsNotNone(event.processed_at)
+
+    def test_batch_failure_fails_every_event_of_the_batch(self):
+        events = [self._enqueue(), self._enqueue()]
+
+        with mock.patch("orders.outbox._apply_batch", side_effect=RuntimeError("insert failed")):
+            self.assertEqual(drain(), 2)
+
+        self.assertFalse(Notification.objects.filter(recipient_object_id=self.user.pk).exists())
+        for event in events:
+            event.refresh_from_db()
+            self.assertIsNone(event.processed_at)
+            self.assertEqual(event.attempts, 1)
+            self.assertTrue(event.last_error.startswith("batch:"))
+            self.assertGreater(event.next_attempt_at, timezone.now())
+
+    def test_event_is_given_up_after_max_attempts(self):
+        event = self._enqueue()
+        OutboxEvent.objects.filter(id=event.id).update(attempts=MAX_ATTEMPTS)
+
+        self.assertEqual(drain(), 0)
+
+    def test_last_failure_is_logged_and_event_can_be_replayed(self):
+        event = self._enqueue()
+        OutboxEvent.objects.filter(id=event.id).update(attempts=MAX_ATTEMPTS - 1)
+
+        with mock.patch("orders.outbox._apply_batch", side_effect=RuntimeError("insert failed")):
+            with self.assertLogs("orders.outbox", level="ERROR") as logs:
+                drain()
+
+        self.assertTrue(any("gave up" in line for line in logs.output))
+        self.assertEqual(list(dead_events()), [event])
+
+        self.assertEqual(replay(OutboxEvent.objects.filter(id=event.id)), 1)
+        self.assertFalse(dead_events().exists())
+        self.assertEqual(drain(), 1)
+        event.refresh_from_db()
+        self.assertIsNotNone(event.processed_at)
+
+
+class KeysetPageTests(TestCase):
+    def setUp(self):
+        customer = User.objects.create_user(
+            username="client", email="client@example.com", password="pass", role="client"
+        )
+        service = Service.objects.create(title="سباكة")
+        self.orders = [Order.objects.create(customer=customer, service=service) for _ in range(5)]
+        # صفان بنفس الوقت لاختبار الحسم بالـ id
+        now = timezone.now()
+        for order, created_at in zip(self.orders, [
+            now - timedelta(minutes=3), now - timedelta(minutes=2), now - timedelta(minutes=2),
+            now - timedelta(minutes=1), now,
+        ]):
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+
+    def test_walks_every_row_once_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(Order.objects.all(), cursor, page_size=2)
+            seen.extend(order.pk for order in rows)
+            if cursor is None:
+                break
+
+        # الصفان المتساويان في الوقت مرتبان بالـ id تنازلياً
+        self.assertEqual(seen, [o.pk for o in reversed(self.orders)])
+
+    def test_last_page_has_no_cursor(self):
+        rows, cursor = keyset_page(Order.objects.all(), page_size=5)
+
+        self.assertEqual(len(rows), 5)
+        self.assertIsNone(cursor)
 
-# Create your tests here.
+    def test_rejects_malformed_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            keyset_page(Order.objects.all(), "not-a-cursor")
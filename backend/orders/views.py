@@ -1,34 +1,32 @@
 from django.shortcuts import get_object_or_404
-from django.db import models
+from django.db import models, transaction
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from .models import Order, Offer, Negotiation
 from .serializers import OrderSerializer, OfferSerializer, NegotiationSerializer
-from notifications.models import Notification
+from .pagination import InvalidCursor, approximate_count, keyset_page, parse_page_size
+from services.models import Service
+from .outbox import enqueue_notification
 from invoices.models import Invoice
-from django.contrib.contenttypes.models import ContentType
 
 # Helper function for creating notifications
 def create_notification(recipient, actor, verb, message, short_message, level='info', **kwargs):
-    """Create a notification with proper Generic Foreign Key handling"""
+    """Queue a notification in the order outbox; the drain worker inserts it in bulk"""
     try:
-        recipient_content_type = ContentType.objects.get_for_model(recipient)
-        
-        notification_data = {
-            'recipient_content_type': recipient_content_type,
-            'recipient_object_id': recipient.id,
-            'actor': actor,
-            'verb': verb,
-            'message': message,
-            'short_message': short_message,
-            'level': level,
-        }
-        
-        # Add any additional fields
-        notification_data.update(kwargs)
-        
-        return Notification.objects.create(**notification_data)
+        # savepoint: فشل الإشعار لا يُفسد معاملة الطلب المحيطة
+        with transaction.atomic():
+            return enqueue_notification(
+                recipient=recipient,
+                actor=actor,
+                target=kwargs.pop('target', None),
+                order=kwargs.pop('order', None),
+                verb=verb,
+                message=message,
+                short_message=short_message,
+                level=level,
+                **kwargs
+            )
     except Exception as e:
         print(f"Error creating notification: {e}")
         return None
@@ -40,6 +38,8 @@ def order_list(request):
     """
     GET: List all orders of the current user (client) or all if admin
          If worker_only=true, show all pending orders for workers
+         Pass cursor= (or pagination=cursor) for keyset pages ordered by
+         (created_at, id); include_total=true adds an approximate count
     POST: Create a new order
     """
     if request.method == "GET":
@@ -48,8 +48,10 @@ def order_list(request):
         
         if worker_only and hasattr(request.user, 'role') and request.user.role == 'worker':
             # For workers: show orders assigned to them + orders for their services
+            # service_id__in بدلاً من join على service__provider ليستفيد من الفهارس
+            provider_services = Service.objects.filter(provider=request.user).values('id')
             orders = Order.objects.filter(
-                models.Q(worker=request.user) | models.Q(service__provider=request.user),
+                models.Q(worker=request.user) | models.Q(service_id__in=provider_services),
                 is_deleted=False
             ).select_related(
                 'customer', 
@@ -80,7 +82,28 @@ def order_list(request):
         if status_filter and status_filter != 'all':
             orders = orders.filter(status=status_filter)
         
+        # Keyset pagination: ?cursor= (empty for the first page) or ?pagination=cursor
+        if 'cursor' in request.GET or request.GET.get('pagination') == 'cursor':
+            page_size = parse_page_size(request.GET.get('page_size'))
+            try:
+                orders_page, next_cursor = keyset_page(
+                    orders, request.GET.get('cursor'), page_size
+                )
+            except InvalidCursor:
+                return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+            
+            data = {
+                'results': OrderSerializer(orders_page, many=True).data,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'page_size': page_size,
+            }
+            if request.GET.get('include_total', 'false').lower() == 'true':
+                data['approximate_count'] = approximate_count(orders)
+            return Response(data)
+        
         # Apply pagination
+        orders = orders.order_by('-created_at', '-id')
         page = int(request.GET.get('page', 1))
         page_size = int(request.GET.get('page_size', 10))
         start = (page - 1) * page_size
@@ -245,35 +268,37 @@ def accept_order(request, pk):
         try:
             order.status = 'accepted'
             order.worker = request.user  # Assign worker to order
-            order.save()
+            # الإشعار يُكتب في الـ outbox داخل نفس معاملة تحديث الطلب
+            with transaction.atomic():
+                order.save()
+
+                # Create notification for customer
+                try:
+                    create_notification(
+                        recipient=order.customer,
+                        actor=request.user,
+                        verb='order_accepted',
+                        message=f'تم قبول طلبك #{order.id} من قبل {request.user.username}',
+                        short_message=f'تم قبول الطلب #{order.id}',
+                        level='success',
+                        requires_action=False,
+                        offered_price=order.offered_price,
+                        service_name=order.service.title if order.service else 'خدمة غير محددة',
+                        job_description=order.description or 'طلب جديد',
+                        location_lat=order.location_lat,
+                        location_lng=order.location_lng,
+                        location_address=order.location_address or 'عنوان غير محدد',
+                        url=f'/track-order'
+                    )
+                except Exception as e:
+                    # Log notification error but don't fail the request
+                    print(f"Warning: Failed to create notification: {e}")
         except Exception as e:
             return Response(
                 {"error": f"Failed to update order: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
         
-        # Create notification for customer
-        try:
-            create_notification(
-                recipient=order.customer,
-                actor=request.user,
-                verb='order_accepted',
-                message=f'تم قبول طلبك #{order.id} من قبل {request.user.username}',
-                short_message=f'تم قبول الطلب #{order.id}',
-                level='success',
-                requires_action=False,
-                offered_price=order.offered_price,
-                service_name=order.service.title if order.service else 'خدمة غير محددة',
-                job_description=order.description or 'طلب جديد',
-                location_lat=order.location_lat,
-                location_lng=order.location_lng,
-                location_address=order.location_address or 'عنوان غير محدد',
-                url=f'/track-order'
-            )
-        except Exception as e:
-            # Log notification error but don't fail the request
-            print(f"Warning: Failed to create notification: {e}")
-        
         # Serialize response
         try:
             serializer = OrderSerializer(order)
@@ -325,25 +350,29 @@ def complete_order(request, pk):
         
         # Update order status
         order.status = 'completed'
-        order.save()
+        # الإشعار يُكتب في الـ outbox داخل نفس معاملة تحديث الطلب
+        with transaction.atomic():
+            order.save()
         
-        # Create notification for worker
-        Notification.objects.create(
-            recipient=order.worker or order.service.provider,
-            verb='order_completed',
-            message=f'تم تأكيد اكتمال الطلب #{order.id} من قبل العميل {request.user.username}',
-            short_message=f'تم تأكيد اكتمال الطلب #{order.id}',
-            level='success',
-            requires_action=False,
-            # Add order details to notification
-            offered_price=order.offered_price,
-            service_name=order.service.title if order.service else 'خدمة غير محددة',
-            job_description=order.description or 'طلب مكتمل',
-            location_lat=order.location_lat,
-            location_lng=order.location_lng,
-            location_address=order.location_address,
-            url=f'/orders/{order.id}'
-        )
+            # Create notification for worker
+            create_notification(
+                recipient=order.worker or order.service.provider,
+                actor=request.user,
+                verb='order_completed',
+                message=f'تم تأكيد اكتمال الطلب #{order.id} من قبل العميل {request.user.username}',
+                short_message=f'تم تأكيد اكتمال الطلب #{order.id}',
+                level='success',
+                requires_action=False,
+                # Add order details to notification
+                offered_price=order.offered_price,
+                service_name=order.service.title if order.service else 'خدمة غير محددة',
+                job_description=order.description or 'طلب مكتمل',
+                location_lat=order.location_lat,
+                location_lng=order.location_lng,
+                location_address=order.location_address,
+                url=f'/orders/{order.id}',
+                order=order
+            )
         
         serializer = OrderSerializer(order)
         return Response({
@@ -384,29 +413,31 @@ def approve_completion(request, pk):
         
         # Update order status to approved_completed
         order.status = 'approved_completed'
-        order.save()
+        # الإشعار يُكتب في الـ outbox داخل نفس معاملة تحديث الطلب
+        with transaction.atomic():
+            order.save()
         
-        # Create notification for worker
-        try:
-            create_notification(
-                recipient=order.worker or order.service.provider,
-                actor=request.user,
-                verb='order_approved',
-                message=f'وافق العميل {request.user.username} على اكتمال الطلب #{order.id}. سيتم إنشاء الفاتورة تلقائياً.',
-                short_message=f'تم الموافقة على الطلب #{order.id}',
-                target=order,
-                url=f'/orders/{order.id}',
-                level='success',
-                offered_price=order.offered_price,
-                service_name=order.service.title if order.service else 'خدمة غير محددة',
-                job_description=order.description or 'طلب مكتمل',
-                location_lat=order.location_lat,
-                location_lng=order.location_lng,
-                location_address=order.location_address,
-                requires_action=False
-            )
-        except Exception as e:
-            print(f"Error creating notification: {e}")
+            # Create notification for worker
+            try:
+                create_notification(
+                    recipient=order.worker or order.service.provider,
+                    actor=request.user,
+                    verb='order_approved',
+                    message=f'وافق العميل {request.user.username} على اكتمال الطلب #{order.id}. سيتم إنشاء الفاتورة تلقائياً.',
+                    short_message=f'تم الموافقة على الطلب #{order.id}',
+                    target=order,
+                    url=f'/orders/{order.id}',
+                    level='success',
+                    offered_price=order.offered_price,
+                    service_name=order.service.title if order.service else 'خدمة غير محددة',
+                    job_description=order.description or 'طلب مكتمل',
+                    location_lat=order.location_lat,
+                    location_lng=order.location_lng,
+                    location_address=order.location_address,
+                    requires_action=False
+                )
+            except Exception as e:
+                print(f"Error creating notification: {e}")
         
         serializer = OrderSerializer(order)
         return Response({
@@ -450,28 +481,30 @@ def decline_order(request, pk):
         # Update order status
         order.status = 'declined'
         order.decline_reason = decline_reason
-        order.save()
+        # الإشعار يُكتب في الـ outbox داخل نفس معاملة تحديث الطلب
+        with transaction.atomic():
+            order.save()
         
-        # Create notification for customer
-        try:
-            create_notification(
-                recipient=order.customer,
-                actor=request.user,
-                verb='order_declined',
-                message=f'تم رفض طلبك #{order.id} من قبل {request.user.username}. السبب: {decline_reason}',
-                short_message=f'تم رفض الطلب #{order.id}',
-                level='warning',
-                requires_action=False,
-                offered_price=order.offered_price,
-                service_name=order.service.title if order.service else 'خدمة غير محددة',
-                job_description=order.description or 'طلب مرفوض',
-                location_lat=order.location_lat,
-                location_lng=order.location_lng,
-                location_address=order.location_address or 'عنوان غير محدد',
-                url=f'/track-order'
-            )
-        except Exception as e:
-            print(f"Warning: Failed to create decline notification: {e}")
+            # Create notification for customer
+            try:
+                create_notification(
+                    recipient=order.customer,
+                    actor=request.user,
+                    verb='order_declined',
+                    message=f'تم رفض طلبك #{order.id} من قبل {request.user.username}. السبب: {decline_reason}',
+                    short_message=f'تم رفض الطلب #{order.id}',
+                    level='warning',
+                    requires_action=False,
+                    offered_price=order.offered_price,
+                    service_name=order.service.title if order.service else 'خدمة غير محددة',
+                    job_description=order.description or 'طلب مرفوض',
+                    location_lat=order.location_lat,
+                    location_lng=order.location_lng,
+                    location_address=order.location_address or 'عنوان غير محدد',
+                    url=f'/track-order'
+                )
+            except Exception as e:
+                print(f"Warning: Failed to create decline notification: {e}")
         
         serializer = OrderSerializer(order)
         return Response({
@@ -512,29 +545,31 @@ def approve_completion(request, pk):
         
         # Update order status to approved_completed
         order.status = 'approved_completed'
-        order.save()
+        # الإشعار يُكتب في الـ outbox داخل نفس معاملة تحديث الطلب
+        with transaction.atomic():
+            order.save()
         
-        # Create notification for worker
-        try:
-            create_notification(
-                recipient=order.worker or order.service.provider,
-                actor=request.user,
-                verb='order_approved',
-                message=f'وافق العميل {request.user.username} على اكتمال الطلب #{order.id}. سيتم إنشاء الفاتورة تلقائياً.',
-                short_message=f'تم الموافقة على الطلب #{order.id}',
-                target=order,
-                url=f'/orders/{order.id}',
-                level='success',
-                offered_price=order.offered_price,
-                service_name=order.service.title if order.service else 'خدمة غير محددة',
-                job_description=order.description or 'طلب مكتمل',
-                location_lat=order.location_lat,
-                location_lng=order.location_lng,
-                location_address=order.location_address,
-                requires_action=False
-            )
-        except Exception as e:
-            print(f"Error creating notification: {e}")
+            # Create notification for worker
+            try:
+                create_notification(
+                    recipient=order.worker or order.service.provider,
+                    actor=request.user,
+                    verb='order_approved',
+                    message=f'وافق العميل {request.user.username} على اكتمال الطلب #{order.id}. سيتم إنشاء الفاتورة تلقائياً.',
+                    short_message=f'تم الموافقة على الطلب #{order.id}',
+                    target=order,
+                    url=f'/orders/{order.id}',
+                    level='success',
+                    offered_price=order.offered_price,
+                    service_name=order.service.title if order.service else 'خدمة غير محددة',
+                    job_description=order.description or 'طلب مكتمل',
+                    location_lat=order.location_lat,
+                    location_lng=order.location_lng,
+                    location_address=order.location_address,
+                    requires_action=False
+                )
+            except Exception as e:
+                print(f"Error creating notification: {e}")
         
         serializer = OrderSerializer(order)
         return Response({
@@ -585,29 +620,31 @@ def start_order(request, pk):
         
         # Update order status
         order.status = 'in_progress'
-        order.save()
+        # الإشعار يُكتب في الـ outbox داخل نفس معاملة تحديث الطلب
+        with transaction.atomic():
+            order.save()
         
-        # Create notification for customer
-        try:
-            create_notification(
-                recipient=order.customer,
-                actor=request.user,
-                verb='order_started',
-                message=f'بدأ العامل {request.user.username} العمل على طلبك #{order.id}',
-                short_message=f'بدأ العمل على الطلب #{order.id}',
-                target=order,
-                url=f'/orders/{order.id}',
-                level='info',
-                offered_price=order.offered_price,
-                service_name=order.service.title if order.service else 'خدمة غير محددة',
-                job_description=order.description or 'طلب قيد التنفيذ',
-                location_lat=order.location_lat,
-                location_lng=order.location_lng,
-                location_address=order.location_address,
-                requires_action=False
-            )
-        except Exception as e:
-            print(f"Error creating notification: {e}")
+            # Create notification for customer
+            try:
+                create_notification(
+                    recipient=order.customer,
+                    actor=request.user,
+                    verb='order_started',
+                    message=f'بدأ العامل {request.user.username} العمل على طلبك #{order.id}',
+                    short_message=f'بدأ العمل على الطلب #{order.id}',
+                    target=order,
+                    url=f'/orders/{order.id}',
+                    level='info',
+                    offered_price=order.offered_price,
+                    service_name=order.service.title if order.service else 'خدمة غير محددة',
+                    job_description=order.description or 'طلب قيد التنفيذ',
+                    location_lat=order.location_lat,
+                    location_lng=order.location_lng,
+                    location_address=order.location_address,
+                    requires_action=False
+                )
+            except Exception as e:
+                print(f"Error creating notification: {e}")
         
         serializer = OrderSerializer(order)
         return Response({
@@ -648,29 +685,31 @@ def approve_completion(request, pk):
         
         # Update order status to approved_completed
         order.status = 'approved_completed'
-        order.save()
+        # الإشعار يُكتب في الـ outbox داخل نفس معاملة تحديث الطلب
+        with transaction.atomic():
+            order.save()
         
-        # Create notification for worker
-        try:
-            create_notification(
-                recipient=order.worker or order.service.provider,
-                actor=request.user,
-                verb='order_approved',
-                message=f'وافق العميل {request.user.username} على اكتمال الطلب #{order.id}. سيتم إنشاء الفاتورة تلقائياً.',
-                short_message=f'تم الموافقة على الطلب #{order.id}',
-                target=order,
-                url=f'/orders/{order.id}',
-                level='success',
-                offered_price=order.offered_price,
-                service_name=order.service.title if order.service else 'خدمة غير محددة',
-                job_description=order.description or 'طلب مكتمل',
-                location_lat=order.location_lat,
-                location_lng=order.location_lng,
-                location_address=order.location_address,
-                requires_action=False
-            )
-        except Exception as e:
-            print(f"Error creating notification: {e}")
+            # Create notification for worker
+            try:
+                create_notification(
+                    recipient=order.worker or order.service.provider,
+                    actor=request.user,
+                    verb='order_approved',
+                    message=f'وافق العميل {request.user.username} على اكتمال الطلب #{order.id}. سيتم إنشاء الفاتورة تلقائياً.',
+                    short_message=f'تم الموافقة على الطلب #{order.id}',
+                    target=order,
+                    url=f'/orders/{order.id}',
+                    level='success',
+                    offered_price=order.offered_price,
+                    service_name=order.service.title if order.service else 'خدمة غير محددة',
+                    job_description=order.description or 'طلب مكتمل',
+                    location_lat=order.location_lat,
+                    location_lng=order.location_lng,
+                    location_address=order.location_address,
+                    requires_action=False
+                )
+            except Exception as e:
+                print(f"Error creating notification: {e}")
         
         serializer = OrderSerializer(order)
         return Response({
@@ -711,25 +750,29 @@ def complete_order(request, pk):
         
         # Update order status
         order.status = 'completed'
-        order.save()
+        # الإشعار يُكتب في الـ outbox داخل نفس معاملة تحديث الطلب
+        with transaction.atomic():
+            order.save()
         
-        # Create notification for worker
-        Notification.objects.create(
-            recipient=order.worker or order.service.provider,
-            verb='order_completed',
-            message=f'تم تأكيد اكتمال الطلب #{order.id} من قبل العميل {request.user.username}',
-            short_message=f'تم تأكيد اكتمال الطلب #{order.id}',
-            level='success',
-            requires_action=False,
-            # Add order details to notification
-            offered_price=order.offered_price,
-            service_name=order.service.title if order.service else 'خدمة غير محددة',
-            job_description=order.description or 'طلب مكتمل',
-            location_lat=order.location_lat,
-            location_lng=order.location_lng,
-            location_address=order.location_address,
-            url=f'/orders/{order.id}'
-        )
+            # Create notification for worker
+            create_notification(
+                recipient=order.worker or order.service.provider,
+                actor=request.user,
+                verb='order_completed',
+                message=f'تم تأكيد اكتمال الطلب #{order.id} من قبل العميل {request.user.username}',
+                short_message=f'تم تأكيد اكتمال الطلب #{order.id}',
+                level='success',
+                requires_action=False,
+                # Add order details to notification
+                offered_price=order.offered_price,
+                service_name=order.service.title if order.service else 'خدمة غير محددة',
+                job_description=order.description or 'طلب مكتمل',
+                location_lat=order.location_lat,
+                location_lng=order.location_lng,
+                location_address=order.location_address,
+                url=f'/orders/{order.id}',
+                order=order
+            )
         
         serializer = OrderSerializer(order)
         return Response({
@@ -770,29 +813,31 @@ def approve_completion(request, pk):
         
         # Update order status to approved_completed
         order.status = 'approved_completed'
-        order.save()
+        # الإشعار يُكتب في الـ outbox داخل نفس معاملة تحديث الطلب
+        with transaction.atomic():
+            order.save()
         
-        # Create notification for worker
-        try:
-            create_notification(
-                recipient=order.worker or order.service.provider,
-                actor=request.user,
-                verb='order_approved',
-                message=f'وافق العميل {request.user.username} على اكتمال الطلب #{order.id}. سيتم إنشاء الفاتورة تلقائياً.',
-                short_message=f'تم الموافقة على الطلب #{order.id}',
-                target=order,
-                url=f'/orders/{order.id}',
-                level='success',
-                offered_price=order.offered_price,
-                service_name=order.service.title if order.service else 'خدمة غير محددة',
-                job_description=order.description or 'طلب مكتمل',
-                location_lat=order.location_lat,
-                location_lng=order.location_lng,
-                location_address=order.location_address,
-                requires_action=False
-            )
-        except Exception as e:
-            print(f"Error creating notification: {e}")
+            # Create notification for worker
+            try:
+                create_notification(
+                    recipient=order.worker or order.service.provider,
+                    actor=request.user,
+                    verb='order_approved',
+                    message=f'وافق العميل {request.user.username} على اكتمال الطلب #{order.id}. سيتم إنشاء الفاتورة تلقائياً.',
+                    short_message=f'تم الموافقة على الطلب #{order.id}',
+                    target=order,
+                    url=f'/orders/{order.id}',
+                    level='success',
+                    offered_price=order.offered_price,
+                    service_name=order.service.title if order.service else 'خدمة غير محددة',
+                    job_description=order.description or 'طلب مكتمل',
+                    location_lat=order.location_lat,
+                    location_lng=order.location_lng,
+                    location_address=order.location_address,
+                    requires_action=False
+                )
+            except Exception as e:
+                print(f"Error creating notification: {e}")
         
         serializer = OrderSerializer(order)
         return Response({
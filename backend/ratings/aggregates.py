@@ -0,0 +1,133 @@
+"""
+صيانة ملخصات التقييم المخزنة على الخدمة ومقدم الخدمة
+
+``Service`` carries the summary of its non-deleted reviews and
+``ProviderRatingSummary`` the summary of every Rating on the provider's
+services. Signals apply single-row deltas with one UPDATE; the
+``rebuild_*`` functions recompute everything with conditional aggregation.
+"""
+from functools import reduce
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q, Value
+from django.db.models.functions import Cast, Greatest, NullIf
+
+from services.models import RatingAggregate, Service
+from reviews.models import Review
+from .models import Rating, ProviderRatingSummary
+
+STARS = RatingAggregate.STARS
+
+
+def _delta_updates(removed=None, added=None):
+    """UPDATE kwargs that move one score out of / into a summary row, or None if nothing changes."""
+    deltas = {star: 0 for star in STARS}
+    if removed in deltas:
+        deltas[removed] -= 1
+    if added in deltas:
+        deltas[added] += 1
+    if not any(deltas.values()):
+        return None
+
+    counts = {
+        star: Greatest(F(f"rating_{star}_count") + delta, Value(0)) if delta else F(f"rating_{star}_count")
+        for star, delta in deltas.items()
+    }
+    total = Greatest(F("rating_count") + sum(deltas.values()), Value(0))
+    score_sum = reduce(lambda acc, star: acc + star * counts[star], STARS[1:], counts[STARS[0]])
+
+    updates = {f"rating_{star}_count": counts[star] for star, delta in deltas.items() if delta}
+    updates["rating_count"] = total
+    updates["rating_avg"] = ExpressionWrapper(
+        Cast(score_sum, FloatField()) / NullIf(total, Value(0)),
+        output_field=FloatField(),
+    )
+    return updates
+
+
+def _summary_aggregates(score_field="score"):
+    """Conditional aggregates producing every RatingAggregate column in one pass."""
+    aggregates = {
+        f"rating_{star}_count": Count("pk", filter=Q(**{score_field: star}))
+        for star in STARS
+    }
+    aggregates["rating_count"] = Count("pk", filter=Q(**{f"{score_field}__in": STARS}))
+    return aggregates
+
+
+def _summary_values(row):
+    values = {f"rating_{star}_count": row[f"rating_{star}_count"] for star in STARS}
+    values["rating_count"] = row["rating_count"]
+    score_sum = sum(star * row[f"rating_{star}_count"] for star in STARS)
+    values["rating_avg"] = score_sum / row["rating_count"] if row["rating_count"] else None
+    return values
+
+
+def _empty_values():
+    values = {f"rating_{star}_count": 0 for star in STARS}
+    values.update(rating_count=0, rating_avg=None)
+    return values
+
+
+def apply_service_delta(service_id, removed=None, added=None):
+    updates = _delta_updates(removed, added)
+    if updates and service_id:
+        Service.objects.filter(pk=service_id).update(**updates)
+
+
+def apply_provider_delta(provider_id, removed=None, added=None):
+    updates = _delta_updates(removed, added)
+    if not updates or not provider_id:
+        return
+    summaries = ProviderRatingSummary.objects.filter(provider_id=provider_id)
+    if summaries.update(**updates):
+        return
+    # أول تقييم لهذا المزود: ننشئ الملخص من البيانات الفعلية (وتشمل هذا التقييم)
+    row = Rating.objects.filter(service__provider_id=provider_id).aggregate(**_summary_aggregates())
+    try:
+        with transaction.atomic():
+            ProviderRatingSummary.objects.create(provider_id=provider_id, **_summary_values(row))
+    except IntegrityError:
+        # طلب متزامن أنشأ الملخص قبلنا ولم يرَ تقييمنا: نطبق الفرق عليه
+        summaries.update(**updates)
+
+
+def rebuild_service_aggregates(batch_size=1000):
+    """Recompute every Service summary from its non-deleted reviews. Returns the number of services with reviews."""
+    rows = (
+        Review.objects.filter(is_deleted=False)
+        .order_by()
+        .values("service_id")
+        .annotate(**_summary_aggregates())
+    )
+    with transaction.atomic():
+        Service.objects.update(**_empty_values())
+        services = []
+        for row in rows.iterator(chunk_size=batch_size):
+            services.append(Service(pk=row["service_id"], **_summary_values(row)))
+        fields = list(_empty_values())
+        Service.objects.bulk_update(services, fields, batch_size=batch_size)
+    return len(services)
+
+
+def rebuild_provider_summaries(provider_ids=None, batch_size=1000):
+    """Recompute ProviderRatingSummary rows (all, or only ``provider_ids``). Returns the number of rows written."""
+    rows = Rating.objects.filter(service__provider__isnull=False)
+    if provider_ids is not None:
+        rows = rows.filter(service__provider_id__in=provider_ids)
+    rows = (
+        rows.order_by()
+        .values("service__provider_id")
+        .annotate(**_summary_aggregates())
+    )
+    summaries = [
+        ProviderRatingSummary(provider_id=row["service__provider_id"], **_summary_values(row))
+        for row in rows.iterator(chunk_size=batch_size)
+    ]
+    with transaction.atomic():
+        existing = ProviderRatingSummary.objects.all()
+        if provider_ids is not None:
+            existing = existing.filter(provider_id__in=provider_ids)
+        existing.delete()
+        ProviderRatingSummary.objects.bulk_create(summaries, batch_size=batch_size)
+    return len(summaries)
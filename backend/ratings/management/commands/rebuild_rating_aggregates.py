@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from ratings.aggregates import rebuild_service_aggregates, rebuild_provider_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized rating summaries on Service and ProviderRatingSummary from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        services = rebuild_service_aggregates(batch_size=batch_size)
+        providers = rebuild_provider_summaries(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rating aggregates: {services} services, {providers} providers"
+        ))
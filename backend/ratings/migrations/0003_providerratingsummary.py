@@ -0,0 +1,70 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+STARS = (1, 2, 3, 4, 5)
+
+
+def _aggregates():
+    aggregates = {f'rating_{star}_count': Count('pk', filter=Q(score=star)) for star in STARS}
+    aggregates['rating_count'] = Count('pk', filter=Q(score__in=STARS))
+    return aggregates
+
+
+def _values(row):
+    values = {f'rating_{star}_count': row[f'rating_{star}_count'] for star in STARS}
+    values['rating_count'] = row['rating_count']
+    total = sum(star * row[f'rating_{star}_count'] for star in STARS)
+    values['rating_avg'] = total / row['rating_count'] if row['rating_count'] else None
+    return values
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Service = apps.get_model('services', 'Service')
+    Review = apps.get_model('reviews', 'Review')
+    Rating = apps.get_model('ratings', 'Rating')
+    ProviderRatingSummary = apps.get_model('ratings', 'ProviderRatingSummary')
+
+    service_rows = (Review.objects.filter(is_deleted=False).order_by()
+                    .values('service_id').annotate(**_aggregates()))
+    for row in service_rows:
+        Service.objects.filter(pk=row['service_id']).update(**_values(row))
+
+    provider_rows = (Rating.objects.filter(service__provider__isnull=False).order_by()
+                     .values('service__provider_id').annotate(**_aggregates()))
+    ProviderRatingSummary.objects.bulk_create([
+        ProviderRatingSummary(provider_id=row['service__provider_id'], **_values(row))
+        for row in provider_rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ratings', '0002_alter_rating_score'),
+        ('reviews', '0001_initial'),
+        ('services', '0003_service_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderRatingSummary',
+            fields=[
+                ('rating_avg', models.FloatField(blank=True, null=True)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_1_count', models.PositiveIntegerField(default=0)),
+                ('rating_2_count', models.PositiveIntegerField(default=0)),
+                ('rating_3_count', models.PositiveIntegerField(default=0)),
+                ('rating_4_count', models.PositiveIntegerField(default=0)),
+                ('rating_5_count', models.PositiveIntegerField(default=0)),
+                ('provider', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
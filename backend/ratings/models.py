@@ -1,9 +1,12 @@
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
-from services.models import Service
+from core.tracking import TrackedFieldsMixin
+from services.models import RatingAggregate, Service
+
+class Rating(TrackedFieldsMixin, models.Model):
+    tracked_fields = ("score",)
 
-class Rating(models.Model):
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="ratings")
     customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="ratings")
     score = models.PositiveSmallIntegerField(default=5)  # 1..5
@@ -19,3 +22,17 @@ class Rating(models.Model):
 
     def __str__(self):
         return f"{self.customer} → {self.service} : {self.score}"
+
+
+class ProviderRatingSummary(RatingAggregate):
+    """Rollup of every Rating on a provider's services (one row per provider)."""
+    provider = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="rating_summary",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.provider} : {self.rating_avg} ({self.rating_count})"
@@ -1,17 +1,78 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from reviews.models import Review
+from services.models import Service
 from .models import Rating
+from .aggregates import apply_service_delta, apply_provider_delta
 
 @receiver(post_save, sender=Review)
 def upsert_rating_from_review(sender, instance: Review, created, **kwargs):
     if instance.is_deleted:
+        # الحذف الناعم: التقييم يتبع آخر مراجعة باقية للعميل على الخدمة
+        if not created and instance.has_changed("is_deleted"):
+            _sync_rating_with_reviews(instance.service_id, instance.customer_id)
         return
     Rating.objects.update_or_create(
         service=instance.service, customer=instance.customer,
         defaults={"score": instance.score}
     )
 
+
+def _sync_rating_with_reviews(service_id, customer_id):
+    latest = (
+        Review.objects.filter(service_id=service_id, customer_id=customer_id, is_deleted=False)
+        .order_by("-created_at", "-id").values_list("score", flat=True).first()
+    )
+    if latest is None:
+        Rating.objects.filter(service_id=service_id, customer_id=customer_id).delete()
+    else:
+        Rating.objects.update_or_create(
+            service_id=service_id, customer_id=customer_id, defaults={"score": latest}
+        )
+
 @receiver(post_delete, sender=Review)
 def remove_rating_when_review_deleted(sender, instance: Review, **kwargs):
     Rating.objects.filter(service=instance.service, customer=instance.customer).delete()
+
+
+# ---------------- Rating aggregates ----------------
+def _counted_review_score(is_deleted, score):
+    return None if is_deleted else score
+
+@receiver(post_save, sender=Review)
+def update_service_rating_aggregates(sender, instance: Review, created, raw=False, **kwargs):
+    if raw:
+        return
+    removed = None
+    if not created:
+        removed = _counted_review_score(instance.previous("is_deleted"), instance.previous("score"))
+    apply_service_delta(
+        instance.service_id,
+        removed=removed,
+        added=_counted_review_score(instance.is_deleted, instance.score),
+    )
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_service_aggregates(sender, instance: Review, **kwargs):
+    apply_service_delta(
+        instance.service_id,
+        removed=_counted_review_score(instance.is_deleted, instance.score),
+    )
+
+
+def _provider_id(service_id):
+    return Service.objects.filter(pk=service_id).values_list("provider_id", flat=True).first()
+
+@receiver(post_save, sender=Rating)
+def update_provider_rating_summary(sender, instance: Rating, created, raw=False, **kwargs):
+    if raw:
+        return
+    apply_provider_delta(
+        _provider_id(instance.service_id),
+        removed=None if created else instance.previous("score"),
+        added=instance.score,
+    )
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_provider_summary(sender, instance: Rating, **kwargs):
+    apply_provider_delta(_provider_id(instance.service_id), removed=instance.score)
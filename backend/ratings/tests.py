@@ -1,3 +1,66 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from reviews.models import Review
+from services.models import Service
+from .aggregates import apply_provider_delta
+from .models import ProviderRatingSummary, Rating
+
+User = get_user_model()
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.provider = User.objects.create_user(
+            username="worker", email="worker@example.com", password="pass", role="worker"
+        )
+        self.customer = User.objects.create_user(
+            username="client", email="client@example.com", password="pass", role="client"
+        )
+        self.service = Service.objects.create(provider=self.provider, title="سباكة")
+
+    def summary(self):
+        return ProviderRatingSummary.objects.get(provider=self.provider)
+
+    def test_first_rating_creates_the_provider_summary(self):
+        Review.objects.create(service=self.service, customer=self.customer, score=4)
+
+        summary = self.summary()
+        self.assertEqual(summary.rating_count, 1)
+        self.assertEqual(summary.rating_4_count, 1)
+        self.assertEqual(summary.rating_avg, 4)
+
+    def test_soft_deleting_a_review_removes_its_rating(self):
+        review = Review.objects.create(service=self.service, customer=self.customer, score=4)
+
+        review.is_deleted = True
+        review.save()
+
+        self.assertFalse(Rating.objects.filter(service=self.service, customer=self.customer).exists())
+        self.service.refresh_from_db()
+        self.assertEqual(self.service.rating_count, 0)
+        summary = self.summary()
+        self.assertEqual(summary.rating_count, 0)
+        self.assertIsNone(summary.rating_avg)
+
+    def test_soft_delete_falls_back_to_the_remaining_review(self):
+        Review.objects.create(service=self.service, customer=self.customer, score=2)
+        latest = Review.objects.create(service=self.service, customer=self.customer, score=5)
+
+        latest.is_deleted = True
+        latest.save()
+
+        rating = Rating.objects.get(service=self.service, customer=self.customer)
+        self.assertEqual(rating.score, 2)
+        self.assertEqual(self.summary().rating_avg, 2)
+
+    def test_missing_summary_is_rebuilt_from_ratings(self):
+        Review.objects.create(service=self.service, customer=self.customer, score=3)
+        ProviderRatingSummary.objects.filter(provider=self.provider).delete()
+
+        apply_provider_delta(self.provider.id, removed=3, added=5)
+
+        # الصف المفقود يُبنى من التقييمات الفعلية دون تطبيق الفرق مرتين
+        summary = self.summary()
+        self.assertEqual(summary.rating_count, 1)
+        self.assertEqual(summary.rating_3_count, 1)
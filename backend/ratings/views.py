@@ -2,7 +2,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from django.shortcuts import get_object_or_404
-from .models import Rating
+from .models import Rating, ProviderRatingSummary
 from .serializers import RatingSerializer
 from services.models import Service
 
@@ -50,7 +50,6 @@ def my_ratings(request):
 def provider_ratings(request, provider_id):
     """Get rating statistics for a specific provider/worker"""
     from accounts.models import WorkerProfile
-    from django.db.models import Avg, Count
     from reviews.models import Review
     
     try:
@@ -62,19 +61,10 @@ def provider_ratings(request, provider_id):
     provider_services = Service.objects.filter(provider_id=provider_id, is_active=True)
     service_ids = provider_services.values_list('id', flat=True)
     
-    # Get rating statistics for all services
-    ratings_stats = Rating.objects.filter(
-        service_id__in=service_ids
-    ).aggregate(
-        average_rating=Avg('score'),
-        total_ratings=Count('id')
-    )
-    
-    # Get rating distribution
-    rating_distribution = {}
-    for score in range(1, 6):
-        count = Rating.objects.filter(service_id__in=service_ids, score=score).count()
-        rating_distribution[score] = count
+    # ملخص التقييمات المخزن مسبقاً (يُحدّث مع كل تقييم)
+    summary = ProviderRatingSummary.objects.filter(provider_id=provider_id).first()
+    if summary is None:
+        summary = ProviderRatingSummary(provider_id=provider_id)
     
     # Get recent reviews for this provider
     recent_reviews = Review.objects.filter(
@@ -94,9 +84,9 @@ def provider_ratings(request, provider_id):
         })
     
     return Response({
-        'average_rating': round(ratings_stats['average_rating'] or 0, 2),
-        'total_ratings': ratings_stats['total_ratings'] or 0,
-        'rating_distribution': rating_distribution,
+        'average_rating': round(summary.rating_avg or 0, 2),
+        'total_ratings': summary.rating_count,
+        'rating_distribution': summary.rating_histogram,
         'recent_reviews': recent_reviews_data
     })
 
@@ -3,8 +3,11 @@ from django.utils import timezone
 from django.conf import settings
 from services.models import Service
 from orders.models import Order
+from core.tracking import TrackedFieldsMixin
+
+class Review(TrackedFieldsMixin, models.Model):
+    tracked_fields = ("score", "is_deleted")
 
-class Review(models.Model):
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="reviews")
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="reviews", null=True, blank=True)
     customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -16,6 +19,10 @@ class Review(models.Model):
     class Meta:
         unique_together = ("service", "customer", "order")
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["service", "-created_at", "-id"], name="review_service_keyset_idx",
+                         condition=models.Q(is_deleted=False)),
+        ]
 
     def __str__(self):
         return f"{self.service.title} - {self.score}★ by {self.customer.username}"
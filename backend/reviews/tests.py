@@ -1,3 +1,100 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from services.models import Service
+from .models import Review
+from .views import service_reviews_page
+
+User = get_user_model()
+
+
+class TrackedFieldsTests(TestCase):
+    """core.tracking.TrackedFieldsMixin, through Review (score, is_deleted)."""
+
+    def setUp(self):
+        customer = User.objects.create_user(
+            username="client", email="client@example.com", password="pass", role="client"
+        )
+        service = Service.objects.create(title="سباكة")
+        self.review = Review.objects.create(service=service, customer=customer, score=4)
+
+    def test_new_instance_has_changed_and_no_previous(self):
+        review = Review(score=5)
+
+        self.assertTrue(review.has_changed("score"))
+        self.assertIsNone(review.previous("score"))
+
+    def test_loaded_instance_tracks_changes_without_queries(self):
+        review = Review.objects.get(pk=self.review.pk)
+
+        with self.assertNumQueries(0):
+            self.assertFalse(review.has_changed("score"))
+            review.score = 2
+            self.assertTrue(review.has_changed("score"))
+            self.assertEqual(review.previous("score"), 4)
+            self.assertEqual(review.changed_fields(), {"score": 4})
+
+    def test_snapshot_is_reset_after_save(self):
+        review = Review.objects.get(pk=self.review.pk)
+        review.score = 2
+        review.save()
+
+        self.assertFalse(review.has_changed("score"))
+        self.assertEqual(review.previous("score"), 2)
+
+    def test_update_fields_only_resets_saved_fields(self):
+        review = Review.objects.get(pk=self.review.pk)
+        review.score = 2
+        review.is_deleted = True
+        review.save(update_fields=["score"])
+
+        self.assertFalse(review.has_changed("score"))
+        self.assertTrue(review.has_changed("is_deleted"))
+        self.assertFalse(review.previous("is_deleted"))
+
+    def test_deferred_field_previous_is_loaded_once(self):
+        review = Review.objects.only("id").get(pk=self.review.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(review.previous("score"), 4)
+            self.assertEqual(review.previous("score"), 4)
+
+    def test_deferred_field_changed_after_assignment(self):
+        review = Review.objects.only("id").get(pk=self.review.pk)
+        review.score = 1
+
+        self.assertTrue(review.has_changed("score"))
+        self.assertEqual(review.previous("score"), 4)
+
+    def test_untracked_field_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.review.previous("comment")
+
+
+class ServiceReviewsPageTests(TestCase):
+    def setUp(self):
+        customer = User.objects.create_user(
+            username="client", email="client@example.com", password="pass", role="client"
+        )
+        self.service = Service.objects.create(title="سباكة")
+        self.reviews = [
+            Review.objects.create(service=self.service, customer=customer, score=score)
+            for score in (5, 4, 3)
+        ]
+        Review.objects.create(service=self.service, customer=customer, score=1, is_deleted=True)
+
+    def get(self, **params):
+        return service_reviews_page(RequestFactory().get("/", params), service_id=self.service.id)
+
+    def test_pages_newest_first_without_deleted_reviews(self):
+        first = self.get(page_size=2).data
+
+        self.assertEqual([row["id"] for row in first["results"]], [r.id for r in self.reviews[:0:-1]])
+        self.assertTrue(first["has_more"])
+
+        second = self.get(page_size=2, cursor=first["next_cursor"]).data
+        self.assertEqual([row["id"] for row in second["results"]], [self.reviews[0].id])
+        self.assertIsNone(second["next_cursor"])
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.get(cursor="not-a-cursor").status_code, 400)
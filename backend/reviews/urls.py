@@ -6,6 +6,9 @@ urlpatterns = [
     # POST /api/reviews/service/1/ → إضافة ريفيو جديد لخدمة معينة
     path("service/<int:service_id>/", views.service_reviews, name="service_reviews"),
 
+    # GET /api/reviews/service/1/page/?cursor=... → صفحة من الريفيوز (keyset، الأحدث أولاً)
+    path("service/<int:service_id>/page/", views.service_reviews_page, name="service_reviews_page"),
+
     # POST /api/reviews/create/ → إنشاء ريفيو بدون order
     # POST /api/reviews/create/5/ → إنشاء ريفيو مرتبط بـ order
     path("create/", views.create_review, name="create_review"),
@@ -7,12 +7,13 @@ from .serializers import ReviewSerializer
 from orders.models import Order
 from services.models import Service
 from rest_framework.permissions import IsAuthenticated
+from orders.pagination import InvalidCursor, keyset_page, parse_page_size
 
 @api_view(["GET", "POST"])
 @permission_classes([IsAuthenticated])
 def service_reviews(request, service_id):
     if request.method == "GET":
-        reviews = Review.objects.filter(service_id=service_id, is_deleted=False)
+        reviews = Review.objects.filter(service_id=service_id, is_deleted=False).select_related("customer")
         serializer = ReviewSerializer(reviews, many=True)
         return Response(serializer.data)
 
@@ -25,6 +26,27 @@ def service_reviews(request, service_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def service_reviews_page(request, service_id):
+    """
+    Keyset-paginated reviews of one service, newest first.
+    ?cursor=<next_cursor from the previous page>&page_size=N
+    """
+    reviews = Review.objects.filter(service_id=service_id, is_deleted=False).select_related("customer")
+    page_size = parse_page_size(request.GET.get("page_size"))
+    try:
+        rows, next_cursor = keyset_page(reviews, request.GET.get("cursor"), page_size)
+    except InvalidCursor:
+        return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        "results": ReviewSerializer(rows, many=True).data,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+        "page_size": page_size,
+    })
+
+
 @api_view(["POST"])
 @permission_classes([permissions.IsAuthenticated])
 def create_review(request, order_id=None):
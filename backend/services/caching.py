@@ -0,0 +1,13 @@
+"""Cache tags for the public catalog endpoints (see core.cache)."""
+
+TAG_CATEGORIES = "catalog:categories"
+TAG_SERVICES = "catalog:services"
+
+
+def provider_tag(provider_id):
+    return f"provider:{provider_id}"
+
+
+def provider_profile_tags(request, *args, **kwargs):
+    # أسماء التصنيفات تظهر داخل قائمة خدمات المزود
+    return [provider_tag(kwargs.get("pk")), TAG_CATEGORIES]
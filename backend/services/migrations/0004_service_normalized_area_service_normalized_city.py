@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('location', '0007_city_area_geocodecache_and_more'),
+        ('services', '0003_service_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='normalized_area',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='services', to='location.area'),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='normalized_city',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='services', to='location.city'),
+        ),
+    ]
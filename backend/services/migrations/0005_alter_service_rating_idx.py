@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:00
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_service_normalized_area_service_normalized_city'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='service',
+            name='service_rating_idx',
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(django.db.models.expressions.OrderBy(django.db.models.expressions.F('rating_avg'), descending=True, nulls_last=True), 'id', name='service_rating_idx'),
+        ),
+    ]
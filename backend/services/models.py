@@ -2,6 +2,7 @@ from django.db import models
 from django.utils import timezone
 from django.conf import settings
 from django.contrib.gis.db import models as gis_models
+from core.tracking import TrackedFieldsMixin
 
 class ServiceCategory(models.Model):
     name = models.CharField(max_length=120, unique=True)
@@ -11,7 +12,34 @@ class ServiceCategory(models.Model):
     def __str__(self):
         return self.name
 
-class Service(models.Model):
+class RatingAggregate(models.Model):
+    """
+    Denormalized rating summary: count, average and a per-star histogram.
+
+    Kept current incrementally by ``ratings.aggregates`` and rebuilt from
+    scratch by the ``rebuild_rating_aggregates`` management command.
+    """
+    STARS = (1, 2, 3, 4, 5)
+
+    rating_avg = models.FloatField(null=True, blank=True)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f"rating_{star}_count") for star in self.STARS}
+
+
+class Service(TrackedFieldsMixin, RatingAggregate):
+    tracked_fields = ("city", "location")
+
     provider = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -29,6 +57,15 @@ class Service(models.Model):
     title = models.CharField(max_length=200, null=True, blank=True)
     description = models.TextField(blank=True, null=True)
     city = models.CharField(max_length=120, blank=True, null=True)
+    # المدينة والحي بعد التوحيد (location.geocoding)
+    normalized_city = models.ForeignKey(
+        "location.City", on_delete=models.SET_NULL, null=True, blank=True, related_name="services"
+    )
+    normalized_area = models.ForeignKey(
+        "location.Area", on_delete=models.SET_NULL, null=True, blank=True, related_name="services"
+    )
+    # لا مدينة لهذا العنوان (GeocodeCache): backfill_geo_areas يتخطاه حتى يتغيّر
+    geocode_failed = models.BooleanField(default=False, editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, default=0.00)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(default=timezone.now)
@@ -40,6 +77,12 @@ class Service(models.Model):
         verbose_name="Service Location"
     )
 
+    class Meta:
+        indexes = [
+            # يطابق ترتيب ?ordering=rating (القيم الفارغة في الآخر)
+            models.Index(models.F("rating_avg").desc(nulls_last=True), "id", name="service_rating_idx"),
+        ]
+
     def __str__(self):
         return f"{self.title} — {self.provider.username if self.provider else 'No Provider'}"
 
@@ -0,0 +1,84 @@
+import math
+
+from django.contrib.gis.db.models.functions import Distance, GeometryDistance
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
+from django.db.models import F, Q
+
+from .models import Service
+
+KM_PER_DEG_LAT = 111.32
+
+
+def provider_point(provider_ref="provider"):
+    """
+    النقطة المرجعية للمزود: الموقع الرئيسي إن وجد وإلا أحدث موقع محفوظ
+    (جدول CurrentLocation، صف واحد لكل عامل)
+    """
+    return F(f"{provider_ref}__current_location__location")
+
+
+def _degrees(lat, radius_km):
+    """Radius in degrees, wide enough in both directions at latitude ``lat``."""
+    return radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+
+
+def search_services(lat, lng, radius_km=10, service_type=None, q="", max_results=50):
+    """
+    البحث عن الخدمات القريبة
+
+    Services of workers whose current location lies within ``radius_km``
+    are returned nearest first: ``ST_DWithin`` on the GiST-indexed
+    ``CurrentLocation.location`` bounds the candidates, the exact spherical
+    distance filters them and the raw KNN ``<->`` operator orders them.
+    When nothing is in range a second ``ORDER BY <-> LIMIT`` query returns
+    the nearest matching services with ``distance_km`` set to
+    ``radius_km + 1``, as before. Returns a list of ``Service`` instances
+    with ``distance_km`` set.
+    """
+    search_point = Point(lng, lat, srid=4326)
+    location = "provider__current_location__location"
+
+    qs = Service.objects.filter(
+        is_deleted=False,
+        is_active=True,
+        provider__isnull=False,
+    )
+
+    if service_type:
+        try:
+            qs = qs.filter(category_id=int(service_type))
+        except (ValueError, TypeError):
+            qs = qs.filter(category__name__icontains=service_type)
+
+    if q:
+        qs = qs.filter(
+            Q(title__icontains=q) |
+            Q(description__icontains=q) |
+            Q(category__name__icontains=q)
+        )
+
+    qs = qs.select_related("category", "provider").annotate(provider_point=provider_point())
+
+    nearby = qs.filter(
+        provider__role="worker",
+        # مربع بالدرجات يستخدم فهرس GiST ثم المسافة الدقيقة بالكيلومتر
+        **{
+            f"{location}__dwithin": (search_point, _degrees(lat, radius_km)),
+            f"{location}__distance_lte": (search_point, D(km=radius_km)),
+        },
+    ).annotate(
+        distance=Distance("provider_point", search_point),
+    ).order_by(GeometryDistance("provider_point", search_point))
+
+    results = list(nearby[:max_results])
+    for service in results:
+        service.distance_km = service.distance
+    if results:
+        return results
+
+    # لا يوجد أحد ضمن النطاق: أقرب الخدمات المطابقة
+    results = list(qs.order_by(GeometryDistance("provider_point", search_point))[:max_results])
+    for service in results:
+        service.distance_km = radius_km + 1
+    return results
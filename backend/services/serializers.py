@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from .models import Service, ServiceCategory, Favorite
 from reviews.serializers import ReviewSerializer
-from django.db.models import Avg, Count
+from django.db.models import Avg, Count, Manager
 
 class ServiceCategorySerializer(serializers.ModelSerializer):
     created_at = serializers.DateTimeField(format="%Y-%m-%d %H:%M", read_only=True)
@@ -9,6 +9,73 @@ class ServiceCategorySerializer(serializers.ModelSerializer):
         model = ServiceCategory
         fields = ["id", "name", "created_at"]
 
+class ServiceListSerializer(serializers.ListSerializer):
+    """
+    Resolve per-row lookups for the whole page at once.
+
+    Before the rows are rendered, the ids of the page's services the
+    requesting user has favorited and the providers' locations are loaded
+    with one query each and kept on this list serializer (not in the shared
+    context, which nested or repeated lists would see), where
+    ``get_in_favorites`` / ``get_provider_location`` read them through
+    ``self.parent``. A service serialized on its own is looked up directly.
+    """
+    favorite_service_ids = None
+    provider_points = None
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, Manager) else data)
+        fields = self.child.fields
+
+        if "in_favorites" in fields:
+            self.favorite_service_ids = self._load_favorite_ids(items)
+        if "provider_location" in fields:
+            self.provider_points = self._load_provider_points(items)
+
+        return super().to_representation(items)
+
+    def _load_favorite_ids(self, items):
+        request = self.context.get("request")
+        user = getattr(request, "user", None)
+        if not items or not (user and user.is_authenticated):
+            return set()
+        return set(
+            Favorite.objects.filter(
+                user=user, service_id__in=[item.id for item in items]
+            ).values_list("service_id", flat=True)
+        )
+
+    def _load_provider_points(self, items):
+        # نتائج البحث تحمل موقع المزود مسبقاً فلا حاجة لاستعلام إضافي
+        missing = {
+            item.provider_id for item in items
+            if item.provider_id and getattr(item, "provider_point", None) is None
+        }
+        if not missing:
+            return {}
+        from location.models import CurrentLocation
+        return dict(
+            CurrentLocation.objects.filter(user_id__in=missing)
+            .values_list("user_id", "location")
+        )
+
+
+class SparseFieldsetMixin:
+    """
+    Keep only the fields listed in ``context["fields"]`` (parsed from
+    ``?fields=id,title,...``); ``id`` is always kept. Unknown names are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get("fields")
+        if requested:
+            keep = set(requested) | {"id"}
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+
 class ServiceSerializer(serializers.ModelSerializer):
     category = ServiceCategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
@@ -30,16 +97,32 @@ class ServiceSerializer(serializers.ModelSerializer):
             "category", "category_id", "city", "price", "currency", "is_active",
             "created_at", "rating_avg", "rating_count", "provider_location"
         ]
+        list_serializer_class = ServiceListSerializer
 
     def get_currency(self, obj):
         return "EGP"
     
+    def _page_lookup(self, name):
+        """Value loaded for the whole page by ServiceListSerializer, or None."""
+        return getattr(self.parent, name, None) if isinstance(self.parent, ServiceListSerializer) else None
+
     def get_provider_location(self, obj):
         """إرجاع موقع المزود إذا كان متاحاً"""
-        if hasattr(obj.provider, 'workerprofile') and obj.provider.workerprofile.location:
+        point = getattr(obj, "provider_point", None)
+        if point is None:
+            points = self._page_lookup("provider_points")
+            if points is not None:
+                point = points.get(obj.provider_id)
+            elif obj.provider_id:
+                from location.models import CurrentLocation
+                point = (
+                    CurrentLocation.objects.filter(user_id=obj.provider_id)
+                    .values_list("location", flat=True).first()
+                )
+        if point is not None:
             return {
-                "lat": obj.provider.workerprofile.location.y,
-                "lng": obj.provider.workerprofile.location.x
+                "lat": point.y,
+                "lng": point.x
             }
         elif obj.location:  
             return {
@@ -48,6 +131,10 @@ class ServiceSerializer(serializers.ModelSerializer):
             }
         return None
 
+class ServiceCatalogSerializer(SparseFieldsetMixin, ServiceSerializer):
+    """Compact catalog row: no nested reviews (see /api/reviews/service/<id>/page/)."""
+
+
 class ServiceDetailSerializer(ServiceSerializer):
     reviews = ReviewSerializer(many=True, read_only=True)
     class Meta(ServiceSerializer.Meta):
@@ -86,6 +173,9 @@ class ServiceSearchSerializer(ServiceSerializer):
         return None
 
     def get_in_favorites(self, obj):
+        favorite_ids = self._page_lookup("favorite_service_ids")
+        if favorite_ids is not None:
+            return obj.id in favorite_ids
         user = self.context.get("request").user if self.context.get("request") else None
         if user and user.is_authenticated:
             return obj.favorited_by.filter(user=user).exists()
@@ -1,10 +1,19 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.db import transaction
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
-from .models import Service
+from core.cache import bump_tags
+from accounts.models import User, WorkerProfile
+from location.geocoding import assign_areas
+from location.models import UserLocation
+from orders.models import Order
+from reviews.models import Review
+from .caching import TAG_CATEGORIES, TAG_SERVICES, provider_tag
+from .models import Service, ServiceCategory
 from notifications.models import Notification
 
-@receiver(post_save, sender=Service)
+# Temporarily disabled - Notification has no ``user`` field (recipient is a generic FK)
+# @receiver(post_save, sender=Service)
 def notify_service_created(sender, instance, created, **kwargs):
     if created:
         provider = instance.provider
@@ -18,3 +27,59 @@ def notify_service_created(sender, instance, created, **kwargs):
                 target_object_id=instance.id,
                 url=f"/services/{instance.id}/"
             )
+
+
+# المدينة الموحدة للتصفية بالمساواة في قائمة الخدمات (location.geocoding)
+@receiver(pre_save, sender=Service)
+def assign_service_areas(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.normalized_city_id is None or instance.has_changed("city") or instance.has_changed("location"):
+        assign_areas(instance)
+
+
+# ---------------- Catalog cache invalidation ----------------
+# بعد نجاح المعاملة فقط: لو أُلغي الكاش قبلها قد يعيد طلب متزامن تخزين
+# البيانات القديمة تحت الإصدار الجديد
+def _bump_on_commit(*tags):
+    transaction.on_commit(lambda: bump_tags(*tags))
+
+@receiver([post_save, post_delete], sender=Service)
+def invalidate_service_cache(sender, instance, **kwargs):
+    _bump_on_commit(TAG_SERVICES, provider_tag(instance.provider_id))
+
+@receiver([post_save, post_delete], sender=ServiceCategory)
+def invalidate_category_cache(sender, instance, **kwargs):
+    _bump_on_commit(TAG_CATEGORIES, TAG_SERVICES)
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_review_cache(sender, instance, **kwargs):
+    # التقييمات تظهر في قائمة الخدمات وفي بروفايل المزود
+    provider_id = Service.objects.filter(pk=instance.service_id).values_list("provider_id", flat=True).first()
+    _bump_on_commit(TAG_SERVICES, provider_tag(provider_id))
+
+@receiver([post_save, post_delete], sender=WorkerProfile)
+def invalidate_worker_profile_cache(sender, instance, **kwargs):
+    _bump_on_commit(provider_tag(instance.user_id))
+
+# موقع المزود في قائمة الخدمات قد يتأخر حتى انتهاء مهلة الكاش، حتى لا
+# يُلغى كاش القائمة كلها مع كل تحديث موقع
+@receiver([post_save, post_delete], sender=UserLocation)
+def invalidate_provider_location_cache(sender, instance, **kwargs):
+    if instance.user_id:
+        _bump_on_commit(provider_tag(instance.user_id))
+
+# بروفايل المزود العام: بيانات المستخدم وعدد الطلبات المكتملة
+@receiver(post_save, sender=User)
+def invalidate_provider_user_cache(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    if instance.role == "worker":
+        _bump_on_commit(provider_tag(instance.pk))
+
+@receiver(post_save, sender=Order)
+def invalidate_provider_orders_cache(sender, instance, created, **kwargs):
+    if not instance.worker_id or created:
+        return
+    if instance.has_changed("status") and "completed" in (instance.status, instance.previous("status")):
+        _bump_on_commit(provider_tag(instance.worker_id))
@@ -1,3 +1,174 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from core.cache import tag_versions
+from location.geocoding import get_city
+from location.models import CurrentLocation
+from .caching import TAG_SERVICES, provider_tag
+from .models import Favorite, Service
+from .search import search_services
+from .serializers import ServiceSearchSerializer, ServiceSerializer
+from .views import service_list
+
+User = get_user_model()
+
+CAIRO = (30.0444, 31.2357)
+
+
+def make_user(username, role="worker"):
+    return User.objects.create_user(
+        username=username, email=f"{username}@example.com", password="pass", role=role
+    )
+
+
+def place(user, lat, lng):
+    CurrentLocation.objects.update_or_create(user=user, defaults={"location": Point(lng, lat, srid=4326)})
+
+
+class SearchServicesTests(TestCase):
+    def setUp(self):
+        self.near = make_user("near")
+        self.far = make_user("far")
+        self.outside = make_user("outside")
+        place(self.near, 30.0450, 31.2360)       # أقل من كيلومتر
+        place(self.far, 30.0800, 31.2357)        # ~4 كم
+        place(self.outside, 31.2001, 29.9187)    # الإسكندرية
+        self.near_service = Service.objects.create(provider=self.near, title="سباكة")
+        self.far_service = Service.objects.create(provider=self.far, title="سباكة")
+        self.outside_service = Service.objects.create(provider=self.outside, title="سباكة")
+
+    def test_returns_services_in_range_nearest_first(self):
+        results = search_services(*CAIRO, radius_km=10)
+
+        self.assertEqual([s.id for s in results], [self.near_service.id, self.far_service.id])
+        self.assertLess(results[0].distance_km.km, 1)
+        self.assertLess(results[1].distance_km.km, 10)
+
+    def test_only_worker_providers_are_in_range(self):
+        client = make_user("client", role="client")
+        place(client, 30.0445, 31.2358)
+        Service.objects.create(provider=client, title="سباكة")
+
+        results = search_services(*CAIRO, radius_km=10)
+
+        self.assertNotIn(client.id, [s.provider_id for s in results])
+
+    def test_falls_back_to_nearest_when_nothing_in_range(self):
+        results = search_services(*CAIRO, radius_km=0.1)
+
+        self.assertEqual(
+            [s.id for s in results],
+            [self.near_service.id, self.far_service.id, self.outside_service.id],
+        )
+        self.assertTrue(all(s.distance_km == 0.1 + 1 for s in results))
+
+    def test_filters_by_query(self):
+        other = Service.objects.create(provider=self.near, title="كهرباء")
+
+        results = search_services(*CAIRO, radius_km=10, q="كهرباء")
+
+        self.assertEqual([s.id for s in results], [other.id])
+
+
+class ServiceListSerializerTests(TestCase):
+    def setUp(self):
+        self.worker = make_user("worker")
+        place(self.worker, *CAIRO)
+        self.client_user = make_user("client", role="client")
+        self.first = Service.objects.create(provider=self.worker, title="سباكة")
+        self.second = Service.objects.create(provider=self.worker, title="كهرباء")
+        Favorite.objects.create(user=self.client_user, service=self.second)
+        request = RequestFactory().get("/")
+        request.user = self.client_user
+        self.context = {"request": request}
+
+    def test_lists_sharing_a_context_load_their_own_page(self):
+        first = ServiceSearchSerializer([self.first], many=True, context=self.context).data
+        second = ServiceSearchSerializer([self.second], many=True, context=self.context).data
+
+        self.assertFalse(first[0]["in_favorites"])
+        self.assertTrue(second[0]["in_favorites"])
+
+    def test_page_lookups_are_batched(self):
+        services = (
+            Service.objects.filter(id__in=[self.first.id, self.second.id])
+            .select_related("provider", "category").order_by("id")
+        )
+        with self.assertNumQueries(3):
+            data = ServiceSearchSerializer(services, many=True, context=self.context).data
+
+        self.assertEqual([row["in_favorites"] for row in data], [False, True])
+        self.assertEqual(data[0]["provider_location"], {"lat": CAIRO[0], "lng": CAIRO[1]})
+
+    def test_single_service_looks_up_its_provider_location(self):
+        data = ServiceSerializer(self.first, context=self.context).data
+
+        self.assertEqual(data["provider_location"], {"lat": CAIRO[0], "lng": CAIRO[1]})
+
+
+class CatalogCacheInvalidationTests(TestCase):
+    def test_tags_are_bumped_only_when_the_transaction_commits(self):
+        worker = make_user("worker")
+        tags = [TAG_SERVICES, provider_tag(worker.id)]
+        before = tag_versions(tags)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Service.objects.create(provider=worker, title="سباكة")
+            self.assertEqual(tag_versions(tags), before)
+
+        for callback in callbacks:
+            callback()
+        after = tag_versions(tags)
+        self.assertTrue(all(after[tag] != before[tag] for tag in tags))
+
+
+class ServiceListCityFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        worker = make_user("worker")
+        get_city("القاهرة")
+        self.normalized = Service.objects.create(provider=worker, title="سباكة", city="القاهرة")
+        # خدمة لم يصلها backfill_geo_areas بعد
+        self.pending = Service.objects.create(provider=worker, title="كهرباء", city="القاهرة الجديدة")
+        Service.objects.filter(pk=self.pending.pk).update(normalized_city=None)
+        self.other = Service.objects.create(provider=worker, title="نجارة", city="الجيزة")
+
+    def ids(self, city):
+        response = service_list(RequestFactory().get("/", {"city": city}))
+        return {row["id"] for row in response.data["results"]}
+
+    def test_known_city_matches_normalized_and_pending_services(self):
+        self.assertIsNotNone(self.normalized.normalized_city_id)
+
+        self.assertEqual(self.ids("القاهرة"), {self.normalized.id, self.pending.id})
+
+    def test_unknown_city_falls_back_to_text_search(self):
+        self.assertEqual(self.ids("الجيزة"), {self.other.id})
+
+
+class ServiceListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        worker = make_user("worker")
+        self.services = [Service.objects.create(provider=worker, title=f"خدمة {i}") for i in range(3)]
+
+    def get(self, **params):
+        return service_list(RequestFactory().get("/", params)).data
+
+    def test_page_without_nested_reviews(self):
+        data = self.get(page_size=2)
+
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(data["total_pages"], 2)
+        self.assertEqual([row["id"] for row in data["results"]], [s.id for s in self.services[:0:-1]])
+        self.assertNotIn("reviews", data["results"][0])
+
+        second = self.get(page_size=2, page=2)
+        self.assertEqual([row["id"] for row in second["results"]], [self.services[0].id])
+
+    def test_sparse_fieldset(self):
+        row = self.get(fields="title,unknown")["results"][0]
+
+        self.assertEqual(set(row), {"id", "title"})
@@ -1,4 +1,4 @@
-from django.db.models import Avg, Count, Q
+from django.db.models import F, Q
 from django.db import models
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, permission_classes
@@ -11,11 +11,17 @@ from accounts.models import WorkerProfile
 from .models import Service, ServiceCategory, Favorite
 from .serializers import (
     ServiceSerializer, 
+    ServiceCatalogSerializer,
     ServiceDetailSerializer, 
     ServiceCategorySerializer, 
     ServiceSearchSerializer, 
     FavoriteSerializer,
 )
+from .search import search_services
+from location.geocoding import resolve_city
+from .caching import TAG_CATEGORIES, TAG_SERVICES
+from core.cache import cached_response
+from orders.pagination import parse_page_size
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 #worker profile import check
@@ -36,6 +42,7 @@ class IsWorkerOrReadOnly(BasePermission):
 
 @api_view(["GET", "POST"])
 @permission_classes([IsWorkerOrReadOnly])
+@cached_response("service_categories", [TAG_CATEGORIES], timeout=3600)
 def service_categories(request):
     if request.method == "GET":
         categories = ServiceCategory.objects.filter(is_deleted=False)
@@ -69,6 +76,7 @@ def service_category_detail(request, pk):
 
 
 @api_view(["GET"])
+@cached_response("service_types", [TAG_CATEGORIES], timeout=3600)
 def service_types(request):
     categories = ServiceCategory.objects.filter(is_deleted=False)
     serializer = ServiceCategorySerializer(categories, many=True)
@@ -77,18 +85,23 @@ def service_types(request):
 
 @api_view(["GET", "POST"])
 @permission_classes([IsWorkerOrReadOnly])
+@cached_response("service_list", [TAG_SERVICES])
 def service_list(request):
     if request.method == "GET":
-        services = Service.objects.filter(is_deleted=False).annotate(
-            rating_avg=Avg("reviews__score"),
-            rating_count=Count("reviews")
-        )
+        services = Service.objects.filter(is_deleted=False).select_related("category", "provider")
         category_id = request.query_params.get("category")
         if category_id:
             services = services.filter(category_id=category_id)
         city = request.query_params.get("city")
         if city:
-            services = services.filter(city__icontains=city)
+            # مدينة معروفة: مساواة على المعرف المفهرس، مع البحث النصي للخدمات التي لم تُوحَّد بعد
+            city_id = resolve_city(city, offline=True)
+            if city_id is not None:
+                services = services.filter(
+                    Q(normalized_city_id=city_id) | Q(normalized_city__isnull=True, city__icontains=city)
+                )
+            else:
+                services = services.filter(city__icontains=city)
         
         # Add provider filter support
         provider_id = request.query_params.get("provider")
@@ -99,8 +112,32 @@ def service_list(request):
         if q:
             services = services.filter(Q(title__icontains=q) | Q(description__icontains=q))
         
-        serializer = ServiceDetailSerializer(services, many=True)
-        return Response(serializer.data)
+        if request.query_params.get("ordering") == "rating":
+            services = services.order_by(F("rating_avg").desc(nulls_last=True), "id")
+        else:
+            services = services.order_by("-created_at", "-id")
+        
+        # صفحة واحدة فقط، بدون التقييمات المتداخلة (لها endpoint منفصل)
+        try:
+            page = max(1, int(request.query_params.get("page", 1)))
+        except (TypeError, ValueError):
+            page = 1
+        page_size = parse_page_size(request.query_params.get("page_size"), default=20)
+        start = (page - 1) * page_size
+        
+        total_count = services.count()
+        fields = [f.strip() for f in request.query_params.get("fields", "").split(",") if f.strip()]
+        serializer = ServiceCatalogSerializer(
+            services[start:start + page_size], many=True,
+            context={"request": request, "fields": fields},
+        )
+        return Response({
+            "results": serializer.data,
+            "count": total_count,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total_count + page_size - 1) // page_size,
+        })
     
     elif request.method == "POST":
         serializer = ServiceSerializer(data=request.data)
@@ -161,13 +198,7 @@ def create_for_worker(request):
 @api_view(["GET", "PUT", "DELETE"])
 @permission_classes([IsWorkerOrReadOnly])
 def service_detail(request, pk):
-    service = get_object_or_404(
-        Service.objects.filter(is_deleted=False).annotate(
-            rating_avg=Avg("reviews__score"),
-            rating_count=Count("reviews")
-        ),
-        pk=pk
-    )
+    service = get_object_or_404(Service, pk=pk, is_deleted=False)
     if request.method == "GET":
         serializer = ServiceDetailSerializer(service)
         return Response(serializer.data)
@@ -189,117 +220,28 @@ def service_detail(request, pk):
 
 @api_view(["GET"])
 def service_search(request):
-    print(f"[DEBUG] Service search called with params: {dict(request.GET)}")
-    print(f"[DEBUG] Request headers: {dict(request.headers)}")
-    
     try:
         lat = float(request.GET.get("lat"))
         lng = float(request.GET.get("lng"))
-        print(f"[DEBUG] Parsed coordinates: lat={lat}, lng={lng}")
     except (TypeError, ValueError):
         return Response({"error": "lat and lng are required and must be valid numbers"}, status=status.HTTP_400_BAD_REQUEST)
     
-    radius_km = float(request.GET.get("radius_km", 10))
-    service_type = request.GET.get("service_type") 
-    q = request.GET.get("q", "")
-    max_results = int(request.GET.get("max_results", 50))  # Increase default limit
-    
-    from django.contrib.gis.geos import Point
-    from django.contrib.gis.db.models.functions import Distance
-    from django.contrib.gis.measure import D
-    
-    # Create point for the search location
-    search_point = Point(lng, lat, srid=4326)
+    try:
+        radius_km = float(request.GET.get("radius_km", 10))
+        max_results = int(request.GET.get("max_results", 50))
+    except (TypeError, ValueError):
+        return Response({"error": "radius_km and max_results must be valid numbers"}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Start with basic service filtering
-    qs = Service.objects.filter(
-        is_deleted=False, 
-        is_active=True,
-        provider__isnull=False
-    ).annotate(
-        rating_avg=Avg("reviews__score"),
-        rating_count=Count("reviews")
+    results = search_services(
+        lat,
+        lng,
+        radius_km=radius_km,
+        service_type=request.GET.get("service_type"),
+        q=request.GET.get("q", ""),
+        max_results=max_results,
     )
     
-    # Filter by service type if provided
-    if service_type:
-        try:
-            service_type_int = int(service_type)
-            qs = qs.filter(category_id=service_type_int)
-        except (ValueError, TypeError):
-            # If service_type is not a valid integer, try to match by name
-            qs = qs.filter(category__name__icontains=service_type)
-    
-    # Filter by search query if provided
-    if q:
-        qs = qs.filter(
-            Q(title__icontains=q) | 
-            Q(description__icontains=q) |
-            Q(category__name__icontains=q)
-        )
-    
-    # Now filter by location using provider's locations
-    # Join with UserLocation to find services from providers within radius
-    from location.models import UserLocation
-    
-    # Get providers within radius
-    nearby_providers = UserLocation.objects.filter(
-        user__role='worker',
-        location__isnull=False
-    ).annotate(
-        distance=Distance('location', search_point)
-    ).filter(
-        location__distance_lte=(search_point, D(km=radius_km))
-    ).values_list('user_id', flat=True)
-    
-    # Filter services by nearby providers
-    qs = qs.filter(provider_id__in=nearby_providers)
-    
-    # Add distance calculation to services based on provider's location
-    qs = qs.annotate(
-        provider_location=UserLocation.objects.filter(
-            user_id=models.OuterRef('provider_id')
-        ).values('location')[:1]
-    ).annotate(
-        distance_km=Distance('provider_location', search_point)
-    ).filter(
-        distance_km__lte=D(km=radius_km)
-    ).order_by('distance_km', '-rating_avg')[:max_results]
-    
-    # Fallback: if no location-based results, return services without location filtering
-    if not qs.exists():
-        print(f"No location-based results found, falling back to general search")
-        qs = Service.objects.filter(
-            is_deleted=False, 
-            is_active=True,
-            provider__isnull=False
-        ).annotate(
-            rating_avg=Avg("reviews__score"),
-            rating_count=Count("reviews")
-        )
-        
-        if service_type:
-            try:
-                service_type_int = int(service_type)
-                qs = qs.filter(category_id=service_type_int)
-            except (ValueError, TypeError):
-                qs = qs.filter(category__name__icontains=service_type)
-        
-        if q:
-            qs = qs.filter(
-                Q(title__icontains=q) | 
-                Q(description__icontains=q) |
-                Q(category__name__icontains=q)
-            )
-        
-        # Add a default distance for fallback results
-        from django.db.models import Value, FloatField
-        qs = qs.annotate(distance_km=Value(radius_km + 1, output_field=FloatField()))
-        qs = qs.order_by('-rating_avg', 'id')[:max_results]
-    
-    serializer = ServiceSearchSerializer(qs, many=True, context={"request": request})
-    print(f"[DEBUG] Returning {len(qs)} services")
-    print(f"[DEBUG] First service sample: {qs.first().title if qs.exists() else 'No services found'}")
+    serializer = ServiceSearchSerializer(results, many=True, context={"request": request})
     return Response(serializer.data)
 
 